@@ -11,3 +11,15 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+
+from __future__ import absolute_import
+
+import atexit
+import os
+import shutil
+import tempfile
+
+# Keep the tests off the dot graph and LOC calibration caches in ~/.cache/uberpoet, whose entries would hide dot
+# files being read and sample files being counted
+os.environ['UBERPOET_CACHE_DIR'] = tempfile.mkdtemp()
+atexit.register(shutil.rmtree, os.environ['UBERPOET_CACHE_DIR'], True)
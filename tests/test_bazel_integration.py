@@ -92,7 +92,7 @@ class TestBazelIntegration(unittest.TestCase):
         command = GenProjCommandLine()
         command.main(args)
 
-        self.verify_genproj(app_path, 105, 901, 0)
+        self.verify_genproj(app_path, 106, 901, 0)
         self.verify_lib(app_path, 'MockLib53')
 
     @integration_test
@@ -108,7 +108,7 @@ class TestBazelIntegration(unittest.TestCase):
         command.main(args)
 
         # 1 Swift file count expected due to main.swift for the app target.
-        self.verify_genproj(app_path, 105, 1, 2200)
+        self.verify_genproj(app_path, 106, 1, 2200)
         self.verify_lib(app_path, 'MockLib53', Language.OBJC)
 
     @integration_test
@@ -124,7 +124,7 @@ class TestBazelIntegration(unittest.TestCase):
         command = GenProjCommandLine()
         command.main(args)
 
-        self.verify_genproj(app_path, 342, 675, 0)
+        self.verify_genproj(app_path, 321, 946, 0)
         self.verify_lib(app_path, 'DotReaderLib17')
 
     @integration_test
@@ -142,7 +142,7 @@ class TestBazelIntegration(unittest.TestCase):
         command = GenProjCommandLine()
         command.main(args)
 
-        self.verify_genproj(app_path, 343, 484, 2)
+        self.verify_genproj(app_path, 322, 463, 2)
         self.verify_lib(app_path, 'DotReaderLib17')
 
     @integration_test
@@ -155,7 +155,7 @@ class TestBazelIntegration(unittest.TestCase):
         command = CommandLineMultisuite()
         command.main(args)
         self.assertGreater(os.listdir(app_path), 0)
-        self.verify_genproj(app_path, 104, 601, 0)
+        self.verify_genproj(app_path, 105, 601, 0)
         self.verify_lib(app_path, 'MockLib53')
 
     @integration_test
@@ -171,9 +171,12 @@ class TestBazelIntegration(unittest.TestCase):
             "--full_clean"
         ]
 
+        commands = []
+
         # we need the unused named variable for mocking purposes
         # noinspection PyUnusedLocal
         def command_callable(command, stdin):
+            commands.append(command)
             if 'cloc' in command:
                 return PopenBehaviour(stdout=cloc_out)
             elif 'xcodebuild -version' in command:
@@ -189,8 +192,13 @@ class TestBazelIntegration(unittest.TestCase):
                 mock_find.return_value = '/bin/ls'  # A non empty return value basically means "I found that executable"
                 CommandLineMultisuite().main(args)
                 self.assertGreater(os.listdir(app_path), 0)
-                self.verify_genproj(app_path, 104, 601, 0)
+                self.verify_genproj(app_path, 105, 601, 0)
                 self.verify_lib(app_path, 'MockLib53')
+                # Build outputs of the previous app type are cleaned before each timed build
+                builds = [i for i, c in enumerate(commands) if c.startswith('bazel build')]
+                self.assertGreater(len(builds), 0)
+                for build in builds:
+                    self.assertEqual(commands[build - 1], 'bazel clean')
 
     @integration_test
     def test_dot_multisuite(self):
@@ -206,7 +214,7 @@ class TestBazelIntegration(unittest.TestCase):
         command = CommandLineMultisuite()
         command.main(args)
         self.assertGreater(os.listdir(app_path), 0)
-        self.verify_genproj(app_path, 341, 338, 0)
+        self.verify_genproj(app_path, 320, 631, 0)
         self.verify_lib(app_path, 'DotReaderLib17')
 
     @integration_test
@@ -227,5 +235,5 @@ class TestBazelIntegration(unittest.TestCase):
         # Note we are assuming that the last project to be generated is the dot project.
         # If you change the order of project generation, make this match whatever is the new 'last project'
         # It's a bit fragile, but it's better than not verifying anything currently
-        self.verify_genproj(app_path, 341, 675, 0)
+        self.verify_genproj(app_path, 320, 946, 0)
         self.verify_lib(app_path, 'DotReaderLib17')
@@ -91,7 +91,7 @@ class TestBuckIntegration(unittest.TestCase):
         command = GenProjCommandLine()
         command.main(args)
 
-        self.verify_genproj(app_path, 104, 901, 0)
+        self.verify_genproj(app_path, 105, 901, 0)
         self.verify_lib(app_path, 'MockLib53')
 
     @integration_test
@@ -105,7 +105,7 @@ class TestBuckIntegration(unittest.TestCase):
         command = GenProjCommandLine()
         command.main(args)
         # 1 Swift file count expected due to main.swift for the app target.
-        self.verify_genproj(app_path, 104, 1, 2200)
+        self.verify_genproj(app_path, 105, 1, 2200)
         self.verify_lib(app_path, 'MockLib53', Language.OBJC)
 
     @integration_test
@@ -120,7 +120,7 @@ class TestBuckIntegration(unittest.TestCase):
         command = GenProjCommandLine()
         command.main(args)
 
-        self.verify_genproj(app_path, 341, 675, 0)
+        self.verify_genproj(app_path, 320, 946, 0)
         self.verify_lib(app_path, 'DotReaderLib17')
 
     @integration_test
@@ -137,7 +137,7 @@ class TestBuckIntegration(unittest.TestCase):
         command = GenProjCommandLine()
         command.main(args)
 
-        self.verify_genproj(app_path, 342, 484, 2)
+        self.verify_genproj(app_path, 321, 463, 2)
         self.verify_lib(app_path, 'DotReaderLib17')
 
     @integration_test
@@ -149,7 +149,7 @@ class TestBuckIntegration(unittest.TestCase):
         command = CommandLineMultisuite()
         command.main(args)
         self.assertGreater(os.listdir(app_path), 0)
-        self.verify_genproj(app_path, 103, 601, 0)
+        self.verify_genproj(app_path, 104, 601, 0)
         self.verify_lib(app_path, 'MockLib53')
 
     @integration_test
@@ -164,9 +164,12 @@ class TestBuckIntegration(unittest.TestCase):
             "--full_clean"
         ]
 
+        commands = []
+
         # we need the unused named variable for mocking purposes
         # noinspection PyUnusedLocal
         def command_callable(command, stdin):
+            commands.append(command)
             if 'cloc' in command:
                 return PopenBehaviour(stdout=cloc_out)
             elif 'xcodebuild -version' in command:
@@ -182,8 +185,13 @@ class TestBuckIntegration(unittest.TestCase):
                 mock_find.return_value = '/bin/ls'  # A non empty return value basically means "I found that executable"
                 CommandLineMultisuite().main(args)
                 self.assertGreater(os.listdir(app_path), 0)
-                self.verify_genproj(app_path, 103, 601, 0)
+                self.verify_genproj(app_path, 104, 601, 0)
                 self.verify_lib(app_path, 'MockLib53')
+                # Build outputs of the previous app type are cleaned before each timed build
+                builds = [i for i, c in enumerate(commands) if c.startswith('buck build')]
+                self.assertGreater(len(builds), 0)
+                for build in builds:
+                    self.assertEqual(commands[build - 1], 'buck clean')
 
     @integration_test
     def test_dot_multisuite(self):
@@ -198,7 +206,7 @@ class TestBuckIntegration(unittest.TestCase):
         command = CommandLineMultisuite()
         command.main(args)
         self.assertGreater(os.listdir(app_path), 0)
-        self.verify_genproj(app_path, 340, 338, 0)
+        self.verify_genproj(app_path, 319, 631, 0)
         self.verify_lib(app_path, 'DotReaderLib17')
 
     @integration_test
@@ -218,5 +226,5 @@ class TestBuckIntegration(unittest.TestCase):
         # Note we are assuming that the last project to be generated is the dot project.
         # If you change the order of project generation, make this match whatever is the new 'last project'
         # It's a bit fragile, but it's better than not verifying anything currently
-        self.verify_genproj(app_path, 340, 675, 0)
+        self.verify_genproj(app_path, 319, 946, 0)
         self.verify_lib(app_path, 'DotReaderLib17')
@@ -1,9 +1,16 @@
+import multiprocessing.dummy
 import os
+import shutil
+import tempfile
 import unittest
 
-from uberpoet.dotreader import DotFileReader
+import mock
+
+from uberpoet.dotreader import DepMapBuilder, DotFileReader, DotParser, _read_dot_chunk
 from uberpoet.moduletree import ModuleNode
 
+from .utils import write_file
+
 
 class TestDotReader(unittest.TestCase):
 
@@ -14,7 +21,7 @@ class TestDotReader(unittest.TestCase):
         root, nodes = dr.read_dot_file(test_fixture_path, main_root_name, is_debug=True)
 
         self.assertEqual(root.name, main_root_name)
-        self.assertEqual(len(nodes), 338)
+        self.assertEqual(len(nodes), 316)  # Nodes the app node can't reach are left out
         self.assertEqual(root.node_type, ModuleNode.APP)
         self.assertIn(root, nodes)
         self.assertEqual(len(root.deps), 1)
@@ -23,3 +30,209 @@ class TestDotReader(unittest.TestCase):
         for node in nodes:
             if node.name != main_root_name:
                 self.assertEqual(node.node_type, ModuleNode.LIBRARY)
+
+    def test_extract_edges_filters_ignoring_case(self):
+        text = '\n'.join([
+            'digraph result_graph {',
+            '  "//a:A" -> "//b:B";',
+            '  "//a:A" -> "//b:BTests";',
+            '  "//a:A" -> "//c:CAssetCatalog";',
+            '  "//b:B" -> "//c:C";',
+            '}',
+        ])
+        self.assertEqual(DotFileReader().extract_edges(text), [['//a:A', '//b:B'], ['//b:B', '//c:C']])
+        self.assertEqual(len(DotFileReader(modules_filter=[]).extract_edges(text)), 4)
+
+    def test_extract_edges_dot_syntax(self):
+        text = '\n'.join([
+            '/* A comment',
+            '   spanning lines */ digraph "graph" {',
+            '  graph [rankdir=LR]; node [shape=box]',
+            '  rankdir = TB',
+            '# A preprocessor line',
+            '  "A" -> "B" -> "C";',
+            '  "D" -> "E" [label="F -> G", color=red]',
+            '  "H" -> "I" "J" -> "K" // A comment',
+            '  subgraph cluster_0 { label = "L"; "M" -> "N"; }',
+            '  "O" -> {"P" "Q"; R}',
+            '  S:port:n -> T:w',
+            '  "U" ->',
+            '    "V" [',
+            '      label = "W"',
+            '    ]',
+            '  "X" [label="Y"]',
+            '  "Long\\',
+            'Name" -> "Quote\\"d"',
+            '  "Z" -> "A"',
+            '}',
+        ])
+        expected = [
+            ['A', 'B'],
+            ['B', 'C'],
+            ['D', 'E'],
+            ['H', 'I'],
+            ['J', 'K'],
+            ['M', 'N'],
+            ['O', 'P'],
+            ['O', 'Q'],
+            ['O', 'R'],
+            ['S', 'T'],
+            ['U', 'V'],
+            ['LongName', 'Quote"d'],
+            ['Z', 'A'],
+        ]
+        self.assertEqual(DotFileReader(modules_filter=[]).extract_edges(text), expected)
+
+    def test_extract_edges_filters_each_edge_of_chains(self):
+        text = '"A" -> "BTests" -> "C" -> "D"\n"E" -> "F"; "G" -> "HTests"\n'
+        self.assertEqual(DotFileReader().extract_edges(text), [['C', 'D'], ['E', 'F']])
+
+    def test_extract_edges_chains_going_on_from_simple_statements(self):
+        text = '"A" -> "B"\n  -> "C";\n"D"\n  -> "E"\n"F" -> "G";\n"H" -> "I"\n"J" -> "K" -> "L"\n"M" -> "N"\n'
+        expected = [['A', 'B'], ['B', 'C'], ['D', 'E'], ['F', 'G'], ['H', 'I'], ['J', 'K'], ['K', 'L'], ['M', 'N']]
+        self.assertEqual(DotFileReader(modules_filter=[]).extract_edges(text), expected)
+
+    def test_extract_edges_reads_bazel_graphs_without_tokenizing(self):
+        # Bazel graphs declare every node and end no statement with a semicolon
+        lines = ['digraph mygraph {', '  node [shape=box];']
+        expected = []
+        for i in xrange(10000):
+            lines.append('  "//m{}:M{}"'.format(i, i))
+            for j in (i + 1, i + 2):
+                lines.append('  "//m{}:M{}" -> "//m{}:M{}"'.format(i, i, j, j))
+                expected.append(['//m{}:M{}'.format(i, i), '//m{}:M{}'.format(j, j)])
+        lines.append('}')
+
+        with mock.patch.object(DotParser, 'tokenize', autospec=True, side_effect=DotParser.tokenize) as tokenize:
+            edges = DotFileReader(modules_filter=[]).extract_edges('\n'.join(lines))
+        self.assertEqual(edges, expected)
+        self.assertEqual(tokenize.call_count, 3)  # Only the lines opening and closing the graph
+
+    def test_read_dot_file_in_parallel(self):
+        test_fixture_path = os.path.join(os.path.dirname(__file__), 'fixtures', 'test_dot.gv')
+        serial_builder = DepMapBuilder(DotFileReader.extract_buck_target)
+        with open(test_fixture_path, 'r') as f:
+            serial_builder.add_edges(DotFileReader().iter_edges(f))
+
+        for chunk_size in (50, 4096):
+            chunks = DotFileReader.line_chunks(test_fixture_path, chunk_size)
+            self.assertGreater(len(chunks), 1)
+            with mock.patch.object(DotFileReader, 'PARALLEL_CHUNK_SIZE', chunk_size):
+                builder = DotFileReader().read_dot_file_in_parallel(test_fixture_path, 2)
+            self.assertEqual(builder.dep_map(), serial_builder.dep_map())
+            self.assertEqual(builder.duplicate_edges, serial_builder.duplicate_edges)
+            self.assertEqual(builder.identical_names(), serial_builder.identical_names())
+
+    def test_read_dot_file_in_parallel_with_statements_spanning_chunks(self):
+        out_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(out_dir, 'graph.gv')
+            write_file(path,
+                       'digraph g {\n"A" -> "B" [\nlabel="x"\n]\n"B" ->\n"C"\n"C" -> "D"\n"D" -> \n"E"\n-> "F"\n}\n')
+            with mock.patch.object(DotFileReader, 'PARALLEL_CHUNK_SIZE', 1):
+                builder = DotFileReader().read_dot_file_in_parallel(path, 3)
+            self.assertEqual(builder.dep_map(), {'A': ['B'], 'B': ['C'], 'C': ['D'], 'D': ['E'], 'E': ['F']})
+        finally:
+            shutil.rmtree(out_dir)
+
+    def test_read_dot_file_in_parallel_reads_chunks_once(self):
+        out_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(out_dir, 'graph.gv')
+            write_file(path, 'digraph g {\n"A"\n"A" -> "B"\n"B"\n"B" -> "C"\n"C" -> "D" -> "E"\n"E" [label="x"]\n}\n')
+            chunk_count = len(DotFileReader.line_chunks(path, 1))
+            # A thread pool calls the mock, which a process pool can't pickle
+            with mock.patch.object(DotFileReader, 'PARALLEL_CHUNK_SIZE', 1), \
+                    mock.patch('multiprocessing.Pool', multiprocessing.dummy.Pool), \
+                    mock.patch('uberpoet.dotreader._read_dot_chunk', side_effect=_read_dot_chunk) as read_dot_chunk:
+                builder = DotFileReader().read_dot_file_in_parallel(path, 3)
+            self.assertEqual(builder.dep_map(), {'A': ['B'], 'B': ['C'], 'C': ['D'], 'D': ['E']})
+            self.assertEqual(read_dot_chunk.call_count, chunk_count)
+        finally:
+            shutil.rmtree(out_dir)
+
+    def test_read_dot_file_with_identical_names(self):
+        out_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(out_dir, 'graph.gv')
+            write_file(path, '"//a:A" -> "//b:B";\n"//b:B" -> "//c:C";\n"//other/b:B" -> "//c:C";\n')
+            with self.assertRaises(ValueError):
+                DotFileReader().read_dot_file(path, 'A')
+        finally:
+            shutil.rmtree(out_dir)
+
+    def test_make_dep_map_drops_duplicate_edges(self):
+        edges = [['A', 'B'], ['A', 'C'], ['A', 'B'], ['B', 'C']]
+        dep_map = DotFileReader.make_dep_map_from_edges(edges)
+        self.assertEqual(dep_map, {'A': ['B', 'C'], 'B': ['C']})
+        self.assertEqual(DotFileReader.incoming_edge_map_from_dep_map(dep_map), {'A': [], 'B': ['A'], 'C': ['A', 'B']})
+
+    def test_identical_names(self):
+        edges = [['//a:A', '//b:B'], ['//b:B', '//c:C'], ['//b:B', '//d:D'], ['//other/b:B', '//c:C']]
+        self.assertEqual(DotFileReader().identical_names(edges), {'B': 2})
+
+    def test_reachability_set(self):
+        dep_map = {'A': ['B', 'C'], 'B': ['C', 'D'], 'C': ['D'], 'E': ['C']}
+        self.assertEqual(DotFileReader.reachability_set(dep_map, 'A'), {'A', 'B', 'C', 'D'})
+        self.assertEqual(DotFileReader.reachability_set(dep_map, 'D'), {'D'})
+
+    def test_reachable_counts(self):
+        dep_map = {'A': ['B', 'C'], 'B': ['C', 'D'], 'C': ['D'], 'D': ['F'], 'E': ['C', 'G'], 'F': ['D'], 'G': ['G']}
+        counts = DotFileReader.reachable_counts(dep_map, ['A', 'E', 'C', 'F'])
+        self.assertEqual(counts, {'A': 5, 'E': 5, 'C': 3, 'F': 2})
+        for name, count in counts.iteritems():
+            self.assertEqual(count, len(DotFileReader.reachability_set(dep_map, name)))
+
+    def test_biggest_root_name(self):
+        dep_map = {'A': ['B'], 'B': ['C', 'D'], 'E': ['C']}
+        self.assertEqual(sorted(DotFileReader().find_roots_in_dep_map(dep_map)), ['A', 'E'])
+        self.assertEqual(DotFileReader().biggest_root_name(dep_map), 'A')
+
+        with self.assertRaises(ValueError):
+            DotFileReader().biggest_root_name({'A': ['B'], 'B': ['A']})
+
+    def test_read_without_root_name(self):
+        test_fixture_path = os.path.join(os.path.dirname(__file__), 'fixtures', 'test_dot.gv')
+        root, nodes = DotFileReader().read_dot_file(test_fixture_path)
+
+        self.assertEqual(root.name, 'DotReaderMainModule')
+        self.assertEqual(len(nodes), 316)
+
+    def test_find_cycles(self):
+        dep_map = {'A': ['B', 'E'], 'B': ['C'], 'C': ['D', 'B'], 'D': ['B'], 'E': ['E', 'F'], 'G': ['H'], 'H': ['G']}
+        self.assertEqual(DotFileReader.find_cycles(dep_map), [['B', 'C', 'D'], ['E'], ['G', 'H']])
+        # Only cycles reachable from the start nodes are returned
+        self.assertEqual(DotFileReader.find_cycles(dep_map, ['A']), [['B', 'C', 'D'], ['E']])
+        self.assertEqual(DotFileReader.find_cycles({'A': ['B'], 'B': ['C']}), [])
+
+        self.assertEqual(DotFileReader.cycle_path(dep_map, ['B', 'C', 'D']), ['B', 'C', 'B'])
+        self.assertEqual(DotFileReader.cycle_path(dep_map, ['E']), ['E', 'E'])
+
+    def test_strongly_connected_components_order(self):
+        dep_map = {'A': ['B'], 'B': ['C'], 'C': ['B', 'D']}
+        components = DotFileReader.strongly_connected_components(dep_map)
+        # Dependencies come first
+        self.assertEqual([sorted(c) for c in components], [['D'], ['B', 'C'], ['A']])
+
+    def test_condense_cycles(self):
+        dep_map = {'A': ['B'], 'B': ['C'], 'C': ['B', 'D']}
+        condensed, code_units = DotFileReader.condense_cycles(dep_map, [['B', 'C']], code_units={'C': 3})
+        self.assertEqual(condensed, {'A': ['B'], 'B': ['D']})
+        self.assertEqual(code_units, {'B': 4})
+
+    def test_read_dot_file_with_cycles(self):
+        out_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(out_dir, 'graph.gv')
+            write_file(path, '"//a:A" -> "//b:B";\n"//b:B" -> "//c:C";\n"//c:C" -> "//b:B";\n"//c:C" -> "//d:D";\n')
+            with self.assertRaises(ValueError):
+                DotFileReader().read_dot_file(path, 'A')
+
+            root, nodes = DotFileReader().read_dot_file(path, 'A', condense_cycles=True)
+            self.assertEqual(len(nodes), 3)
+            merged = root.deps[0]
+            self.assertEqual(merged.name, 'B')
+            self.assertEqual(merged.code_units, 2)
+            self.assertEqual([n.name for n in merged.deps], ['D'])
+        finally:
+            shutil.rmtree(out_dir)
@@ -14,10 +14,13 @@
 
 import unittest
 
-from uberpoet.filegen import (FileResult, FuncType, Language, get_func_call_template, get_import_func_calls,
-                              objc_to_objc_func_call_template, objc_to_swift_func_call_template,
+from uberpoet.filegen import (CallBudget, FileResult, FuncType, ImportCallCache, Language, ModuleSymbols,
+                              ObjCSourceFileGenerator, SwiftFileGenerator, get_func_call_template,
+                              get_import_func_calls, objc_to_objc_func_call_template, objc_to_swift_func_call_template,
                               swift_to_objc_friendly_func_call_template, swift_to_objc_func_call_template,
                               swift_to_swift_func_call_template, swift_to_swift_objc_friendly_func_call_template)
+from uberpoet.loccounter import count_text
+from uberpoet.util import IdAllocator
 
 
 class TestFileGen(unittest.TestCase):
@@ -59,6 +62,96 @@ MyClass0().complexStuff0(arg: "4")"""
         objc_import = self._create_import('MockLib0', Language.OBJC)
         self.assertEqual(get_import_func_calls(Language.OBJC, [objc_import]), expected_objc_func_calls)
 
+    def test_import_func_calls_with_cache(self):
+        swift_import = self._create_import('MockLib0', Language.SWIFT)
+        objc_import = self._create_import('MockLib1', Language.OBJC)
+        uncached = get_import_func_calls(Language.SWIFT, [swift_import, objc_import], indent=8)
+
+        cache = ImportCallCache()
+        first = get_import_func_calls(Language.SWIFT, [swift_import, objc_import], indent=8, call_cache=cache)
+        second = get_import_func_calls(Language.SWIFT, [swift_import, objc_import], indent=8, call_cache=cache)
+
+        self.assertEqual(first, uncached)
+        self.assertEqual(second, uncached)
+        self.assertEqual(cache.misses, 2)
+        self.assertEqual(cache.hits, 2)
+        self.assertEqual(cache.bytes_saved, len(uncached) - 1)  # The joining newline is not cached
+
+        get_import_func_calls(Language.SWIFT, [swift_import], indent=4, call_cache=cache)
+        self.assertEqual(cache.misses, 3)
+
+    def test_call_budget_per_dependency_and_class(self):
+        imports = [self._create_import('MockLib0', Language.SWIFT), self._create_import('MockLib1', Language.OBJC)]
+        budget = CallBudget(max_per_class=3, max_per_dependency=2, seed=1)
+        gen = SwiftFileGenerator(call_budget=budget)
+
+        text, count = gen.gen_import_func_calls(imports, 0, 42)
+        all_calls = get_import_func_calls(Language.SWIFT, imports).splitlines()
+        calls = text.splitlines()
+        self.assertEqual(count, 3)
+        self.assertEqual(len(calls), 3)
+        # Sampling keeps the original call order
+        self.assertEqual(calls, [c for c in all_calls if c in calls])
+        # Sampling is deterministic for the same seed and class number
+        self.assertEqual(gen.gen_import_func_calls(imports, 0, 42), (text, count))
+
+    def test_call_budget_per_file(self):
+        imports = [self._create_import('MockLib0', Language.SWIFT)]
+        gen = SwiftFileGenerator(call_budget=CallBudget(max_per_file=5))
+        file_result = gen.gen_file(3, 3, imports)
+        self.assertEqual(file_result.text.count('MyClass0()'), 5)
+
+    def test_unlimited_call_budget(self):
+        imports = [self._create_import('MockLib0', Language.SWIFT)]
+        gen = SwiftFileGenerator(call_budget=CallBudget())
+        text, count = gen.gen_import_func_calls(imports, 0, 42)
+        self.assertEqual(text, get_import_func_calls(Language.SWIFT, imports))
+        self.assertIsNone(count)
+
+    def test_ids_are_stable_per_scope(self):
+        for gen in [SwiftFileGenerator(), ObjCSourceFileGenerator()]:
+            first = gen.gen_file(3, 3, ids=IdAllocator('MockLib0', 0))
+            # Generating other files in between doesn't change the ids of a file
+            gen.gen_file(3, 3, ids=IdAllocator('MockLib1', 0))
+            second = gen.gen_file(3, 3, ids=IdAllocator('MockLib0', 0))
+            other_file = gen.gen_file(3, 3, ids=IdAllocator('MockLib0', 1))
+
+            self.assertEqual(first.text, second.text)
+            self.assertEqual(first.classes, second.classes)
+            self.assertFalse(set(first.classes) & set(other_file.classes))
+
+    def test_file_result_chunks(self):
+        imports = [self._create_import('MockLib0', Language.SWIFT)]
+        cache = ImportCallCache()
+        gen = SwiftFileGenerator(cache)
+        file_result = gen.gen_file(3, 3, imports)
+
+        self.assertGreater(len(file_result.chunks), 1)
+        self.assertEqual(file_result.text_line_count, len(file_result.text.split('\n')))
+        # Cached call blocks are emitted as they are instead of being copied into the class text
+        block = cache.block_for(Language.SWIFT, 'MockLib0', imports[0]['MockLib0'], 8)
+        self.assertTrue(any(chunk is block for chunk in file_result.chunks))
+
+    def test_file_result_line_counts(self):
+        imports = [self._create_import('MockLib0', Language.SWIFT), self._create_import('MockLib1', Language.OBJC)]
+        for gen in [SwiftFileGenerator(ImportCallCache()), ObjCSourceFileGenerator(ImportCallCache())]:
+            for file_imports in [[], imports if gen.language() == Language.SWIFT else imports[1:]]:
+                file_result = gen.gen_file(3, 3, file_imports)
+                self.assertEqual(file_result.line_counts, count_text(file_result.text))
+
+    def test_module_symbols(self):
+        gen = SwiftFileGenerator()
+        files = {'File0.swift': gen.gen_file(3, 3, ids=IdAllocator('MockLib0', 0))}
+        symbols = ModuleSymbols.from_files(files)
+
+        functions = [(class_num, func_type, func_num)
+                     for class_num, class_funcs in files['File0.swift'].classes.items()
+                     for func_type, func_nums in class_funcs.items()
+                     for func_num in func_nums]
+        self.assertEqual(list(symbols.functions()), functions)
+        self.assertEqual(symbols.first_function(), (functions[0][0], functions[0][2]))
+        self.assertEqual(symbols.file_count, 1)
+
     def test_import_func_calls_for_str(self):
         self.assertEqual(get_import_func_calls(Language.SWIFT, ['File.h']), '')
 
@@ -69,4 +162,5 @@ MyClass0().complexStuff0(arg: "4")"""
         elif language == Language.OBJC:
             class_functions = {FuncType.OBJC_FRIENDLY: [0, 1, 2]}
         file_result = FileResult('body', [], {0: class_functions})
-        return {name: {'files': {file_name: file_result}, 'loc': 150, 'language': language}}
+        symbols = ModuleSymbols.from_files({file_name: file_result})
+        return {name: {'symbols': symbols, 'file_count': 1, 'loc': 150, 'language': language}}
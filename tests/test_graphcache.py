@@ -0,0 +1,75 @@
+#  Copyright (c) 2021 Uber Technologies, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from uberpoet.filegen import Language
+from uberpoet.graphcache import DotGraphCache
+from uberpoet.moduletree import ModuleNode
+
+from .utils import write_file
+
+
+class TestDotGraphCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.dot_path = os.path.join(self.cache_dir, 'graph.gv')
+        write_file(self.dot_path, '"//a:A" -> "//b:B";\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_round_trip(self):
+        lib0 = ModuleNode('Lib0', ModuleNode.LIBRARY)
+        lib1 = ModuleNode('Lib1', ModuleNode.LIBRARY, [lib0])
+        lib1.code_units = 3
+        lib1.language = Language.OBJC
+        app = ModuleNode('App', ModuleNode.APP, [lib1, lib0])
+
+        cache = DotGraphCache(self.cache_dir)
+        key = cache.key(self.dot_path, ['test'], 'App')
+        self.assertIsNone(cache.load(key))
+        cache.save(key, app, [lib0, lib1, app])
+
+        cached_app, cached_nodes = DotGraphCache(self.cache_dir).load(key)
+        self.assertEqual(cached_nodes, [lib0, lib1, app])
+        self.assertIs(cached_app, cached_nodes[2])
+        self.assertEqual(cached_app.deps, [lib1, lib0])
+        self.assertIs(cached_app.deps[0], cached_nodes[1])
+        self.assertEqual(cached_nodes[1].code_units, 3)
+        self.assertEqual([n.language for n in cached_nodes], [None, Language.OBJC, None])
+
+    def test_key(self):
+        cache = DotGraphCache(self.cache_dir)
+        key = cache.key(self.dot_path, ['test', 'assets'], 'App')
+        self.assertEqual(key, cache.key(self.dot_path, ['assets', 'test'], 'App'))
+        self.assertNotEqual(key, cache.key(self.dot_path, ['test'], 'App'))
+        self.assertNotEqual(key, cache.key(self.dot_path, ['test', 'assets'], None))
+        self.assertNotEqual(key, cache.key(self.dot_path, ['test', 'assets'], 'App', condense_cycles=True))
+
+        write_file(self.dot_path, '"//a:A" -> "//c:C";\n')
+        self.assertNotEqual(key, cache.key(self.dot_path, ['test', 'assets'], 'App'))
+
+    def test_corrupt_entry_is_ignored(self):
+        cache = DotGraphCache(self.cache_dir)
+        key = cache.key(self.dot_path, [], 'App')
+        os.makedirs(cache.dir)
+        write_file(cache.entry_path(key), '{"nodes": [')
+        self.assertIsNone(cache.load(key))
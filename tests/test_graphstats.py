@@ -0,0 +1,100 @@
+#  Copyright (c) 2021 Uber Technologies, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+from StringIO import StringIO
+
+import mock
+
+from uberpoet.commandlineutil import AppGenerationConfig
+from uberpoet.genproj import print_graph_stats
+from uberpoet.graphstats import GraphStats
+from uberpoet.moduletree import ModuleNode
+
+
+class TestGraphStats(unittest.TestCase):
+
+    def setUp(self):
+        self.a = ModuleNode('A', ModuleNode.LIBRARY)
+        self.b = ModuleNode('B', ModuleNode.LIBRARY)
+        self.c = ModuleNode('C', ModuleNode.LIBRARY, [self.a])
+        self.d = ModuleNode('D', ModuleNode.LIBRARY, [self.a, self.c])
+        self.app = ModuleNode('App', ModuleNode.APP, [self.b, self.d])
+        self.b.code_units = 5
+        self.nodes = [self.app, self.d, self.c, self.b, self.a]
+
+    def test_graph_stats(self):
+        stats = GraphStats(self.app, self.nodes, count_transitive_edges=True)
+
+        self.assertEqual(stats.module_count, 5)
+        self.assertEqual(stats.edge_count, 5)
+        self.assertEqual(stats.level_widths, [2, 1, 1, 1])
+        self.assertEqual(stats.max_fan_in, 2)
+        self.assertEqual(stats.max_fan_out, 2)
+        self.assertEqual(stats.average_fan, 1.0)
+        # App reaches 4 modules, D 2 and C 1
+        self.assertEqual(stats.transitive_edge_count, 7)
+        self.assertIsNone(stats.loc_path)
+        self.assertIn('transitive dependencies: 7', stats.report())
+
+        stats = GraphStats(self.app, self.nodes)
+        self.assertIsNone(stats.transitive_edge_count)
+        self.assertNotIn('transitive', stats.report())
+
+    def test_critical_path(self):
+        stats = GraphStats(self.app, self.nodes, loc_for_module={'A': 100, 'B': 100, 'C': 100, 'D': 100})
+
+        path = stats.code_units_path
+        self.assertEqual(path.modules, ['B', 'App'])
+        self.assertEqual(path.weight, 6)
+        self.assertEqual(path.total_weight, 9)
+        self.assertEqual(path.parallelism(), 1.5)
+        self.assertEqual(path.speedup_bound(1), 1.0)
+        self.assertEqual(path.speedup_bound(4), 1.5)
+
+        path = stats.loc_path
+        self.assertEqual(path.modules, ['A', 'C', 'D', 'App'])
+        self.assertEqual(path.weight, 300)
+        self.assertEqual(path.total_weight, 400)
+
+        report = stats.report()
+        self.assertIn('Critical path by code units: 6 of 9 over 2 modules (B -> ... -> App)', report)
+        self.assertIn('Critical path by LOC: 300 of 400', report)
+
+    def test_layered_graph_stats(self):
+        app_node, node_list = ModuleNode.gen_layered_graph(4, 10, deps_per_node=3)
+        stats = GraphStats(app_node, node_list, count_transitive_edges=True)
+
+        self.assertEqual(stats.module_count, 41)
+        self.assertEqual(stats.edge_count, 3 * 30 + 10)
+        self.assertEqual(stats.level_widths[-1], 1)
+        self.assertEqual(stats.code_units_path.weight, len(stats.level_widths))
+        self.assertGreaterEqual(stats.transitive_edge_count, stats.edge_count)
+
+    def test_print_graph_stats_without_lines_of_code(self):
+        report = self.print_graph_stats(self.app, self.nodes, AppGenerationConfig())
+        self.assertIn('Critical path by code units: 6 of 9', report)
+        self.assertNotIn('Critical path by LOC', report)
+
+    def test_print_graph_stats_without_libraries(self):
+        app = ModuleNode('App', ModuleNode.APP)
+        report = self.print_graph_stats(app, [app], AppGenerationConfig(swift_lines_of_code=1000))
+        self.assertIn('Modules: 1, dependencies: 0', report)
+        self.assertNotIn('Critical path by LOC', report)
+
+    @staticmethod
+    def print_graph_stats(app_node, node_list, graph_config):
+        with mock.patch('sys.stdout', new_callable=StringIO) as stdout:
+            print_graph_stats(app_node, node_list, graph_config)
+        return stdout.getvalue()
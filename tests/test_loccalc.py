@@ -12,10 +12,13 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import os
+import shutil
+import tempfile
 import unittest
 
-from uberpoet.filegen import Language
-from uberpoet.loccalc import LOCCalculator
+from uberpoet.filegen import Language, ObjCSourceFileGenerator, SwiftFileGenerator
+from uberpoet.loccalc import LOCCalculator, LOCCalibrationCache
 
 
 class TestLOCCalculator(unittest.TestCase):
@@ -27,3 +30,50 @@ class TestLOCCalculator(unittest.TestCase):
     def test_calculate_loc_multiple_lines(self):
         loc_calc = LOCCalculator()
         self.assertEqual(loc_calc.calculate_loc('body\ntext', Language.SWIFT), 2)
+
+    def test_calculate_file_size_loc(self):
+        loc_calc = LOCCalculator(LOCCalibrationCache())
+        swift_gen = SwiftFileGenerator()
+        expected = loc_calc.calculate_loc(swift_gen.gen_file(3, 3).text, Language.SWIFT)
+        self.assertEqual(loc_calc.calculate_file_size_loc(swift_gen), expected)
+
+    def test_calibration_cache_is_persisted(self):
+        cache_dir = tempfile.mkdtemp()
+        try:
+            first = LOCCalculator(LOCCalibrationCache(cache_dir))
+            swift_loc = first.calculate_file_size_loc(SwiftFileGenerator())
+            objc_loc = first.calculate_file_size_loc(ObjCSourceFileGenerator())
+            self.assertTrue(os.path.exists(os.path.join(cache_dir, LOCCalibrationCache.FILE_NAME)))
+
+            cache = LOCCalibrationCache(cache_dir)
+            self.assertEqual(len(cache.entries), 2)
+            self.assertEqual(cache.get(cache.key(SwiftFileGenerator(), 3, 3)), swift_loc)
+            self.assertEqual(cache.get(cache.key(ObjCSourceFileGenerator(), 3, 3)), objc_loc)
+        finally:
+            shutil.rmtree(cache_dir)
+
+    def test_default_calibration_cache_is_in_cache_dir(self):
+        cache_dir = os.environ['UBERPOET_CACHE_DIR']  # Set to a temporary directory for the tests
+        self.assertEqual(LOCCalculator().calibration_cache.path, os.path.join(cache_dir, LOCCalibrationCache.FILE_NAME))
+
+    def test_calibration_cache_key_depends_on_templates(self):
+
+        class LongerSwiftFileGenerator(SwiftFileGenerator):
+
+            @staticmethod
+            def templates():
+                return SwiftFileGenerator.templates() + ("// more",)
+
+        cache = LOCCalibrationCache()
+        self.assertEqual(cache.key(SwiftFileGenerator(), 3, 3), cache.key(SwiftFileGenerator(), 3, 3))
+        self.assertNotEqual(cache.key(SwiftFileGenerator(), 3, 3), cache.key(LongerSwiftFileGenerator(), 3, 3))
+        self.assertNotEqual(cache.key(SwiftFileGenerator(), 3, 3), cache.key(SwiftFileGenerator(), 3, 4))
+
+    def test_unreadable_calibration_cache_is_ignored(self):
+        cache_dir = tempfile.mkdtemp()
+        try:
+            with open(os.path.join(cache_dir, LOCCalibrationCache.FILE_NAME), 'w') as f:
+                f.write('not json')
+            self.assertEqual(LOCCalibrationCache(cache_dir).entries, {})
+        finally:
+            shutil.rmtree(cache_dir)
@@ -0,0 +1,70 @@
+#  Copyright (c) 2021 Uber Technologies, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from uberpoet.filegen import Language
+from uberpoet.loccounter import LineCounter, LineCounts, count_path, count_text
+
+from .utils import write_file
+
+source = """
+// A comment
+import Foundation
+
+/* A block comment
+   spanning lines
+
+   with a blank line */
+let a = 1 // trailing comment
+/* before */ let b = 2
+let c = 3 /* after */
+/* one */ /* two */
+"""
+
+
+class TestLOCCounter(unittest.TestCase):
+
+    def test_count_text(self):
+        self.assertEqual(count_text(source), LineCounts(code=4, blank=3, comment=5))
+
+    def test_count_text_without_trailing_newline(self):
+        self.assertEqual(count_text('body'), LineCounts(code=1))
+        self.assertEqual(count_text('body\ntext'), LineCounts(code=2))
+
+    def test_chunks_can_split_lines(self):
+        counter = LineCounter()
+        for i in xrange(0, len(source), 7):
+            counter.add(source[i:i + 7])
+        self.assertEqual(counter.finish(), count_text(source))
+
+    def test_count_path(self):
+        out_dir = tempfile.mkdtemp()
+        try:
+            os.makedirs(os.path.join(out_dir, 'Sources'))
+            write_file(os.path.join(out_dir, 'File0.swift'), source)
+            write_file(os.path.join(out_dir, 'Sources', 'File0.m'), 'int a;\n')
+            write_file(os.path.join(out_dir, 'Sources', 'File0.h'), '// header\n')
+            write_file(os.path.join(out_dir, 'BUILD'), 'not counted\n')
+
+            counts = count_path(out_dir)
+            self.assertEqual(counts[Language.SWIFT], count_text(source))
+            self.assertEqual(counts[Language.OBJC], LineCounts(code=1, comment=1))
+        finally:
+            shutil.rmtree(out_dir)
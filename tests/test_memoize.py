@@ -0,0 +1,104 @@
+#  Copyright (c) 2021 Uber Technologies, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+
+import unittest
+
+from uberpoet.memoize import LRUCache, memoized
+
+
+class Counter(object):
+
+    def __init__(self):
+        self.calls = 0
+
+    @memoized(max_size=2, per_instance=True)
+    def per_instance(self, value):
+        self.calls += 1
+        return len(value)
+
+    @memoized
+    def shared(self, value):
+        self.calls += 1
+        return len(value)
+
+
+class TestMemoize(unittest.TestCase):
+
+    def test_lru_eviction(self):
+        cache = LRUCache(max_size=2)
+        cache.store(('a',), 1)
+        cache.store(('b',), 2)
+        self.assertEqual(cache.lookup(('a',)), (True, 1))
+        cache.store(('c',), 3)  # Evicts b, the least recently used
+
+        self.assertEqual(cache.lookup(('b',)), (False, None))
+        self.assertEqual(cache.lookup(('c',)), (True, 3))
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['evictions'], stats['size']), (2, 1, 1, 2))
+        self.assertGreater(stats['bytes_held'], 0)
+
+        cache.clear()
+        self.assertEqual(cache.stats()['bytes_held'], 0)
+
+    def test_function(self):
+        calls = []
+
+        @memoized(max_size=None)
+        def double(x):
+            calls.append(x)
+            return x * 2
+
+        self.assertEqual([double(1), double(1), double(2)], [2, 2, 4])
+        self.assertEqual(calls, [1, 2])
+        self.assertEqual(double.stats()['hits'], 1)
+
+    def test_unhashable_arguments_are_not_cached(self):
+        lengths = memoized(len)
+        self.assertEqual(lengths([1, 2]), 2)
+        self.assertEqual(lengths.stats()['size'], 0)
+
+    def test_large_strings_are_keyed_by_digest(self):
+        counter = Counter()
+        text = 'x' * 10000
+        self.assertEqual(counter.per_instance(text), 10000)
+        self.assertEqual(counter.per_instance('x' * 10000), 10000)
+        self.assertEqual(counter.calls, 1)
+
+        key = next(iter(counter.per_instance.cache.entries))
+        self.assertNotIn(text, key)
+        self.assertLess(counter.per_instance.stats()['bytes_held'], len(text))
+
+    def test_per_instance_caches(self):
+        first, second = Counter(), Counter()
+        first.per_instance('a')
+        first.per_instance('a')
+        second.per_instance('a')
+
+        self.assertEqual((first.calls, second.calls), (1, 1))
+        self.assertEqual(first.per_instance.stats()['hits'], 1)
+        self.assertEqual(second.per_instance.stats()['hits'], 0)
+        # The method is only bound once per instance
+        self.assertIs(first.per_instance, first.per_instance)
+
+    def test_shared_cache_keys_on_instance(self):
+        first, second = Counter(), Counter()
+        first.shared('a')
+        first.shared('a')
+        second.shared('a')
+
+        self.assertEqual((first.calls, second.calls), (1, 1))
+        self.assertIs(first.shared.cache, second.shared.cache)
+        self.assertIs(Counter.shared.cache, first.shared.cache)
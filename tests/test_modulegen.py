@@ -0,0 +1,86 @@
+#  Copyright (c) 2021 Uber Technologies, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from uberpoet.filegen import Language
+from uberpoet.loccounter import count_path
+from uberpoet.modulegen import SymbolUsers, plan_modules
+from uberpoet.moduletree import ModuleGraph, ModuleNode
+
+from .utils import dir_contents, gen_app
+
+
+class TestModuleGen(unittest.TestCase):
+
+    def setUp(self):
+        self.out_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.out_dir)
+
+    def test_plan_modules(self):
+        nodes = [ModuleNode('MockLib{}'.format(i), ModuleNode.LIBRARY) for i in xrange(4)]
+        plans = plan_modules(nodes, 3000, 1000, None)
+
+        self.assertEqual([p.node for p in plans], nodes)
+        self.assertEqual([p.loc for p in plans], [1000] * 4)
+        self.assertEqual([p.language for p in plans], [Language.SWIFT] * 3 + [Language.OBJC])
+
+    def test_plan_modules_keeps_known_languages(self):
+        nodes = [ModuleNode('MockLib{}'.format(i), ModuleNode.LIBRARY) for i in xrange(4)]
+        nodes[0].language = Language.OBJC
+        plans = plan_modules(nodes, 3000, 1000, None)
+
+        self.assertEqual([p.language for p in plans], [Language.OBJC] + [Language.SWIFT] * 2 + [Language.OBJC])
+
+    def test_plan_modules_of_module_graph(self):
+        graph = ModuleGraph.from_deps(['MockLib0', 'MockLib1', 'MockLib2', 'App'], [[], [0], [], [1, 2]], 3,
+                                      [1, 2, 1, 1])
+        plans = plan_modules(graph, 3000, 1000, None)
+
+        self.assertEqual([p.node.name for p in plans], ['MockLib0', 'MockLib1', 'MockLib2'])
+        self.assertEqual([n.name for n in plans[1].node.deps], ['MockLib0'])
+        self.assertEqual([p.loc for p in plans], [1000] * 3)
+        self.assertEqual([p.language for p in plans], [Language.SWIFT] * 3)
+
+    def test_symbol_users(self):
+        nodes = [ModuleNode('MockLib{}'.format(i), ModuleNode.LIBRARY) for i in xrange(4)]
+        nodes[1].deps = [nodes[0]]
+        nodes[2].deps = [nodes[0], nodes[1]]
+        symbol_users = SymbolUsers(plan_modules(nodes, 3000, 1000, None), keep_symbols=['MockLib2'])
+
+        self.assertEqual(symbol_users.generated(nodes[0]), [])
+        self.assertEqual(symbol_users.generated(nodes[1]), [])
+        # MockLib2 is the last user of MockLib0 and MockLib1, and is kept itself even though nothing uses it
+        self.assertEqual(symbol_users.generated(nodes[2]), ['MockLib0', 'MockLib1'])
+        self.assertEqual(symbol_users.generated(nodes[3]), ['MockLib3'])
+
+    def test_parallel_output_matches_serial(self):
+        gen_app(os.path.join(self.out_dir, 'serial'), jobs=1)
+        gen_app(os.path.join(self.out_dir, 'parallel'), jobs=3)
+        serial = dir_contents(os.path.join(self.out_dir, 'serial'))
+
+        self.assertGreater(len(serial), 0)
+        self.assertEqual(serial, dir_contents(os.path.join(self.out_dir, 'parallel')))
+
+    def test_line_counts_match_generated_files(self):
+        app_root = os.path.join(self.out_dir, 'app')
+        _, line_counts = gen_app(app_root)
+        self.assertEqual(line_counts, count_path(app_root))
@@ -14,9 +14,7 @@
 
 import unittest
 
-from toposort import toposort_flatten
-
-from uberpoet.moduletree import ModuleNode
+from uberpoet.moduletree import ModuleGraph, ModuleNode
 
 
 class TestModuleTree(unittest.TestCase):
@@ -33,10 +31,108 @@ class TestModuleTree(unittest.TestCase):
         self.assertEqual(len(nodes), 19 + 1)
         self.assertEqual(ModuleNode.APP, root.node_type)
 
+    def test_topological_sort(self):
+        a = ModuleNode('A', ModuleNode.LIBRARY)
+        b = ModuleNode('B', ModuleNode.LIBRARY)
+        c = ModuleNode('C', ModuleNode.LIBRARY, [a])
+        d = ModuleNode('D', ModuleNode.LIBRARY, [a, c])
+        app = ModuleNode('App', ModuleNode.APP, [d, b, c])
+
+        # Dependencies missing from the list are sorted as well
+        self.assertEqual(ModuleNode.topological_sort([app, d, c, b]), ([b, a, c, d, app], [0, 0, 1, 2, 3]))
+        self.assertEqual(ModuleNode.topological_sort([]), ([], []))
+
+    def test_topological_sort_with_cycle(self):
+        a = ModuleNode('A', ModuleNode.LIBRARY)
+        b = ModuleNode('B', ModuleNode.LIBRARY, [a])
+        c = ModuleNode('C', ModuleNode.LIBRARY, [b])
+        a.deps = [c]
+        app = ModuleNode('App', ModuleNode.APP, [a])
+
+        with self.assertRaises(ValueError) as context:
+            ModuleNode.topological_sort([app, a, b, c])
+        self.assertIn('A -> C -> B -> A, 4 modules', str(context.exception))
+
+    def test_transitive_reduction(self):
+        a = ModuleNode('A', ModuleNode.LIBRARY)
+        b = ModuleNode('B', ModuleNode.LIBRARY, [a])
+        c = ModuleNode('C', ModuleNode.LIBRARY, [a, b])
+        d = ModuleNode('D', ModuleNode.LIBRARY, [a, c, b, a])
+        e = ModuleNode('E', ModuleNode.LIBRARY, [a])
+        app = ModuleNode('App', ModuleNode.APP, [d, e, b])
+
+        removed = ModuleNode.transitive_reduction(app, [app, a, b, c, d, e])
+        self.assertEqual([n.deps for n in [a, b, c, d, e, app]], [[], [a], [b], [c], [a], [d, e]])
+        removed_names = sorted((n.name, dep.name) for n, dep in removed)
+        self.assertEqual(removed_names, [('App', 'B'), ('C', 'A'), ('D', 'A'), ('D', 'A'), ('D', 'B')])
+
+    def test_transitive_reduction_keeps_reachability(self):
+        root, nodes = ModuleNode.gen_layered_graph(6, 8, deps_per_node=4)
+
+        def reachable(node, seen):
+            for dep in node.deps:
+                if dep not in seen:
+                    seen.add(dep)
+                    reachable(dep, seen)
+            return seen
+
+        reachable_before = {n.name: reachable(n, set()) for n in nodes}
+        edge_count = sum(len(n.deps) for n in nodes)
+        removed = ModuleNode.transitive_reduction(root, nodes)
+
+        self.assertEqual(sum(len(n.deps) for n in nodes), edge_count - len(removed))
+        self.assertEqual({n.name: reachable(n, set()) for n in nodes}, reachable_before)
+        for n in nodes:
+            for dep in n.deps:
+                # No dependency can be reached through another one
+                self.assertFalse(any(dep in reachable(other, set()) for other in n.deps))
+
+    def test_module_graph_from_dep_map(self):
+        dep_map = {'App': ['B', 'C'], 'B': ['C', 'D'], 'C': ['D'], 'E': ['C']}
+        graph = ModuleGraph.from_dep_map(dep_map, 'App', code_units={'C': 3})
+
+        self.assertEqual(graph.names, ['App', 'B', 'C', 'D'])  # E can't be reached from App
+        self.assertEqual(list(graph.dep_offsets), [0, 2, 4, 5, 5])
+        self.assertEqual(list(graph.dep_targets), [1, 2, 2, 3, 3])
+        self.assertEqual(list(graph.deps(graph.id_of('B'))), [2, 3])
+        self.assertEqual(list(graph.code_units), [1, 1, 3, 1])
+        self.assertEqual(graph.edge_count(), 5)
+
+        root, nodes = graph.module_nodes()
+        self.assertEqual(root.node_type, ModuleNode.APP)
+        self.assertEqual([d.name for d in root.deps], ['B', 'C'])
+        self.assertIs(root.deps[0].deps[0], root.deps[1])
+        self.assertEqual(nodes[2].code_units, 3)
+        self.assertEqual([n.node_type for n in nodes[1:]], [ModuleNode.LIBRARY] * 3)
+
+    def test_module_graph_from_module_nodes(self):
+        root, nodes = ModuleNode.gen_layered_big_small_graph(3, 9)
+        new_root, new_nodes = ModuleGraph.from_module_nodes(root, nodes).module_nodes()
+
+        self.assertEqual(new_root, root)
+        self.assertEqual(new_nodes, nodes)
+        self.assertEqual([n.deps for n in new_nodes], [n.deps for n in nodes])
+        self.assertEqual([n.code_units for n in new_nodes], [n.code_units for n in nodes])
+
+    def test_module_graph_gen_layered_graph(self):
+        graph = ModuleGraph.gen_layered_graph(4, 3, deps_per_node=2)
+
+        self.assertEqual(graph.node_count(), 4 * 3 + 1)
+        self.assertEqual(graph.names[graph.app_id], 'App')
+        self.assertEqual(list(graph.deps(graph.app_id)), [9, 10, 11])
+        for node_id in xrange(graph.node_count()):
+            # Ids are in topological order
+            self.assertTrue(all(d < node_id for d in graph.deps(node_id)))
+        self.assertEqual(len(graph.deps(graph.id_of('MockLib2_0'))), 2)
+        self.assertEqual(len(graph.deps(graph.id_of('MockLib3_0'))), 0)
+
     def verify_graph(self, nodes):
         # The generated layered graphs add dependencies randomly to modules within each layer.
         # Because of that, we cannot always specify a fixed expected list of nodes without making
-        # tests indeterministic. Instead, we verify topological sorting by re-creating the same graph,
-        # sorting it topologicaly and assert the two lists to be the same.
-        graph = {n: set(n.deps) for n in nodes}
-        self.assertEqual(toposort_flatten(graph), nodes)
+        # tests indeterministic. Instead, we verify the list is topologically sorted: every module
+        # comes after all of its dependencies.
+        seen = set()
+        for n in nodes:
+            self.assertTrue(all(d in seen for d in n.deps))
+            seen.add(n)
+        self.assertEqual(len(seen), len(nodes))
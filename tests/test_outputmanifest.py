@@ -0,0 +1,134 @@
+#  Copyright (c) 2021 Uber Technologies, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from uberpoet.outputmanifest import OutputManifest
+
+from .utils import gen_app, read_file
+
+
+class TestOutputManifest(unittest.TestCase):
+
+    def setUp(self):
+        self.out_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.out_dir)
+
+    def test_only_changed_files_are_written(self):
+        a_path = os.path.join(self.out_dir, 'A', 'a.txt')
+        b_path = os.path.join(self.out_dir, 'B', 'b.txt')
+
+        manifest = OutputManifest.load(self.out_dir)
+        manifest.write_file(a_path, 'a')
+        manifest.write_file(b_path, 'b')
+        manifest.finish()
+        self.assertEqual(manifest.written, 2)
+
+        manifest = OutputManifest.load(self.out_dir)
+        manifest.write_file(a_path, 'a')
+        manifest.write_file(b_path, 'changed')
+        manifest.finish()
+        self.assertEqual(manifest.written, 1)
+        self.assertEqual(manifest.unchanged, 1)
+        self.assertEqual(read_file(b_path), 'changed')
+
+    def test_orphans_are_deleted(self):
+        a_path = os.path.join(self.out_dir, 'A', 'a.txt')
+        b_path = os.path.join(self.out_dir, 'B', 'Sources', 'b.txt')
+        other_path = os.path.join(self.out_dir, 'other.txt')
+
+        manifest = OutputManifest.load(self.out_dir)
+        manifest.write_file(a_path, 'a')
+        manifest.write_file(b_path, 'b')
+        manifest.finish()
+        with open(other_path, 'w') as f:
+            f.write('not generated')
+
+        manifest = OutputManifest.load(self.out_dir)
+        manifest.write_file(a_path, 'a')
+        manifest.finish()
+
+        self.assertTrue(os.path.exists(a_path))
+        self.assertFalse(os.path.exists(os.path.join(self.out_dir, 'B')))
+        self.assertTrue(os.path.exists(other_path))
+
+    def test_missing_file_is_rewritten(self):
+        a_path = os.path.join(self.out_dir, 'a.txt')
+
+        manifest = OutputManifest.load(self.out_dir)
+        manifest.write_file(a_path, 'a')
+        manifest.finish()
+        os.remove(a_path)
+
+        manifest = OutputManifest.load(self.out_dir)
+        manifest.write_file(a_path, 'a')
+        manifest.finish()
+        self.assertEqual(read_file(a_path), 'a')
+
+    def test_edited_file_is_rewritten(self):
+        a_path = os.path.join(self.out_dir, 'a.txt')
+        b_path = os.path.join(self.out_dir, 'b.txt')
+
+        manifest = OutputManifest.load(self.out_dir)
+        manifest.write_file(a_path, 'aaaa')
+        manifest.write_file(b_path, 'bbbb')
+        manifest.finish()
+        with open(a_path, 'w') as f:
+            f.write('edited')
+        with open(b_path, 'w') as f:
+            f.write('xxxx')
+        os.utime(b_path, (0, 0))
+
+        manifest = OutputManifest.load(self.out_dir)
+        manifest.write_file(a_path, 'aaaa')
+        manifest.write_file(b_path, 'bbbb')
+        manifest.finish()
+        self.assertEqual(manifest.written, 2)
+        self.assertEqual(read_file(a_path), 'aaaa')
+        self.assertEqual(read_file(b_path), 'bbbb')
+
+        manifest = OutputManifest.load(self.out_dir)
+        manifest.write_file(a_path, 'aaaa')
+        manifest.write_file(b_path, 'bbbb')
+        manifest.finish()
+        self.assertEqual(manifest.unchanged, 2)
+
+    def test_regeneration_is_incremental(self):
+        app_root = os.path.join(self.out_dir, 'app')
+        gen_app(app_root, 6)
+        mtimes = self.mtimes(app_root)
+
+        gen, _ = gen_app(app_root, 6)
+        self.assertEqual(gen.output.written, 0)
+        self.assertEqual(self.mtimes(app_root), mtimes)
+
+        gen_app(app_root, 4)
+        self.assertFalse(os.path.exists(os.path.join(app_root, 'MockLib5')))
+        self.assertTrue(os.path.exists(os.path.join(app_root, 'MockLib3')))
+
+    @staticmethod
+    def mtimes(root):
+        mtimes = {}
+        for dir_path, _, file_names in os.walk(root):
+            for file_name in file_names:
+                path = os.path.join(dir_path, file_name)
+                mtimes[path] = os.stat(path).st_mtime
+        return mtimes
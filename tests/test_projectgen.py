@@ -0,0 +1,71 @@
+#  Copyright (c) 2021 Uber Technologies, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from uberpoet.blazeprojectgen import BlazeProjectGenerator
+from uberpoet.cpprojectgen import CocoaPodsProjectGenerator
+
+from .utils import dir_contents, gen_app, mock_graph
+
+
+class TestProjectGen(unittest.TestCase):
+
+    def setUp(self):
+        self.out_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.out_dir)
+
+    def test_blaze_wmo_toggle_only_renders_build_files(self):
+        self.verify_wmo_toggle(lambda app_root: BlazeProjectGenerator(app_root, '/apps/mockapp', flavor='bazel'))
+
+    def test_cocoapods_wmo_toggle_only_renders_build_files(self):
+        self.verify_wmo_toggle(lambda app_root: CocoaPodsProjectGenerator(app_root))
+
+    def test_blaze_gen_app_from_module_graph(self):
+        self.verify_gen_app_from_module_graph(
+            lambda app_root: BlazeProjectGenerator(app_root, '/apps/mockapp', flavor='bazel'))
+
+    def test_cocoapods_gen_app_from_module_graph(self):
+        self.verify_gen_app_from_module_graph(lambda app_root: CocoaPodsProjectGenerator(app_root))
+
+    def verify_gen_app_from_module_graph(self, make_generator):
+        node_root = os.path.join(self.out_dir, 'nodes')
+        gen_app(node_root, make_generator=make_generator)
+        graph_root = os.path.join(self.out_dir, 'graph')
+        gen_app(graph_root, make_generator=make_generator, use_module_graph=True)
+
+        self.assertEqual(dir_contents(graph_root), dir_contents(node_root))
+
+    def verify_wmo_toggle(self, make_generator):
+        toggled_root = os.path.join(self.out_dir, 'toggled')
+        gen, _ = gen_app(toggled_root, make_generator=make_generator)
+        gen.use_wmo = True
+        gen.gen_build_files(*mock_graph())
+
+        def make_wmo_generator(app_root):
+            wmo_gen = make_generator(app_root)
+            wmo_gen.use_wmo = True
+            return wmo_gen
+
+        fresh_root = os.path.join(self.out_dir, 'fresh')
+        gen_app(fresh_root, make_generator=make_wmo_generator)
+
+        self.assertEqual(dir_contents(toggled_root), dir_contents(fresh_root))
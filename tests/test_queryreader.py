@@ -0,0 +1,154 @@
+#  Copyright (c) 2021 Uber Technologies, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from uberpoet.filegen import Language
+from uberpoet.moduletree import ModuleNode
+from uberpoet.queryreader import BazelQueryReader, BuckQueryReader, TargetCategory
+
+from .utils import write_file
+
+
+def bazel_rule(name, rule_class, inputs=(), srcs=()):
+    attributes = [{"name": "srcs", "type": "LABEL_LIST", "stringListValue": list(srcs)}] if srcs else []
+    rule = {"name": name, "ruleClass": rule_class, "attribute": attributes, "ruleInput": list(inputs) + list(srcs)}
+    return json.dumps({"type": "RULE", "rule": rule})
+
+
+bazel_output = '\n'.join([
+    bazel_rule('//app:App', 'ios_application', ['//app:AppLib', '//app:Info.plist']),
+    bazel_rule('//app:AppLib', 'swift_library', ['//lib:Lib', '//lib:LibResources'],
+               ['//app:A.swift', '//app:B.swift']),
+    json.dumps({
+        "type": "SOURCE_FILE",
+        "sourceFile": {
+            "name": "//app:A.swift"
+        }
+    }),
+    bazel_rule('//lib:Lib', 'objc_library', ['@build_bazel_rules_swift//toolchains:default_toolchain'],
+               ['//lib:L.h', '//lib:L.m', '//lib:M.m']),
+    bazel_rule('//lib:LibResources', 'apple_resource_bundle'),
+    bazel_rule('//lib:LibTests', 'ios_unit_test', ['//lib:Lib']),
+    bazel_rule('@build_bazel_rules_swift//toolchains:default_toolchain', 'swift_toolchain'),
+]) + '\n'
+
+buck_output = json.dumps({
+    "//app:App": {
+        "buck.type": "apple_bundle",
+        "deps": ["//app:AppBinary"]
+    },
+    "//app:AppBinary": {
+        "buck.type": "apple_binary",
+        "deps": ["//app:AppLib"]
+    },
+    "//app:AppLib": {
+        "buck.type": "apple_library",
+        "srcs": ["A.swift", ["B.m", ["-fno-objc-arc"]]],
+        "deps": ["//lib:Lib", "//lib:LibAssets"],
+        "exported_deps": ["//lib:Core"]
+    },
+    "//lib:Lib": {
+        "buck.type": "apple_library",
+        "srcs": ["L.m", "M.m"]
+    },
+    "//lib:Core": {
+        "buck.type": "apple_library",
+        "srcs": {
+            "C.swift": "C.swift"
+        }
+    },
+    "//lib:LibAssets": {
+        "buck.type": "apple_asset_catalog"
+    },
+})
+
+
+class TestQueryReader(unittest.TestCase):
+
+    def read(self, reader, text, root_node_name=None):
+        out_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(out_dir, 'query.json')
+            write_file(path, text)
+            return reader.read_query_file(path, root_node_name)
+        finally:
+            shutil.rmtree(out_dir)
+
+    def test_target_category(self):
+        self.assertEqual(TargetCategory.of_target('swift_library', {}), TargetCategory.SWIFT_LIBRARY)
+        self.assertEqual(TargetCategory.of_target('objc_library', {}), TargetCategory.OBJC_LIBRARY)
+        self.assertEqual(
+            TargetCategory.of_target('apple_library', {
+                Language.SWIFT: 1,
+                Language.OBJC: 2
+            }), TargetCategory.OBJC_LIBRARY)
+        self.assertEqual(TargetCategory.of_target('apple_library', {Language.SWIFT: 1}), TargetCategory.SWIFT_LIBRARY)
+        self.assertEqual(TargetCategory.of_target('ios_application', {}), TargetCategory.APP)
+        self.assertEqual(TargetCategory.of_target('apple_resource', {}), TargetCategory.RESOURCE)
+        self.assertEqual(TargetCategory.of_target('ios_unit_test', {}), TargetCategory.TEST)
+        self.assertEqual(TargetCategory.of_target('genrule', {}), TargetCategory.OTHER)
+
+    def test_read_bazel_streamed_jsonproto(self):
+        reader = BazelQueryReader()
+        root, nodes = self.read(reader, bazel_output)
+
+        self.assertEqual(root.name, 'App')
+        self.assertEqual(root.node_type, ModuleNode.APP)
+        self.assertEqual([n.name for n in root.deps], ['AppLib'])
+        nodes_by_name = {n.name: n for n in nodes}
+        self.assertEqual(sorted(nodes_by_name), ['App', 'AppLib', 'Lib'])
+        self.assertEqual([n.name for n in nodes_by_name['AppLib'].deps], ['Lib'])
+        self.assertEqual(nodes_by_name['AppLib'].code_units, 2)
+        self.assertEqual(nodes_by_name['Lib'].code_units, 3)
+        self.assertEqual(nodes_by_name['Lib'].deps, [])
+        self.assertEqual(reader.target_kinds['Lib'], 'objc_library')
+        self.assertEqual([nodes_by_name[name].language for name in ('App', 'AppLib', 'Lib')],
+                         [None, Language.SWIFT, Language.OBJC])
+
+    def test_read_buck_json(self):
+        reader = BuckQueryReader()
+        root, nodes = self.read(reader, buck_output, 'App')
+
+        self.assertEqual(root.node_type, ModuleNode.APP)
+        nodes_by_name = {n.name: n for n in nodes}
+        self.assertEqual(sorted(nodes_by_name), ['App', 'AppBinary', 'AppLib', 'Core', 'Lib'])
+        self.assertEqual(sorted(n.name for n in nodes_by_name['AppLib'].deps), ['Core', 'Lib'])
+        self.assertEqual(nodes_by_name['AppLib'].code_units, 2)
+        self.assertEqual(nodes_by_name['Core'].code_units, 1)
+        self.assertEqual(reader.target_kinds['AppBinary'], 'apple_binary')
+        self.assertEqual([nodes_by_name[name].language for name in ('AppBinary', 'AppLib', 'Core', 'Lib')],
+                         [None, Language.SWIFT, Language.SWIFT, Language.OBJC])
+
+    def test_read_identical_names(self):
+        text = json.dumps({
+            "//app:App": {
+                "buck.type": "apple_bundle",
+                "deps": ["//a:Lib", "//b:Lib"]
+            },
+            "//a:Lib": {
+                "buck.type": "apple_library"
+            },
+            "//b:Lib": {
+                "buck.type": "apple_library"
+            },
+        })
+        with self.assertRaises(ValueError):
+            self.read(BuckQueryReader(), text)
@@ -14,6 +14,10 @@
 
 import os
 
+from uberpoet.blazeprojectgen import BlazeProjectGenerator
+from uberpoet.moduletree import ModuleGraph, ModuleNode
+from uberpoet.outputmanifest import OutputManifest
+
 
 def do_nothing(_):
     pass
@@ -34,3 +38,47 @@ def read_file(path):
 def write_file(path, text):
     with open(path, 'w') as f:
         f.write(text)
+
+
+def dir_contents(root):
+    """
+    Returns the {path relative to `root`: file content} of every file under `root`, except the output manifest, which
+    records file mtimes.
+    """
+    contents = {}
+    for dir_path, _, file_names in os.walk(root):
+        for file_name in file_names:
+            if file_name == OutputManifest.MANIFEST_FILE_NAME:
+                continue
+            path = os.path.join(dir_path, file_name)
+            contents[os.path.relpath(path, root)] = read_file(path)
+    return contents
+
+
+def mock_graph(module_count=6):
+    """
+    Returns the (app node, node list) of a graph of `module_count` libraries that each depend on the up to 3
+    libraries before them, and of an app that depends on the last two.
+    """
+    nodes = [ModuleNode('MockLib{}'.format(i), ModuleNode.LIBRARY) for i in xrange(module_count)]
+    for i, node in enumerate(nodes):
+        node.deps = nodes[max(0, i - 3):i]
+    app_node = ModuleNode('App', ModuleNode.APP, nodes[-2:])
+    return app_node, nodes + [app_node]
+
+
+def gen_app(app_root, module_count=6, jobs=1, make_generator=None, use_module_graph=False):
+    """
+    Generates the app of `mock_graph(module_count)` into `app_root` with 4000 Swift and 2000 Objective-C lines of
+    code, by default with a Bazel `BlazeProjectGenerator`.  `make_generator(app_root)` makes another generator, and
+    `use_module_graph` passes the graph as a `ModuleGraph`.  Returns the generator and the generated line counts.
+    """
+    if make_generator is None:
+        gen = BlazeProjectGenerator(app_root, '/apps/mockapp', flavor='bazel', jobs=jobs)
+    else:
+        gen = make_generator(app_root)
+    app_node, node_list = mock_graph(module_count)
+    if use_module_graph:
+        app_node, node_list = ModuleGraph.from_module_nodes(app_node, node_list), None
+    line_counts = gen.gen_app(app_node, node_list, 4000, 2000, None)
+    return gen, line_counts
@@ -15,37 +15,41 @@
 from __future__ import absolute_import
 
 import json
-import math
-import shutil
+import logging
+from collections import OrderedDict
 from os.path import basename, dirname, join
 
-from . import locreader
-from .filegen import Language, ObjCHeaderFileGenerator, ObjCSourceFileGenerator, SwiftFileGenerator
+from . import modulegen
+from .filegen import (ImportCallCache, Language, ModuleSymbols, ObjCHeaderFileGenerator, ObjCSourceFileGenerator,
+                      SwiftFileGenerator)
 from .loccalc import LOCCalculator
+from .loccounter import LineCounts
 from .moduletree import ModuleNode
-from .util import first_in_dict, first_key, makedir
+from .outputmanifest import OutputManifest
+from .util import IdAllocator, makedir
 
 
 class BlazeProjectGenerator(object):
     DIR_NAME = dirname(__file__)
     RESOURCE_DIR = join(DIR_NAME, "resources")
 
-    def __init__(self, app_root, blaze_app_root, use_wmo=False, flavor='buck'):
+    def __init__(self, app_root, blaze_app_root, use_wmo=False, flavor='buck', call_budget=None, jobs=1):
         self.app_root = app_root
         self.blaze_app_root = blaze_app_root
         self.bzl_lib_template = self.load_resource("mock{}libtemplate.bzl".format(flavor))
         self.bzl_app_template = self.load_resource("mock{}apptemplate.bzl".format(flavor))
         self.app_delegate_template = self.load_resource("mockappdelegate")
-        self.swift_gen = SwiftFileGenerator()
-        self.objc_source_gen = ObjCSourceFileGenerator()
+        self.jobs = jobs
+        self.output = OutputManifest(app_root)
+        self.call_cache = ImportCallCache()
+        self.swift_gen = SwiftFileGenerator(self.call_cache, call_budget)
+        self.objc_source_gen = ObjCSourceFileGenerator(self.call_cache, call_budget)
         self.objc_header_gen = ObjCHeaderFileGenerator()
         self.loc_calc = LOCCalculator()
         self.use_wmo = use_wmo
         self.flavor = flavor
-        self.swift_file_size_loc = self.loc_calc.calculate_loc(
-            self.swift_gen.gen_file(3, 3).text, self.swift_gen.language())
-        self.objc_file_size_loc = self.loc_calc.calculate_loc(
-            self.objc_source_gen.gen_file(3, 3).text, self.objc_source_gen.language())
+        self.swift_file_size_loc = self.loc_calc.calculate_file_size_loc(self.swift_gen)
+        self.objc_file_size_loc = self.loc_calc.calculate_file_size_loc(self.objc_source_gen)
 
     @property
     def wmo_state(self):
@@ -56,20 +60,16 @@ class BlazeProjectGenerator(object):
         with open(join(BlazeProjectGenerator.RESOURCE_DIR, name), "r") as f:
             return f.read()
 
-    @staticmethod
-    def copy_resource(name, dest):
+    def copy_resource(self, name, dest):
         origin = join(BlazeProjectGenerator.RESOURCE_DIR, name)
-        shutil.copyfile(origin, dest)
+        self.output.copy_file(origin, dest)
 
-    @staticmethod
-    def copy_resource_dir(name, dest):
+    def copy_resource_dir(self, name, dest):
         origin = join(BlazeProjectGenerator.RESOURCE_DIR, name)
-        shutil.copytree(origin, dest)
+        self.output.copy_dir(origin, dest)
 
-    @staticmethod
-    def write_file(path, text):
-        with open(path, "w") as f:
-            f.write(text)
+    def write_file(self, path, text):
+        self.output.write_file(path, text)
 
     @staticmethod
     def make_list_str(items):
@@ -91,46 +91,26 @@ class BlazeProjectGenerator(object):
     # Generation Functions
 
     def gen_app(self, app_node, node_list, target_swift_loc, target_objc_loc, loc_json_file_path):
+        """
+        Generates the mock app into `app_root`, returns the {language: LineCounts} of the generated code.  `app_node`
+        can also be a `ModuleGraph`, with a `node_list` of None.
+        """
+        app_node, node_list = modulegen.module_node_view(app_node, node_list)
         library_node_list = [n for n in node_list if n.node_type == ModuleNode.LIBRARY]
+        self.call_cache.clear()
+        # Only rewrite what changed since the last generation into app_root
+        self.output = OutputManifest.load(self.app_root)
 
-        if loc_json_file_path:
-            loc_reader = locreader.LocFileReader()
-            loc_reader.read_loc_file(loc_json_file_path)
-            module_index = {}
-            for n in library_node_list:
-                loc = loc_reader.loc_for_module(n.name)
-                language = loc_reader.language_for_module(n.name)
-                module_index[n.name] = {
-                    "files": self.gen_lib_module(module_index, n, loc, language),
-                    "loc": loc,
-                    "language": language
-                }
-        else:
-            total_code_units = 0
-            for l in library_node_list:
-                total_code_units += l.code_units
-
-            total_loc = target_swift_loc + target_objc_loc
-            swift_module_count_percentage = round(float(target_swift_loc) / total_loc, 2)
-            loc_per_unit = total_loc / total_code_units
-
-            module_index = {}
-            max_swift_index = int(math.ceil((len(library_node_list) * swift_module_count_percentage)))
-            for idx, n in enumerate(library_node_list):
-                language = Language.OBJC if idx >= max_swift_index else Language.SWIFT
-                module_index[n.name] = {
-                    "files": self.gen_lib_module(module_index, n, loc_per_unit, language),
-                    "loc": loc_per_unit,
-                    "language": language
-                }
+        plans = modulegen.plan_modules(library_node_list, target_swift_loc, target_objc_loc, loc_json_file_path)
+        # The app delegate calls into the first dependency of the app, so its symbols have to outlive generation
+        module_index = modulegen.gen_lib_modules(self, plans, self.jobs, keep_symbols=[app_node.deps[0].name])
 
         app_module_dir = join(self.app_root, "App")
         makedir(app_module_dir)
 
-        app_build_file = "BUCK" if self.flavor == 'buck' else "BUILD"
         app_files = {
             "AppDelegate.swift": self.gen_app_main(app_node, module_index),
-            app_build_file: self.gen_app_build(app_node, library_node_list),
+            self.build_file_name: self.gen_app_build(app_node, library_node_list),
         }
 
         self.copy_resource("Info.plist", join(app_module_dir, "Info.plist"))
@@ -146,17 +126,39 @@ class BlazeProjectGenerator(object):
 
         if loc_json_file_path:
             # Copy the LOC file into the generated project.
-            shutil.copyfile(loc_json_file_path, join(self.app_root, basename(loc_json_file_path)))
-
-        serializable_module_index = {
-            key: {
-                "file_count": len(value["files"]),
-                "loc": value["loc"]
-            } for key, value in module_index.items()
-        }
+            self.output.copy_file(loc_json_file_path, join(self.app_root, basename(loc_json_file_path)))
+
+        self.write_file(
+            join(self.app_root, "module_index.json"), json.dumps(modulegen.serializable_module_index(module_index)))
+        self.output.finish()
+
+        logging.info("Import call cache: %d hits, %d misses, %d bytes saved", self.call_cache.hits,
+                     self.call_cache.misses, self.call_cache.bytes_saved)
+
+        line_counts = modulegen.total_line_counts(module_index, app_files)
+        for language, counts in sorted(line_counts.items()):
+            logging.info("Generated %s: %d code, %d blank, %d comment lines", language, counts.code, counts.blank,
+                         counts.comment)
+        return line_counts
+
+    def gen_build_files(self, app_node, node_list):
+        """
+        Re-renders only the build files of the app `gen_app` generated from the same nodes, ex: after toggling
+        `use_wmo`.  The generated sources are left as they are.
+        """
+        app_node, node_list = modulegen.module_node_view(app_node, node_list)
+        library_node_list = [n for n in node_list if n.node_type == ModuleNode.LIBRARY]
+        self.output = OutputManifest.load(self.app_root)
+        for module_node in library_node_list:
+            self.write_file(
+                join(self.app_root, module_node.name, self.build_file_name), self.gen_lib_build(module_node))
+        self.write_file(
+            join(self.app_root, "App", self.build_file_name), self.gen_app_build(app_node, library_node_list))
+        self.output.finish(delete_orphans=False)
 
-        with open(join(self.app_root, "module_index.json"), "w") as module_index_json_file:
-            json.dump(serializable_module_index, module_index_json_file)
+    @property
+    def build_file_name(self):
+        return "BUCK" if self.flavor == 'buck' else "BUILD"
 
     def gen_app_build(self, node, all_nodes):
         module_dep_list = self.make_dep_list([i.name for i in node.deps])
@@ -165,46 +167,51 @@ class BlazeProjectGenerator(object):
 
     def gen_app_main(self, app_node, module_index):
         importing_module_name = app_node.deps[0].name
-        file_index = first_in_dict(module_index[importing_module_name]["files"])
+        class_key, function_key = module_index[importing_module_name]["symbols"].first_function()
         language = module_index[importing_module_name]["language"]
-        class_key = first_key(file_index.classes)
-        class_index = first_in_dict(file_index.classes)
-        function_key = first_in_dict(class_index)[0]
         return self.swift_gen.gen_main(self.app_delegate_template, importing_module_name, class_key, function_key,
                                        language)
 
     # Library Generation
 
-    def gen_lib_module(self, module_index, module_node, loc_per_unit, language):
+    def file_count(self, module_node, loc_per_unit, language):
+        if language == Language.SWIFT:
+            file_count = (
+                max(self.swift_file_size_loc, loc_per_unit) * module_node.code_units) / self.swift_file_size_loc
+        elif language == Language.OBJC:
+            file_count = (max(self.objc_file_size_loc, loc_per_unit) * module_node.code_units) / self.objc_file_size_loc
+        else:
+            raise ValueError("Unknown language: {}".format(language))
+        if file_count < 1:
+            raise ValueError("Lines of code count is too small for the module {} to fit one file, increase it.".format(
+                module_node.name))
+        return file_count
+
+    def gen_lib_build(self, module_node):
         deps = self.make_dep_list([i.name for i in module_node.deps])
-        build_text = self.bzl_lib_template.format(module_node.name, deps, self.wmo_state)
+        return self.bzl_lib_template.format(module_node.name, deps, self.wmo_state)
+
+    def gen_lib_module(self, module_index, module_node, loc_per_unit, language):
+        build_text = self.gen_lib_build(module_node)
         # We now return a topologically sorted list of the graph which means that we will already have the
         # deps of a module inside the module index before we process this one.  This allows us to reach into
         # the generated sources for the dependencies in order to create an instance of their class and
         # invoke their functions.
         deps_from_index = [{n.name: module_index[n.name]} for n in module_node.deps]
 
-        # Make Text
+        # Make Text.  Files and classes are kept in generation order, which is what call sites into this module
+        # follow, so the order doesn't depend on how the index was built or transferred between processes.
+        file_count = self.file_count(module_node, loc_per_unit, language)
         if language == Language.SWIFT:
-            file_count = (
-                max(self.swift_file_size_loc, loc_per_unit) * module_node.code_units) / self.swift_file_size_loc
-            if file_count < 1:
-                raise ValueError(
-                    "Lines of code count is too small for the module {} to fit one file, increase it.".format(
-                        module_node.name))
-            files = {
-                "File{}.swift".format(i): self.swift_gen.gen_file(3, 3, deps_from_index) for i in xrange(file_count)
-            }
+            files = OrderedDict()
+            for i in xrange(file_count):
+                files["File{}.swift".format(i)] = self.swift_gen.gen_file(
+                    3, 3, deps_from_index, ids=IdAllocator(module_node.name, i))
         elif language == Language.OBJC:
-            file_count = (max(self.objc_file_size_loc, loc_per_unit) * module_node.code_units) / self.objc_file_size_loc
-            if file_count < 1:
-                raise ValueError(
-                    "Lines of code count is too small for the module {} to fit one file, increase it.".format(
-                        module_node.name))
-            files = {}
+            files = OrderedDict()
             for i in xrange(file_count):
                 objc_source_file = self.objc_source_gen.gen_file(
-                    3, 3, import_list=deps_from_index + ['File{}.h'.format(i)])
+                    3, 3, import_list=deps_from_index + ['File{}.h'.format(i)], ids=IdAllocator(module_node.name, i))
                 files["File{}.m".format(i)] = objc_source_file
                 files["File{}.h".format(i)] = self.objc_header_gen.gen_file(objc_source_file)
 
@@ -215,16 +222,15 @@ class BlazeProjectGenerator(object):
         makedir(files_dir_path)
 
         # Write BUCK or BUILD Files
-        build_name = "BUCK" if self.flavor == 'buck' else "BUILD"
-        build_path = join(module_dir_path, build_name)
+        build_path = join(module_dir_path, self.build_file_name)
         self.write_file(build_path, build_text)
 
         # Write Swift Files
         for file_name, file_obj in files.iteritems():
             file_path = join(files_dir_path, file_name)
-            self.write_file(file_path, file_obj.text)
+            self.output.write_chunks(file_path, file_obj.chunks)
             file_obj.text = ""  # Save memory after write
 
-        module_node.extra_info = files
-
-        return files
+        # Dependents only need the ids of the classes and functions, not the file results
+        line_counts = sum((file_obj.line_counts for file_obj in files.values()), LineCounts())
+        return ModuleSymbols.from_files(files), line_counts
@@ -22,13 +22,14 @@ import shutil
 import subprocess
 from os.path import join
 
-from toposort import toposort_flatten
-
 from . import dotreader
 from .cpulogger import CPULog
-from .filegen import Language
+from .filegen import CallBudget, Language
+from .graphcache import DotGraphCache
 from .moduletree import ModuleGenType, ModuleNode
-from .util import bool_xor
+from .outputmanifest import OutputManifest
+from .queryreader import QUERY_FILE_READERS
+from .util import default_cache_dir
 
 
 class AppGenerationConfig(object):
@@ -41,8 +42,17 @@ class AppGenerationConfig(object):
                  objc_lines_of_code=0,
                  app_layer_count=0,
                  dot_file_path='',
+                 dot_format='dot',
                  dot_root_node_name='',
-                 loc_json_file_path=''):
+                 dot_condense_cycles=False,
+                 use_dot_graph_cache=True,
+                 loc_json_file_path='',
+                 max_calls_per_class=0,
+                 max_calls_per_dependency=0,
+                 max_calls_per_file=0,
+                 call_sample_seed=0,
+                 transitive_reduction=False,
+                 jobs=1):
         self.module_count = module_count
         self.big_module_count = big_module_count
         self.small_module_count = small_module_count
@@ -50,8 +60,17 @@ class AppGenerationConfig(object):
         self.objc_lines_of_code = objc_lines_of_code
         self.app_layer_count = app_layer_count
         self.dot_file_path = dot_file_path
+        self.dot_format = dot_format
         self.dot_root_node_name = dot_root_node_name
+        self.dot_condense_cycles = dot_condense_cycles
+        self.use_dot_graph_cache = use_dot_graph_cache
         self.loc_json_file_path = loc_json_file_path
+        self.max_calls_per_class = max_calls_per_class
+        self.max_calls_per_dependency = max_calls_per_dependency
+        self.max_calls_per_file = max_calls_per_file
+        self.call_sample_seed = call_sample_seed
+        self.transitive_reduction = transitive_reduction
+        self.jobs = jobs
 
     def pull_from_args(self, args):
         self.validate_app_gen_options(args)
@@ -62,8 +81,21 @@ class AppGenerationConfig(object):
         self.objc_lines_of_code = args.objc_lines_of_code
         self.app_layer_count = args.app_layer_count
         self.dot_file_path = args.dot_file_path
+        self.dot_format = args.dot_format
         self.dot_root_node_name = args.dot_root_node_name
+        self.dot_condense_cycles = args.dot_condense_cycles
+        self.use_dot_graph_cache = not args.skip_dot_graph_cache
         self.loc_json_file_path = args.loc_json_file_path
+        self.max_calls_per_class = args.max_calls_per_class
+        self.max_calls_per_dependency = args.max_calls_per_dependency
+        self.max_calls_per_file = args.max_calls_per_file
+        self.call_sample_seed = args.call_sample_seed
+        self.transitive_reduction = args.transitive_reduction
+        self.jobs = args.jobs
+
+    def call_budget(self):
+        return CallBudget(self.max_calls_per_class, self.max_calls_per_dependency, self.max_calls_per_file,
+                          self.call_sample_seed)
 
     @staticmethod
     def add_app_gen_options(parser):
@@ -95,6 +127,45 @@ class AppGenerationConfig(object):
             default=10,
             type=int,
             help='How many module layers there should be in the layered mock app type.')
+        app.add_argument(
+            '-j',
+            '--jobs',
+            default=1,
+            type=int,
+            help="How many processes generate modules in parallel.  Modules are generated level by level of the "
+            "dependency graph, so the output is identical to a serial run.  Big dot files are also read in chunks on "
+            "this many processes.")
+        app.add_argument(
+            '--transitive_reduction',
+            action='store_true',
+            default=False,
+            help="Remove the dependencies modules also have through another dependency before generating the app.  "
+            "Every module still reaches the same modules, with fewer imports and cross-module call sites.")
+
+        calls = parser.add_argument_group('Cross-module call budget')
+        calls.add_argument(
+            '--max_calls_per_class',
+            default=0,
+            type=int,
+            help="The maximum number of calls into dependency modules a generated class makes.  0 means unlimited, "
+            "in which case every class calls every function of every dependency.")
+        calls.add_argument(
+            '--max_calls_per_dependency',
+            default=0,
+            type=int,
+            help="The maximum number of calls a generated class makes into a single dependency module.  0 means "
+            "unlimited.")
+        calls.add_argument(
+            '--max_calls_per_file',
+            default=0,
+            type=int,
+            help="The maximum number of calls into dependency modules all classes of a generated file make.  0 means "
+            "unlimited.")
+        calls.add_argument(
+            '--call_sample_seed',
+            default=0,
+            type=int,
+            help="The seed used to pick which calls to keep when a call budget limit is hit.")
 
         dot = parser.add_argument_group('Dot file mock app config')
         dot.add_argument(
@@ -104,11 +175,33 @@ class AppGenerationConfig(object):
             help="The path to the dot file to create a mock module graph from.  This dot file for Buck can be "
             "created like so: `buck query \"deps(target)\" --dot > file.gv`.  Alternatively, you may use your own"
             "means to generate it for different project types.")
+        dot.add_argument(
+            '--dot_format',
+            default='dot',
+            choices=['dot'] + sorted(QUERY_FILE_READERS),
+            help="The format of the file at --dot_file_path.  Besides dot files, the outputs of "
+            "`bazel query \"deps(target)\" --output=streamed_jsonproto` (bazel_jsonproto) and "
+            "`buck query \"deps(target)\" --output-format json --output-attributes buck.type deps exported_deps srcs` "
+            "(buck_json) can be read directly.  Their modules are picked by rule kind instead of by name, and sized "
+            "by their source file count.")
         dot.add_argument(
             '--dot_root_node_name',
             default='',
             type=str,
-            help="The name of the root application node of the dot file, such as 'App'.")
+            help="The name of the root application node of the dot file, such as 'App'.  If not specified, the root "
+            "with the most nodes under it is used.  Nodes the root can't reach are not generated.")
+        dot.add_argument(
+            '--dot_condense_cycles',
+            action='store_true',
+            default=False,
+            help="Merge the modules of every dependency cycle in the dot file into one module with their summed "
+            "size, instead of stopping with an error that lists the cycles.")
+        dot.add_argument(
+            '--skip_dot_graph_cache',
+            action='store_true',
+            default=False,
+            help="Always parse the dot file.  By default the parsed graph is cached in ~/.cache/uberpoet, keyed by "
+            "the dot file content and options, so reading the same dot file again skips parsing it.")
         parser.add_argument(
             '--loc_json_file_path',
             default='',
@@ -119,13 +212,17 @@ class AppGenerationConfig(object):
 
     @staticmethod
     def validate_app_gen_options(args):
-        if bool_xor(args.dot_file_path, args.dot_root_node_name):
+        if args.dot_root_node_name and not args.dot_file_path:
             logging.info('dot_file_path: "%s" dot_root_node_name: "%s"', args.dot_file_path, args.dot_root_node_name)
-            raise ValueError('If you specify a dot file config option, you must also specify a root node name using '
-                             '\"dot_root_node_name\".')
+            raise ValueError('If you specify a root node name, you must also specify a dot file using '
+                             '\"dot_file_path\".')
         if args.loc_json_file_path and args.gen_type != ModuleGenType.dot:
             logging.info('loc_json_file_path: "%s"', args.loc_json_file_path)
             raise ValueError('If you specify \"loc_json_file_path\", you must also specify a dot graph style.')
+        if args.jobs < 1:
+            raise ValueError('\"jobs\" must be at least 1.')
+        if min(args.max_calls_per_class, args.max_calls_per_dependency, args.max_calls_per_file) < 0:
+            raise ValueError('Call budget limits must be positive, or 0 for unlimited.')
 
 
 def gen_graph(gen_type, config):
@@ -140,12 +237,8 @@ def gen_graph(gen_type, config):
         app_node, node_list = ModuleNode.gen_layered_graph(config.app_layer_count, modules_per_layer)
     elif gen_type == ModuleGenType.bs_layered:
         app_node, node_list = ModuleNode.gen_layered_big_small_graph(config.big_module_count, config.small_module_count)
-    elif gen_type == ModuleGenType.dot and config.dot_file_path and config.dot_root_node_name:
-        logging.info("Reading dot file: %s", config.dot_file_path)
-        app_node, parsed_node_list = dotreader.DotFileReader().read_dot_file(config.dot_file_path,
-                                                                             config.dot_root_node_name)
-        node_graph = {n: set(n.deps) for n in parsed_node_list}
-        node_list = toposort_flatten(node_graph)
+    elif gen_type == ModuleGenType.dot and config.dot_file_path:
+        app_node, node_list = read_dot_graph(config)
     else:
         logging.error("Unexpected argument set, aborting.")
         item_list = ', '.join(ModuleGenType.enum_list())
@@ -153,6 +246,62 @@ def gen_graph(gen_type, config):
                                                                                config.dot_path))
         raise ValueError("Invalid Arguments")
 
+    if config.transitive_reduction:
+        reduce_graph(app_node, node_list)
+    return app_node, node_list
+
+
+def reduce_graph(app_node, node_list):
+    """
+    Removes the redundant dependencies of a graph in place, see `ModuleNode.transitive_reduction`, and logs how many
+    dependencies and cross-module call sites that removes.
+
+    Without a call budget every class of a module calls every function of its dependencies, and the count of classes
+    and functions of a module grow with its code units.  So the call sites of a dependency are counted as the code units
+    of the module times those of the dependency.  The app only calls into one module, its dependencies are left out.
+    """
+
+    def call_sites(node, dep):
+        return node.code_units * dep.code_units if node.node_type == ModuleNode.LIBRARY else 0
+
+    edge_count = sum(len(n.deps) for n in node_list)
+    call_site_count = sum(call_sites(n, dep) for n in node_list for dep in n.deps)
+    removed_edges = ModuleNode.transitive_reduction(app_node, node_list)
+    removed_call_sites = sum(call_sites(n, dep) for n, dep in removed_edges)
+    logging.info("Transitive reduction removed %d of %d dependencies and %.1f%% of the cross-module call sites",
+                 len(removed_edges), edge_count,
+                 100.0 * removed_call_sites / call_site_count if call_site_count else 0.0)
+    return removed_edges, removed_call_sites
+
+
+def read_dot_graph(config):
+    """
+    Returns the app node and topologically sorted node list of the dot file graph of `config`, from the dot graph
+    cache if the same dot file was read with the same options before.
+    """
+    reader = dotreader.DotFileReader()
+    cache = DotGraphCache(default_cache_dir()) if config.use_dot_graph_cache else None
+    if cache:
+        key = cache.key(config.dot_file_path, reader.modules_filter, config.dot_root_node_name,
+                        config.dot_condense_cycles, config.dot_format)
+        graph = cache.load(key)
+        if graph:
+            logging.info("Using the cached graph of dot file: %s", config.dot_file_path)
+            return graph
+
+    logging.info("Reading %s file: %s", config.dot_format, config.dot_file_path)
+    if config.dot_format in QUERY_FILE_READERS:
+        app_node, parsed_node_list = QUERY_FILE_READERS[config.dot_format]().read_query_file(
+            config.dot_file_path, config.dot_root_node_name or None, condense_cycles=config.dot_condense_cycles)
+    else:
+        app_node, parsed_node_list = reader.read_dot_file(
+            config.dot_file_path,
+            config.dot_root_node_name or None,
+            condense_cycles=config.dot_condense_cycles,
+            jobs=config.jobs)
+    node_list, _ = ModuleNode.topological_sort(parsed_node_list)
+    if cache:
+        cache.save(key, app_node, node_list)
     return app_node, node_list
 
 
@@ -162,6 +311,17 @@ def del_old_output_dir(output_directory):
         shutil.rmtree(output_directory)
 
 
+def prepare_output_dir(output_directory):
+    """
+    Readies `output_directory` for generating a mock app into it.  A mock app generated before with an output manifest
+    is updated in place by the project generator, so only changed files get rewritten.  Anything else is deleted.
+    """
+    if OutputManifest.exists_in(output_directory):
+        logging.info("Updating mock app directory %s in place", output_directory)
+    else:
+        del_old_output_dir(output_directory)
+
+
 def make_custom_buckconfig_local(buckconfig_path):
     logging.warn('Overwriting .buckconfig.local file at: %s', buckconfig_path)
     config = ConfigParser.RawConfigParser()
@@ -16,16 +16,313 @@ from __future__ import absolute_import
 
 import itertools
 import logging
+import multiprocessing
 import os
+import re
 import tempfile
-from collections import defaultdict
+from collections import defaultdict, deque
 from pprint import pprint
-from typing import Dict, List, Set  # noqa: F401
+from typing import Dict, Iterable, Iterator, List, Set  # noqa: F401
 
-from .moduletree import ModuleNode
+from .moduletree import ModuleGraph, ModuleNode  # noqa: F401
 from .util import makedir
 
 
+class DepMapBuilder(object):
+    """
+    Builds a dep map ({origin:[destinations]} outgoing edge map) one edge at a time in linear time, dropping duplicate
+    edges.  Node names are interned to integer ids, so each distinct target path is only cleaned by `clean_name`
+    once and the edges already seen are kept as a set of ints.
+
+    It also counts how many distinct origin paths end up with the same name as it goes, see `identical_names`.
+    """
+
+    def __init__(self, clean_name=None):
+        self.clean_name = clean_name
+        self.path_ids = {}  # {target path: node id}
+        self.name_ids = {}  # {node name: node id}
+        self.names = []  # [node name], indexed by node id
+        self.deps = []  # [[destination node id] or None], indexed by node id
+        self.origin_ids = []  # Origin node ids in the order they were first seen as an origin
+        self.origin_paths = set()
+        self.origin_name_counts = defaultdict(int)
+        self.edges = set()  # {(origin node id << 32) | destination node id}
+        self.duplicate_edges = 0
+
+    def node_id(self, path):
+        node_id = self.path_ids.get(path)
+        if node_id is None:
+            node_id = self.path_ids[path] = self.name_id(self.clean_name(path) if self.clean_name else path)
+        return node_id
+
+    def name_id(self, name):
+        node_id = self.name_ids.get(name)
+        if node_id is None:
+            node_id = len(self.names)
+            self.name_ids[name] = node_id
+            self.names.append(name)
+            self.deps.append(None)
+        return node_id
+
+    def add_edge(self, origin, destination):
+        path_ids = self.path_ids
+        origin_id = path_ids[origin] if origin in path_ids else self.node_id(origin)
+        destination_id = path_ids[destination] if destination in path_ids else self.node_id(destination)
+
+        if origin not in self.origin_paths:
+            self.origin_paths.add(origin)
+            self.origin_name_counts[self.names[origin_id]] += 1
+
+        edge = (origin_id << 32) | destination_id
+        if edge in self.edges:
+            self.duplicate_edges += 1
+            return
+        self.edges.add(edge)
+
+        deps = self.deps[origin_id]
+        if deps is None:
+            deps = self.deps[origin_id] = []
+            self.origin_ids.append(origin_id)
+        deps.append(destination_id)
+
+    def add_edges(self, edges):
+        for origin, destination in edges:
+            self.add_edge(origin, destination)
+        return self
+
+    def merge(self, other):
+        # type: (DepMapBuilder) -> None
+        """
+        Adds the edges of the builder `other`, which were read after the ones of this builder, as if they had been
+        added one by one.  The dep map, duplicate edge count and identical names end up the same.
+        """
+        for path in other.origin_paths:
+            if path not in self.origin_paths:
+                self.origin_paths.add(path)
+                self.origin_name_counts[other.names[other.path_ids[path]]] += 1
+
+        ids = [self.name_id(name) for name in other.names]
+        self.duplicate_edges += other.duplicate_edges
+        for other_origin_id in other.origin_ids:
+            origin_id = ids[other_origin_id]
+            deps = self.deps[origin_id]
+            if deps is None:
+                deps = self.deps[origin_id] = []
+                self.origin_ids.append(origin_id)
+            for other_destination_id in other.deps[other_origin_id]:
+                destination_id = ids[other_destination_id]
+                edge = (origin_id << 32) | destination_id
+                if edge in self.edges:
+                    self.duplicate_edges += 1
+                    continue
+                self.edges.add(edge)
+                deps.append(destination_id)
+
+    def detach(self):
+        # type: () -> DepMapBuilder
+        """Drops what `merge` doesn't need from this builder, so it is smaller to send to another process."""
+        self.clean_name = None
+        self.path_ids = {path: self.path_ids[path] for path in self.origin_paths}
+        self.name_ids = {}
+        self.origin_name_counts = defaultdict(int)
+        self.edges = set()
+        return self
+
+    def dep_map(self):
+        # type: () -> Dict[str, List[str]]
+        names = self.names
+        return {names[origin_id]: [names[i] for i in self.deps[origin_id]] for origin_id in self.origin_ids}
+
+    def identical_names(self):
+        # type: () -> Dict[str,int]
+        """Returns how many distinct origin paths have the same name, filtering out unique (count == 1) names"""
+        return {name: count for name, count in self.origin_name_counts.iteritems() if count > 1}
+
+
+# A whole `"origin" -> "destination";` or `"node";` line, which is what almost every line of Buck and Bazel graphs
+# is.  The destination group is None for a node, the last group is the semicolon, without it the statement can go on
+# on the next line.
+SIMPLE_STATEMENT_REGEX = re.compile(r'\s*"([^"]*)"(?:\s*->\s*"([^"]*)")?\s*(;?)\s*$')
+
+DOT_TOKEN_REGEX = re.compile(
+    r'''
+    (?P<skip>\s+|//.*|/\*.*?\*/)
+    |(?P<quoted>"(?:[^"\\]|\\.)*")
+    |(?P<html><[^<>]*(?:<[^<>]*>[^<>]*)*>)
+    |(?P<op>->|--|[{}\[\]=;,:])
+    |(?P<id>-?[^\s"<>{}\[\]=;,:/\-]+)
+    ''', re.VERBOSE | re.DOTALL)
+
+
+class DotParser(object):
+    """
+    Reads the edges of dot file lines one line at a time, for the part of the DOT language that `buck query --dot`,
+    `bazel query --output graph` and Graphviz tools write: edge chains (`a -> b -> c`), edges to groups of nodes
+    (`a -> {b c}`), attribute lists, node, attribute and subgraph statements, comments, quoted ids spanning lines and
+    statements with or without semicolons, several per line or one spread over several lines.  Ports are dropped from
+    node ids and undirected edges (`--`) are read as if they were directed.
+
+    Tokenizing is slow compared to matching `SIMPLE_STATEMENT_REGEX`, lines matching it can skip the parser when no
+    statement `is_open`.  A complete chain the parser holds, ex: `"a" -> "b"` or a node statement without a semicolon,
+    is ended first, like the new statement would end it.
+    """
+
+    KEYWORDS = frozenset(['strict', 'graph', 'digraph', 'subgraph', 'node', 'edge'])
+    NAMED_KEYWORDS = frozenset(['graph', 'digraph', 'subgraph'])
+
+    def __init__(self):
+        self.chain = []  # The operands of the current statement, lists of node ids, ex: [['a'], ['b', 'c']]
+        self.expects_operand = False  # After an edge operator
+        self.group = None  # The node ids of the `{...}` edge operand being read
+        self.group_depth = 0
+        self.in_attributes = False
+        self.in_comment = False
+        self.skips_id = False  # The next id is a graph name, a port or an attribute value
+        self.partial = ''  # The beginning of a quoted id that continues on the next line
+        self.edges = []  # The edges of the statements ended by the line being read
+        # A statement started on the previous lines surely goes on on the next one: an edge operand, attribute list,
+        # group, comment or quoted id is missing its end.  Else the parser holds at most a complete chain.
+        self.is_open = False
+        self.missing_origin = False  # An edge operator came without an operand before it, ex: at a chunk start
+
+    def read_line(self, line):
+        # type: (str) -> List[List[str]]
+        """Returns the [origin, destination] edges of the statements `line` ends."""
+        self.edges = []
+        self.tokenize(line)
+        self.is_open = bool(self.expects_operand or self.in_attributes or self.in_comment or self.skips_id or
+                            self.partial or self.group is not None)
+        return self.edges
+
+    def flush(self):
+        # type: () -> List[List[str]]
+        """
+        Returns the edges of the complete chain the parser holds, when no statement `is_open`.  The last operand is
+        kept, so an edge operator on the next line still goes on from it.
+        """
+        self.edges = []
+        if len(self.chain) > 1:
+            last_operand = self.chain[-1]
+            self.end_statement()
+            self.chain = [last_operand]
+        return self.edges
+
+    def finish(self):
+        # type: () -> List[List[str]]
+        """Returns the edges of the last statement if it wasn't ended, ex: by a semicolon or a closing brace."""
+        self.edges = []
+        self.end_statement()
+        return self.edges
+
+    def tokenize(self, line):
+        text = self.partial + line
+        self.partial = ''
+        pos = 0
+        if self.in_comment:
+            end = text.find('*/')
+            if end == -1:
+                return
+            self.in_comment = False
+            pos = end + 2
+        elif text.lstrip().startswith('#'):
+            return  # Lines starting with # are C preprocessor output, which DOT ignores
+
+        while pos < len(text):
+            match = DOT_TOKEN_REGEX.match(text, pos)
+            if match is None:
+                if text[pos] == '"':
+                    self.partial = text[pos:] if text.endswith('\n') else text[pos:] + '\n'
+                elif text.startswith('/*', pos):
+                    self.in_comment = True
+                else:
+                    pos += 1  # Not valid DOT, skipped
+                    continue
+                return
+            pos = match.end()
+            kind = match.lastgroup
+            if kind == 'op':
+                self.read_operator(match.group(kind))
+            elif kind == 'quoted':
+                self.read_id(self.unquote(match.group(kind)))
+            elif kind != 'skip':
+                self.read_id(match.group(kind), is_keyword=kind == 'id' and match.group(kind).lower() in self.KEYWORDS)
+
+    @staticmethod
+    def unquote(quoted):
+        return quoted[1:-1].replace('\\\r\n', '').replace('\\\n', '').replace('\\"', '"')
+
+    def read_id(self, node_id, is_keyword=False):
+        if self.in_attributes:
+            return
+        if is_keyword:
+            keyword = node_id.lower()
+            if keyword == 'subgraph' and (self.expects_operand or self.group is not None):
+                self.skips_id = True  # `a -> subgraph name {b c}`, the group that follows is the operand
+                return
+            self.end_statement()
+            self.skips_id = keyword in self.NAMED_KEYWORDS
+            return
+        if self.skips_id:
+            self.skips_id = False
+        elif self.group is not None:
+            self.group.append(node_id)
+        elif self.expects_operand:
+            self.chain.append([node_id])
+            self.expects_operand = False
+        else:
+            self.end_statement()
+            self.chain.append([node_id])
+
+    def read_operator(self, operator):
+        if self.in_attributes:
+            if operator == ']':
+                self.in_attributes = False
+                if self.group is None:
+                    self.end_statement()
+            return
+        self.skips_id = False
+        if operator == '->' or operator == '--':
+            self.expects_operand = bool(self.chain)
+            self.missing_origin = self.missing_origin or (not self.chain and self.group is None)
+        elif operator == '[':
+            self.in_attributes = True
+        elif operator == ':':
+            self.skips_id = True
+        elif operator == '=':
+            # The id before was the name of a graph attribute, ex: `rankdir = LR`
+            if self.group:
+                self.group.pop()
+            elif self.chain and not self.expects_operand:
+                self.chain.pop()
+            self.skips_id = True
+        elif operator == '{':
+            if self.group is not None:
+                self.group_depth += 1
+            elif self.expects_operand:
+                self.group = []
+                self.group_depth = 1
+                self.expects_operand = False
+            else:
+                self.end_statement()  # A graph or subgraph body
+        elif operator == '}':
+            if self.group is None:
+                self.end_statement()
+                return
+            self.group_depth -= 1
+            if not self.group_depth:
+                self.chain.append(self.group)
+                self.group = None
+        elif self.group is None:  # ; or ,
+            self.end_statement()
+
+    def end_statement(self):
+        chain = self.chain
+        for origins, destinations in itertools.izip(chain, itertools.islice(chain, 1, None)):
+            self.edges.extend([origin, destination] for origin in origins for destination in destinations)
+        self.chain = []
+        self.expects_operand = False
+
+
 class DotFileReader(object):
     """
     This class reads a dot file from a `buck query "deps(target)" --dot > file.gv` output
@@ -36,13 +333,15 @@ class DotFileReader(object):
     really slow.  Probably because of some extra stuff we don't do.
     """
 
+    PARALLEL_CHUNK_SIZE = 32 << 20  # Bytes
+
     def __init__(self, modules_filter=None):
         # type: (List[str]) -> None
         """
         Initializes object.
 
-        :param modules_filter: If a graph edge contains a string inside the list as a substring, it is ignored.
-        Keep it empty to not filter out anything.  If not specified, a default list of test names are used.
+        :param modules_filter: If a graph edge contains a string inside the list as a substring, ignoring case, it is
+        ignored.  Keep it empty to not filter out anything.  If not specified, a default list of test names are used.
         """
         if modules_filter is None:
             # Why filter out modules with these names?
@@ -51,28 +350,51 @@ class DotFileReader(object):
             # so non-code modules will add code to the total when they shouldn't if we didn't filter them out.
             modules_filter = ['test', 'scheme', 'assetcatalog', 'resources', 'fixture', 'needle', 'assets']
         self.modules_filter = modules_filter
-
-    def read_dot_file(self, path, root_node_name, is_debug=False):
-        # type: (str, str, bool) -> (ModuleNode, List[ModuleNode])
+        # One regex for all the filters is a lot faster than checking each of them on every line of big graphs.  It is
+        # matched against lowercased lines, re.IGNORECASE is a lot slower.
+        self.filter_regex = None
+        if modules_filter:
+            self.filter_regex = re.compile('|'.join(re.escape(k.lower()) for k in modules_filter))
+
+    def read_dot_file(self, path, root_node_name=None, is_debug=False, condense_cycles=False, jobs=1):
+        # type: (str, str, bool, bool, int) -> (ModuleNode, List[ModuleNode])
         """
         Reads a Buck dependency dump in a dot/gv file at `path` and returns a `ModuleNode`
         graph root and list of nodes to generate a mock app from it.
 
         :param path:  Path to the dot file
-        :param root_node_name:  The name of the root application node in the dependency graph
+        :param root_node_name:  The name of the root application node in the dependency graph.  If not specified, the
+        root with the most nodes under it is used.
         :param is_debug: Enable this to dump some intermediate objects to help with debugging
+        :param condense_cycles: Merge the modules of every dependency cycle into one module instead of raising a
+        ValueError.  The merged module keeps the name of one of them, and the sum of their code units.
+        :param jobs: Read dot files bigger than `PARALLEL_CHUNK_SIZE` in chunks on this many processes
         :return: The a tuple of the root node of the tree and a list of all nodes in the tree
         """
-        with open(path, 'r') as f:
-            text = f.read()
-
-        raw_edges = self.extract_edges(text)
-        ident_names = self.identical_names(raw_edges)
-        edges = self.clean_edge_names(raw_edges)
-        dep_map = self.make_dep_map_from_edges(edges)  # A dep_map is really an outgoing edge map
+        raw_edges = [] if is_debug else None
+        if jobs > 1 and not is_debug and os.path.getsize(path) > self.PARALLEL_CHUNK_SIZE:
+            builder = self.read_dot_file_in_parallel(path, jobs)
+        else:
+            # The file is streamed and the dep map built edge by edge, so big graphs are never held in memory as text
+            # or as edge lists.  Only debug dumps keep the edges.
+            builder = DepMapBuilder(self.extract_buck_target)
+            with open(path, 'rU') as f:
+                for raw_origin, raw_destination in self.iter_edges(f):
+                    if raw_edges is not None:
+                        raw_edges.append([raw_origin, raw_destination])
+                    builder.add_edge(raw_origin, raw_destination)
+        dep_map = builder.dep_map()  # A dep_map is really an outgoing edge map
+        ident_names = builder.identical_names()
+        if builder.duplicate_edges:
+            logging.debug("Dropped %d duplicate edges from %s", builder.duplicate_edges, path)
+
+        if not root_node_name:
+            root_node_name = self.biggest_root_name(dep_map)
+            logging.info("Using the biggest root of the dot file as the app node: %s", root_node_name)
 
         # Debug dumps of dot reader state for debugging
         if is_debug:
+            edges = self.clean_edge_names(raw_edges)
             incoming_map = self.incoming_edge_map_from_dep_map(dep_map)
             anon_edge = self.anonymize_edge_names(edges, root_node_name)
             self.debug_dump([edges, raw_edges, anon_edge], [dep_map, ident_names, incoming_map])
@@ -81,10 +403,83 @@ class DotFileReader(object):
             logging.error("Found identical buck target names in dot file: %s", path)
             logging.error(str(ident_names))
             raise ValueError("Dot file contains buck target names that are identical, but have different paths")
-        else:
-            root, nodes = self.mod_graph_from_dep_map(dep_map, root_node_name)
-            logging.debug("%s %s total nodes: %d", root, root.deps, len(nodes))
-            return root, nodes
+        return self.graph_from_dep_map(dep_map, path, root_node_name, len(builder.names), condense_cycles)
+
+    def read_dot_file_in_parallel(self, path, jobs):
+        # type: (str, int) -> DepMapBuilder
+        """
+        Reads the dot file at `path` in chunks of whole lines on `jobs` processes, and returns the `DepMapBuilder` of
+        its edges.  Each chunk is read into its own builder, and the builders are merged in file order, so the
+        result is the same as reading the file at once, whatever the number of processes.
+        """
+        chunks = self.line_chunks(path, self.PARALLEL_CHUNK_SIZE)
+        tasks = [
+            (self.modules_filter, path, start, end, None, i == len(chunks) - 1) for i, (start, end) in enumerate(chunks)
+        ]
+        logging.info("Reading dot file %s in %d chunks with %d jobs", path, len(chunks), jobs)
+
+        builder = DepMapBuilder(self.extract_buck_target)
+        pool = multiprocessing.Pool(jobs)
+        try:
+            previous_parser = None
+            for task, result in itertools.izip(tasks, pool.imap(_read_dot_chunk, tasks)):
+                if previous_parser is not None and (previous_parser.is_open or
+                                                    (previous_parser.chain and result[1].missing_origin)):
+                    # The last statement of the previous chunk goes on in this one, which has to be read again from
+                    # where the previous one stopped.  Rare, statements rarely span lines.
+                    result = _read_dot_chunk(task[:4] + (previous_parser,) + task[5:])
+                chunk_builder, previous_parser = result
+                builder.merge(chunk_builder)
+            pool.close()
+        except BaseException:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+        return builder
+
+    @staticmethod
+    def line_chunks(path, chunk_size):
+        # type: (str, int) -> List[(int, int)]
+        """Splits the file at `path` into [start, end) byte ranges of about `chunk_size`, ending at line ends."""
+        size = os.path.getsize(path)
+        offsets = [0]
+        with open(path, 'rb') as f:
+            while offsets[-1] + chunk_size < size:
+                f.seek(offsets[-1] + chunk_size)
+                f.readline()
+                if f.tell() >= size:
+                    break
+                offsets.append(f.tell())
+        offsets.append(size)
+        return zip(offsets, offsets[1:])
+
+    def graph_from_dep_map(self, dep_map, path, root_node_name, node_count, condense_cycles=False, code_units=None):
+        # type: (Dict[str, List[str]], str, str, int, bool, Dict[str, int]) -> (ModuleNode, List[ModuleNode])
+        """
+        Returns the `ModuleNode` graph root and list of nodes of `dep_map`, which was read from the file at `path`
+        and has `node_count` nodes.  Dependency cycles raise a ValueError, unless `condense_cycles` is set.
+
+        :param code_units: The {node name: code units} of the nodes that don't have 1 code unit
+        """
+        cycles = self.find_cycles(dep_map, [root_node_name])
+        if cycles:
+            self.log_cycles(dep_map, cycles, path)
+            if not condense_cycles:
+                raise ValueError("Dot file contains {} dependency cycles, see the log for the modules in them.  "
+                                 "They can be merged into single modules with --dot_condense_cycles".format(
+                                     len(cycles)))
+            dep_map, merged_code_units = self.condense_cycles(dep_map, cycles, root_node_name, code_units)
+            code_units = dict(code_units or {})
+            code_units.update(merged_code_units)
+            node_count -= sum(len(cycle) - 1 for cycle in cycles)
+
+        root, nodes = self.mod_graph_from_dep_map(dep_map, root_node_name, code_units)
+        logging.debug("%s %s total nodes: %d", root, root.deps, len(nodes))
+        unreachable_count = node_count - len(nodes)
+        if unreachable_count:
+            logging.info("Left out %d nodes of %s that %s can't reach", unreachable_count, path, root_node_name)
+        return root, nodes
 
     def extract_edges(self, text):
         # type: (str)-> List[List[str]]
@@ -92,26 +487,51 @@ class DotFileReader(object):
         Converts dot file text with buck targets as edges into a simpler [(string,string)] list.
         Also filters out unwanted target types based on the names in self.modules_filter.
 
-        Dot files are basically lines of `"string" -> "string";` that represent a list of edges in a
-        graph.
+        Dot files are mostly lines of `"string" -> "string";` that represent a list of edges in a
+        graph, see `DotParser` for the rest of the syntax that is understood.
         """
+        return list(self.iter_edges(text.splitlines()))
 
-        def edge(f_line):
-            return f_line[:-1].split('->')
-
-        def name(f_part):
-            return str(f_part.strip().replace('"', ''))
-
-        def fil(f_line):
-            lower = line.lower()
-            bad_word = False
-            for k in self.modules_filter:
-                if k in lower:
-                    bad_word = True
-                    break
-            return '->' in f_line and not bad_word
+    def iter_edges(self, lines, parser=None, is_end=True):
+        # type: (Iterable[str], DotParser, bool) -> Iterator[List[str]]
+        """
+        Lazily converts dot file `lines`, which can be an open file, into [string,string] edges.
+        See `extract_edges`.
 
-        return [[name(part) for part in edge(line)] for line in text.splitlines() if fil(line)]
+        :param parser: The parser to read `lines` with, which can be in the middle of a statement
+        :param is_end: If the file ends with `lines`, which ends its last statement.  Otherwise the edges of the last
+        statement are only read if it can't go on, except for an edge operator on the next line going on from it.
+        """
+        is_filtered = self.filter_regex.search if self.filter_regex else None
+        match_simple_statement = SIMPLE_STATEMENT_REGEX.match
+        parser = parser or DotParser()
+        for line in lines:
+            match = None if parser.is_open else match_simple_statement(line)
+            if match is None:
+                for edge in self.filtered_edges(parser.read_line(line)):
+                    yield edge
+                continue
+            if len(parser.chain) > 1:  # Ended by the statement on this line
+                for edge in self.filtered_edges(parser.finish()):
+                    yield edge
+            origin, destination, semicolon = match.groups()
+            # The next line can go on from the last node, unless the semicolon ended the statement
+            parser.chain = [] if semicolon else [[destination or origin]]
+            if destination is not None and not (is_filtered and is_filtered(line.lower())):
+                yield [origin, destination]  # The line only has the two names, filter it whole
+        if is_end:
+            for edge in self.filtered_edges(parser.finish()):
+                yield edge
+        elif not parser.is_open:
+            for edge in self.filtered_edges(parser.flush()):
+                yield edge
+
+    def filtered_edges(self, edges):
+        # type: (List[List[str]]) -> List[List[str]]
+        is_filtered = self.filter_regex.search if self.filter_regex else None
+        if not is_filtered:
+            return edges
+        return [edge for edge in edges if not (is_filtered(edge[0].lower()) or is_filtered(edge[1].lower()))]
 
     @staticmethod
     def extract_buck_target(text):
@@ -153,12 +573,11 @@ class DotFileReader(object):
     @staticmethod
     def make_dep_map_from_edges(edges):
         # type: (List[List[str]]) -> Dict[str, List[str]]
-        """Converts a raw [(origin,destination)] edge list into a {origin:[destinations]} outgoing edge map."""
-        dep_map = defaultdict(list)
-        for pair in edges:
-            origin, destination = pair
-            dep_map[origin] += [destination]
-        return dict(dep_map)
+        """
+        Converts a raw [(origin,destination)] edge list into a {origin:[destinations]} outgoing edge map, without
+        duplicate edges.
+        """
+        return DepMapBuilder().add_edges(edges).dep_map()
 
     @staticmethod
     def incoming_edge_map_from_dep_map(dep_map):
@@ -167,7 +586,7 @@ class DotFileReader(object):
         incoming = defaultdict(list)
         for node, outgoing in dep_map.iteritems():
             for out in outgoing:
-                incoming[out] += [node]
+                incoming[out].append(node)
 
         # Roots wont show up in the incoming list in the above for loop
         roots = set(dep_map.keys()) - set(incoming.keys())
@@ -180,49 +599,163 @@ class DotFileReader(object):
     def reachability_set(dep_map, root_node_name):
         # type: (Dict[str, List[str]], str) -> Set[str]
         """
-        WARNING: Doesn't work currently.  It's a TODO to fix this.
-
-        Returns a set of all nodes reachable from root_node_name
+        Returns a set of all nodes reachable from root_node_name, including itself, with a breadth first search.
+        Leaf nodes don't have to be in `dep_map`.
         """
-        seen = set()
-        consume_list = [root_node_name]
-        while len(consume_list) > 0:
-            item = consume_list.pop(0)
-            seen.add(item)
-            consume_list += dep_map[item]
+        seen = {root_node_name}
+        consume_queue = deque([root_node_name])
+        while consume_queue:
+            for dep in dep_map.get(consume_queue.popleft(), ()):
+                if dep not in seen:
+                    seen.add(dep)
+                    consume_queue.append(dep)
         return seen
 
-    def find_roots_in_dep_map(self, dep_map):
+    @staticmethod
+    def strongly_connected_components(dep_map, start_names=None):
+        # type: (Dict[str, List[str]], Iterable[str]) -> List[List[str]]
+        """
+        Returns the strongly connected components of the graph reachable from `start_names` (every node of `dep_map`
+        if None) as lists of node names, using Tarjan's algorithm in O(V+E).  Components come in reverse topological
+        order, dependencies first.  It doesn't recurse, so deep graphs don't hit the recursion limit.
+        """
+        if start_names is None:
+            start_names = dep_map.keys()
+        index = {}  # {node: order of discovery}
+        low_link = {}  # {node: lowest index reachable from it through the search tree and back edges}
+        stack = []
+        on_stack = set()
+        components = []
+
+        def visit(f_node):
+            index[f_node] = low_link[f_node] = len(index)
+            stack.append(f_node)
+            on_stack.add(f_node)
+            return f_node, iter(dep_map.get(f_node, ()))
+
+        for start in start_names:
+            if start in index:
+                continue
+            work = [visit(start)]
+            while work:
+                node, deps = work[-1]
+                for dep in deps:
+                    if dep not in index:
+                        work.append(visit(dep))
+                        break
+                    elif dep in on_stack:
+                        low_link[node] = min(low_link[node], index[dep])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        low_link[parent] = min(low_link[parent], low_link[node])
+                    if low_link[node] == index[node]:
+                        component = []
+                        while True:
+                            member = stack.pop()
+                            on_stack.discard(member)
+                            component.append(member)
+                            if member == node:
+                                break
+                        components.append(component)
+        return components
+
+    @staticmethod
+    def find_cycles(dep_map, start_names=None):
+        # type: (Dict[str, List[str]], Iterable[str]) -> List[List[str]]
+        """
+        Returns the dependency cycles reachable from `start_names` (every node of `dep_map` if None), as sorted lists
+        of the node names in each strongly connected component.  Nodes that depend on themselves are cycles too.
+        """
+        cycles = [
+            sorted(component)
+            for component in DotFileReader.strongly_connected_components(dep_map, start_names)
+            if len(component) > 1 or component[0] in dep_map.get(component[0], ())
+        ]
+        return sorted(cycles)
+
+    @staticmethod
+    def cycle_path(dep_map, cycle):
+        # type: (Dict[str, List[str]], List[str]) -> List[str]
+        """Returns one path through the nodes of `cycle` that goes from its first node back to it."""
+        start = cycle[0]
+        members = set(cycle)
+        came_from = {}
+        consume_queue = deque([start])
+        while consume_queue:
+            node = consume_queue.popleft()
+            for dep in dep_map.get(node, ()):
+                if dep == start:
+                    path = [start]
+                    while node != start:
+                        path.append(node)
+                        node = came_from[node]
+                    path.append(start)
+                    path.reverse()
+                    return path
+                if dep in members and dep not in came_from:
+                    came_from[dep] = node
+                    consume_queue.append(dep)
+        raise ValueError("{} is not a dependency cycle".format(cycle))
+
+    def log_cycles(self, dep_map, cycles, path):
+        # type: (Dict[str, List[str]], List[List[str]], str) -> None
+        logging.error("Found %d dependency cycles in dot file: %s", len(cycles), path)
+        for cycle in cycles:
+            logging.error("Cycle of %d modules: %s", len(cycle), ' -> '.join(self.cycle_path(dep_map, cycle)))
+
+    @staticmethod
+    def condense_cycles(dep_map, cycles, root_node_name=None, code_units=None):
+        # type: (Dict[str, List[str]], List[List[str]], str, Dict[str, int]) -> (Dict[str, List[str]], Dict[str, int])
+        """
+        Merges the nodes of each cycle into one node named after the root node if it is in the cycle, or the first
+        node of the cycle otherwise.  Returns the condensed dep map and the {merged node name: code units} of the
+        merged nodes, the sum of the code units of the nodes in the cycle (`code_units`, 1 by default).
+        """
+        code_units = code_units or {}
+        merged_names = {}
+        merged_code_units = {}
+        for cycle in cycles:
+            merged_name = root_node_name if root_node_name in cycle else cycle[0]
+            for name in cycle:
+                merged_names[name] = merged_name
+            merged_code_units[merged_name] = sum(code_units.get(name, 1) for name in cycle)
+
+        builder = DepMapBuilder()
+        for origin, deps in dep_map.iteritems():
+            origin = merged_names.get(origin, origin)
+            for dep in deps:
+                dep = merged_names.get(dep, dep)
+                if dep != origin:
+                    builder.add_edge(origin, dep)
+        return builder.dep_map(), merged_code_units
+
+    @staticmethod
+    def find_roots_in_dep_map(dep_map):
         # type: (Dict[str, List[str]]) -> List[str]
         """
         Finds the roots in the DAG represented by a outgoing edge map.
         If it returns empty, then you have cycles and thus don't have a DAG.
         """
-        incoming = self.incoming_edge_map_from_dep_map(dep_map)
+        destinations = {dep for deps in dep_map.itervalues() for dep in deps}
         # A node with no incoming edges and some outgoing edges is a root in a DAG
         # Nodes with no edges are not really part of a graph, so we ignore them
-        return [node for node, incoming_edges in incoming.iteritems() if not incoming_edges and dep_map[node]]
+        return [node for node, deps in dep_map.iteritems() if deps and node not in destinations]
 
     def identical_names(self, edges):
         # type: (List[List[str]]) -> Dict[str,int]
         """Returns how many times a buck target name occurs in a edge list, filtering out unique (count == 1) names"""
-        dep_map = self.make_dep_map_from_edges(edges)
-        name_count = {}
-        for k in dep_map.keys():
-            name = self.extract_buck_target(k)
-            name_count[name] = name_count.get(name, 0) + 1
-
-        name_count = {key: value for key, value in name_count.iteritems() if value > 1}
-        return name_count
+        return DepMapBuilder(self.extract_buck_target).add_edges(edges).identical_names()
 
     def biggest_root_name(self, dep_map):
         # type: (Dict[str, List[str]]) -> str
         """
-        WARNING: Doesn't work currently.  It's a TODO to fix this.
         Finds the root with the most reachable nodes under it inside a DAG.
         The biggest root is probably the app tree.
 
         With this you don't have to pass in the root node name to self.read_dot_file(...)
+        The sizes of every root come from `reachable_counts`, one pass over the graph instead of one search per root.
         """
         roots = self.find_roots_in_dep_map(dep_map)
         root_name = None
@@ -231,43 +764,70 @@ class DotFileReader(object):
         elif len(roots) == 0:
             raise ValueError("Cyclic dependency graph given (len(roots) == 0), aborting")
         else:
-            max_size = -1
-            for r in roots:
-                size = len(self.reachability_set(dep_map, r))
-                if size > max_size:
-                    root_name, max_size = r, size
+            counts = self.reachable_counts(dep_map, roots)
+            # Sorted so ties don't depend on the dict order of dep_map, the first of the biggest roots wins
+            root_name = max(sorted(roots), key=counts.get)
         return root_name
 
     @staticmethod
-    def mod_graph_from_dep_map(dep_map, root_node_name):
-        # type: (Dict[str, List[str]],str) -> (ModuleNode, List[ModuleNode])
+    def reachable_counts(dep_map, start_names):
+        # type: (Dict[str, List[str]], List[str]) -> Dict[str, int]
+        """
+        Returns the {name: count} of the nodes reachable from each of `start_names`, including itself, like
+        `len(reachability_set(...))` but for all of them at once.
+
+        Every node gets a bit, and the nodes a strongly connected component reaches are a bitset, the union of its
+        own and of those of the components it depends on.  Components come dependencies first, so each one is ORed
+        once per dependency, and a bitset is dropped once every component that depends on it is done.  That's one
+        pass of O(V+E) ORs plus a popcount per start node, each over at most V bits, about (V+E+S) * V / 64 word
+        operations.
+        """
+        components = DotFileReader.strongly_connected_components(dep_map, start_names)
+        component_of = {}
+        for c, component in enumerate(components):
+            for node in component:
+                component_of[node] = c
+        dependents_left = [0] * len(components)
+        for c, component in enumerate(components):
+            for node in component:
+                for dep in dep_map.get(node, ()):
+                    if component_of[dep] != c:
+                        dependents_left[component_of[dep]] += 1
+
+        wanted = set(start_names)
+        counts = {}
+        reachable = [0] * len(components)
+        next_bit = 0
+        for c, component in enumerate(components):
+            bits = ((1 << len(component)) - 1) << next_bit
+            next_bit += len(component)
+            for node in component:
+                for dep in dep_map.get(node, ()):
+                    d = component_of[dep]
+                    if d != c:
+                        bits |= reachable[d]
+                        dependents_left[d] -= 1
+                        if dependents_left[d] == 0:
+                            reachable[d] = None
+            reachable[c] = bits
+            for node in component:
+                if node in wanted:
+                    counts[node] = bin(bits).count('1')
+        return counts
+
+    @staticmethod
+    def mod_graph_from_dep_map(dep_map, root_node_name, code_units=None):
+        # type: (Dict[str, List[str]],str, Dict[str, int]) -> (ModuleNode, List[ModuleNode])
         """
         Converts an outgoing edge map (`dep_map`) into a ModuleNode graph
         that you can generate a mock app from.  You have to provide the
         root node / application node name (`root_node_name`) for the graph.
+        Nodes the root node can't reach are left out, they would only be dead code in the mock app.
+        `code_units` optionally gives the code units of nodes by name, 1 otherwise.
         """
-
-        def make_mod(name):
-            return ModuleNode(name, ModuleNode.LIBRARY)
-
-        mod_map = {name: make_mod(name) for name in dep_map.keys()}
-        # TODO Fix mod_map[self.biggest_root(dep_map)].  If this works you don't
-        #      have to pass the app node name any more.
-        # app_node = mod_map[self.biggest_root_name(dep_map)]
-        app_node = mod_map[root_node_name]
-        app_node.node_type = ModuleNode.APP
-
-        for name, deps in dep_map.iteritems():
-            new_deps = []
-            for dep_name in deps:
-                mod = mod_map.get(dep_name, None)
-                if not mod:
-                    mod = make_mod(dep_name)
-                    mod_map[dep_name] = mod
-                new_deps.append(mod)
-            mod_map[name].deps = new_deps
-
-        return app_node, mod_map.values()
+        if root_node_name not in dep_map:
+            raise ValueError('Root node "{}" has no dependencies in the dot file'.format(root_node_name))
+        return ModuleGraph.from_dep_map(dep_map, root_node_name, code_units).module_nodes()
 
     @staticmethod
     def write_struct(struct, path):
@@ -301,3 +861,15 @@ class DotFileReader(object):
         for i, struct in enumerate(structs):
             path = os.path.join(dump_path, 'struct{}.py'.format(i))
             self.write_struct(struct, path)
+
+
+def _read_dot_chunk(task):
+    """Reads the lines between the `start` and `end` offsets of a dot file into a detached `DepMapBuilder`"""
+    modules_filter, path, start, end, parser, is_end = task
+    reader = DotFileReader(modules_filter)
+    with open(path, 'rb') as f:
+        f.seek(start)
+        lines = f.read(end - start).splitlines(True)
+    parser = parser or DotParser()
+    builder = DepMapBuilder(reader.extract_buck_target).add_edges(reader.iter_edges(lines, parser, is_end))
+    return builder.detach(), parser
@@ -14,7 +14,12 @@
 
 from __future__ import absolute_import
 
-from .util import first_in_dict, seed
+import random
+from array import array
+from collections import OrderedDict
+
+from .loccounter import LineCounter
+from .util import IdAllocator, first_key
 
 uber_poet_header = """
 // This code was @generated by Uber Poet, a mock application generator.
@@ -55,6 +60,10 @@ public class MyClass{0}: NSObject {{
     {1}
 }}"""
 
+# Class templates split around the calls into other modules, so call blocks are emitted as chunks of their own
+# instead of being copied into the class text.
+swift_class_template_head, swift_class_template_tail = swift_class_template.split("{2}")
+
 swift_to_swift_func_call_template = """MyClass{0}().complexCrap{1}(arg: 4, stuff: 2)"""
 swift_to_objc_func_call_template = """MyClass_{0}().complexCrap{1}(4, stuff: \"2\")"""
 
@@ -109,6 +118,8 @@ objc_source_template = """
 @end
 """
 
+objc_source_template_head, objc_source_template_tail = objc_source_template.split("{2}")
+
 
 def get_func_call_template(from_language, to_language, function_type):
     if function_type == FuncType.SWIFT_ONLY:
@@ -128,28 +139,141 @@ def get_func_call_template(from_language, to_language, function_type):
                 return objc_to_objc_func_call_template
 
 
-def get_import_func_calls(from_language, import_list, indent=0):
+def get_module_func_calls(from_language, module, indent=0):
+    """Renders every call site `from_language` code can make into the functions of a dependency `module`."""
+    out = []
+    to_language = module["language"]
+    for class_num, func_type, func_num in module["symbols"].functions():
+        if func_type == FuncType.SWIFT_ONLY and from_language == Language.OBJC and to_language == Language.SWIFT:
+            # We cannot invoke Swift only functions from ObjC since they use generics.
+            continue
+        text = get_func_call_template(from_language, to_language, func_type).format(class_num, func_num)
+        indented_text = '\n'.join(" " * indent + line for line in text.splitlines())
+        out.append(indented_text)
+
+    return out
+
+
+def get_import_func_call_lists(from_language, import_list, indent=0, call_cache=None):
+    """Returns the call sites into each module of `import_list` as a list of call lists, one per module."""
     out = []
     for i in import_list:
         if type(i) is str:
             continue
-        module = first_in_dict(i)
-        to_language = module["language"]
-        for file_result in module["files"].values():
-            for class_num, class_funcs in file_result.classes.items():
-                for func_type, func_nums in class_funcs.items():
-                    for func_num in func_nums:
-                        if (func_type == FuncType.SWIFT_ONLY and from_language == Language.OBJC and
-                                to_language == Language.SWIFT):
-                            # We cannot invoke Swift only functions from ObjC since they use generics.
-                            continue
-                        text = get_func_call_template(from_language, to_language, func_type).format(class_num, func_num)
-                        indented_text = '\n'.join(" " * indent + line for line in text.splitlines())
-                        out.append(indented_text)
+        module_name = first_key(i)
+        module = i[module_name]
+        if call_cache is None:
+            calls = get_module_func_calls(from_language, module, indent)
+        else:
+            calls = call_cache.calls_for(from_language, module_name, module, indent)
+        out.append(calls)
+
+    return out
+
+
+def get_import_func_calls(from_language, import_list, indent=0, call_cache=None):
+    out = []
+    for i in import_list:
+        if type(i) is str:
+            continue
+        module_name = first_key(i)
+        module = i[module_name]
+        if call_cache is None:
+            block = "\n".join(get_module_func_calls(from_language, module, indent))
+        else:
+            block = call_cache.block_for(from_language, module_name, module, indent)
+        if block:
+            out.append(block)
 
     return "\n".join(out)
 
 
+class ImportCallCache(object):
+    """
+    Caches the call sites rendered for a dependency module, keyed by (from language, module name, indent).
+    Every class generated in a dependent module invokes the same functions of its dependencies, so the calls
+    only need to be rendered once per module instead of once per class.
+
+    Module names are the cache keys, so call `clear()` before generating a new graph that may reuse them, and
+    `release(module_name)` once no dependent of a module is left to generate.
+    """
+
+    def __init__(self):
+        self.entries = {}  # {module name: {(from language, indent): (call list, joined call block)}}
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+
+    def _entry(self, from_language, module_name, module, indent):
+        module_entries = self.entries.setdefault(module_name, {})
+        key = (from_language, indent)
+        entry = module_entries.get(key)
+        if entry is None:
+            self.misses += 1
+            calls = get_module_func_calls(from_language, module, indent)
+            entry = (calls, "\n".join(calls))
+            module_entries[key] = entry
+        else:
+            self.hits += 1
+            self.bytes_saved += len(entry[1])
+        return entry
+
+    def calls_for(self, from_language, module_name, module, indent=0):
+        return self._entry(from_language, module_name, module, indent)[0]
+
+    def block_for(self, from_language, module_name, module, indent=0):
+        return self._entry(from_language, module_name, module, indent)[1]
+
+    def release(self, module_name):
+        self.entries.pop(module_name, None)
+
+    def clear(self):
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+
+    def __str__(self):
+        return "<hits : {} misses : {} bytes_saved : {}>".format(self.hits, self.misses, self.bytes_saved)
+
+
+class CallBudget(object):
+    """
+    Caps how many cross-module call sites the classes of a generated file contain.  Without a budget every
+    class calls every function of every dependency, so file size grows with deps * dep files * classes * funcs.
+
+    A limit of 0 means unlimited.  When a limit is hit, the kept calls are picked with a random generator
+    seeded from `seed` and the calling class number, so the same graph always produces the same sources.
+    """
+
+    def __init__(self, max_per_class=0, max_per_dependency=0, max_per_file=0, seed=0):
+        self.max_per_class = max_per_class
+        self.max_per_dependency = max_per_dependency
+        self.max_per_file = max_per_file
+        self.seed = seed
+
+    def is_unlimited(self):
+        return not (self.max_per_class or self.max_per_dependency or self.max_per_file)
+
+    @staticmethod
+    def sample(rng, calls, limit):
+        """Picks `limit` calls out of `calls`, keeping their original order."""
+        if limit is None or len(calls) <= limit:
+            return calls
+        return [calls[i] for i in sorted(rng.sample(xrange(len(calls)), limit))]
+
+    def select(self, call_lists, class_num, limit):
+        """Flattens per module `call_lists` into the calls class `class_num` should make within `limit`."""
+        rng = random.Random(self.seed * 1000003 + class_num)
+        per_dependency = self.max_per_dependency or None
+        calls = [call for calls in call_lists for call in self.sample(rng, calls, per_dependency)]
+        return self.sample(rng, calls, limit)
+
+    def __str__(self):
+        return "<max_per_class : {} max_per_dependency : {} max_per_file : {} seed : {}>".format(
+            self.max_per_class, self.max_per_dependency, self.max_per_file, self.seed)
+
+
 class Language(object):
     SWIFT = 'Swift'
     OBJC = 'Objective-C'
@@ -168,14 +292,118 @@ class FuncType(object):
     OBJC_FRIENDLY = 'objc_friendly'
 
 
+class ModuleSymbols(object):
+    """
+    The classes and functions a generated module exports to its dependents, in generation order.  Dependents only
+    need the ids to render their calls, so they are kept in flat arrays instead of holding on to the `FileResult` of
+    every file.  Functions are stored as runs of the same class and `FuncType`.
+    """
+    __slots__ = ('file_count', 'class_ids', 'run_classes', 'run_func_types', 'run_lengths', 'func_ids')
+
+    FUNC_TYPES = (FuncType.SWIFT_ONLY, FuncType.OBJC_FRIENDLY)  # run_func_types holds indexes of this tuple
+
+    def __init__(self, file_count=0):
+        self.file_count = file_count
+        # Ids take up to 60 bits (see `IdAllocator`), which fits a C long on 64 bit platforms
+        self.class_ids = array('l')
+        self.run_classes = array('l')  # index in class_ids
+        self.run_func_types = array('b')
+        self.run_lengths = array('l')
+        self.func_ids = array('l')
+
+    @classmethod
+    def from_files(cls, files):
+        """Makes the symbols of a module from its {file name: FileResult} dictionary."""
+        symbols = cls(len(files))
+        for file_result in files.values():
+            for class_num, class_funcs in file_result.classes.items():
+                symbols.add_class(class_num, class_funcs)
+        return symbols
+
+    def add_class(self, class_num, class_funcs):
+        self.class_ids.append(class_num)
+        class_index = len(self.class_ids) - 1
+        for func_type, func_nums in class_funcs.items():
+            self.run_classes.append(class_index)
+            self.run_func_types.append(self.FUNC_TYPES.index(func_type))
+            self.run_lengths.append(len(func_nums))
+            self.func_ids.extend(func_nums)
+
+    def functions(self):
+        """Yields (class id, func type, function id) for every function, in generation order."""
+        func_index = 0
+        for run in xrange(len(self.run_lengths)):
+            class_num = self.class_ids[self.run_classes[run]]
+            func_type = self.FUNC_TYPES[self.run_func_types[run]]
+            for func_num in self.func_ids[func_index:func_index + self.run_lengths[run]]:
+                yield class_num, func_type, func_num
+            func_index += self.run_lengths[run]
+
+    def first_function(self):
+        """The (class id, function id) of the first function of the first class."""
+        return self.class_ids[self.run_classes[0]], self.func_ids[0]
+
+    def __str__(self):
+        return "<file_count : {} class_count : {} function_count : {}>".format(self.file_count, len(self.class_ids),
+                                                                               len(self.func_ids))
+
+
+class ChunkedText(object):
+    """
+    Text kept as the list of chunks it is made of, so big generated files never have to exist as one string.  The
+    line count and the code, blank and comment line counts are accumulated while chunks are added.
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.newline_count = 0
+        self.line_counter = LineCounter()
+
+    def append(self, chunk):
+        self.chunks.append(chunk)
+        self.newline_count += chunk.count('\n')
+        self.line_counter.add(chunk)
+
+    def append_code_lines(self, chunk):
+        """Appends a chunk of non-empty lines of code without comments, like call sites, without scanning it"""
+        self.chunks.append(chunk)
+        self.newline_count += chunk.count('\n')
+        self.line_counter.add_code_lines(chunk)
+
+    @property
+    def line_count(self):
+        return self.newline_count + 1
+
+    def line_counts(self):
+        """The `LineCounts` of the text, call when done appending"""
+        return self.line_counter.finish()
+
+
 class FileResult(object):
 
-    def __init__(self, text, functions, classes):
+    def __init__(self, text, functions, classes, chunked_text=None):
         super(FileResult, self).__init__()
-        self.text = text  # string
-        self.text_line_count = len(text.split('\n'))
+        if chunked_text is None:
+            chunked_text = ChunkedText()
+            chunked_text.append(text)
+        self.chunks = chunked_text.chunks  # list of strings that make up the text, write them out one by one
+        self.text_line_count = chunked_text.line_count
+        self.line_counts = chunked_text.line_counts()  # LineCounts
         self.functions = functions  # list of indexes
-        self.classes = classes  # {class index: {func type: function indexes}}
+        self.classes = classes  # OrderedDict {class index: OrderedDict {func type: function indexes}}
+
+    @classmethod
+    def from_chunks(cls, chunked_text, functions, classes):
+        return cls(None, functions, classes, chunked_text)
+
+    @property
+    def text(self):
+        """The whole text joined into one string, prefer writing `chunks` out for big files"""
+        return "".join(self.chunks)
+
+    @text.setter
+    def text(self, text):
+        self.chunks = [text]
 
     def __str__(self):
         return "<text_line_count : {} functions : {} classes : {}>".format(self.text_line_count, self.functions,
@@ -184,9 +412,37 @@ class FileResult(object):
 
 class FileGenerator(object):
 
+    def __init__(self, call_cache=None, call_budget=None):
+        self.call_cache = call_cache  # ImportCallCache
+        self.call_budget = call_budget  # CallBudget
+
     def gen_file(self, class_count, function_count):
         return FileResult("", [], {})
 
+    @staticmethod
+    def templates():
+        """The templates the files are made of, which decide how many lines of code a file has."""
+        return ()
+
+    def gen_import_func_calls(self, import_list, indent, class_num, file_calls_left=None):
+        """
+        Returns the calls class `class_num` makes into the modules of `import_list`, and how many calls that is.
+        `file_calls_left` is what remains of the per file call budget, None if there is no such limit.
+        """
+        if self.call_budget is None or self.call_budget.is_unlimited():
+            return get_import_func_calls(self.language(), import_list, indent, self.call_cache), None
+
+        call_lists = get_import_func_call_lists(self.language(), import_list, indent, self.call_cache)
+        limits = [l for l in (self.call_budget.max_per_class or None, file_calls_left) if l is not None]
+        calls = self.call_budget.select(call_lists, class_num, min(limits) if limits else None)
+        return "\n".join(calls), len(calls)
+
+    def file_call_budget(self):
+        """The call budget of a whole file, None if unlimited."""
+        if self.call_budget is None:
+            return None
+        return self.call_budget.max_per_file or None
+
 
 class ObjCHeaderFileGenerator(FileGenerator):
 
@@ -209,25 +465,28 @@ class ObjCHeaderFileGenerator(FileGenerator):
 
     def get_header(self, objc_class):
         out = []
-        class_nums = {}
+        class_nums = OrderedDict()
 
         for c in objc_class.classes:
             num = c
             func_out, func_nums = self.gen_func(objc_class.classes[c][FuncType.OBJC_FRIENDLY])
             out.append(objc_header_template.format(num, func_out))
-            class_nums[num] = {FuncType.OBJC_FRIENDLY: func_nums}
+            class_nums[num] = OrderedDict([(FuncType.OBJC_FRIENDLY, func_nums)])
 
         return "\n".join(out), class_nums
 
     def gen_file(self, objc_class):
         class_out, class_nums = self.get_header(objc_class)
 
-        chunks = [uber_poet_header, objc_system_import_template, class_out]
+        out = ChunkedText()
+        for chunk in (uber_poet_header, "\n", objc_system_import_template, "\n", class_out):
+            out.append(chunk)
 
-        return FileResult("\n".join(chunks), [], class_nums)
+        return FileResult.from_chunks(out, [], class_nums)
 
 
 class ObjCSourceFileGenerator(FileGenerator):
+    functions_per_class = 5
 
     @staticmethod
     def language():
@@ -238,34 +497,47 @@ class ObjCSourceFileGenerator(FileGenerator):
         return '.m'
 
     @staticmethod
-    def gen_func(function_count, var_name):
+    def templates():
+        return uber_poet_header, objc_system_import_template, objc_source_template, objc_source_func_template
+
+    @staticmethod
+    def gen_func(function_count, var_name, ids):
         out = []
         nums = []
 
         for _ in xrange(function_count):
-            num = seed()
+            num = ids.next()
             text = objc_source_func_template.format(num, var_name)
             nums.append(num)
             out.append(text)
 
         return "\n".join(out), nums
 
-    def gen_class(self, class_count, func_per_class_count, import_list):
-        out = []
-        class_nums = {}
-
-        for _ in xrange(class_count):
-            num = seed()
-            func_out, func_nums = self.gen_func(func_per_class_count, "x")
-            func_call_out = get_import_func_calls(self.language(), import_list, indent=4)
-            out.append(objc_source_template.format(num, func_out, func_call_out))
-            class_nums[num] = {FuncType.OBJC_FRIENDLY: func_nums}
-
-        return "\n".join(out), class_nums
-
-    def gen_file(self, class_count, function_count, import_list=None):
+    def gen_class(self, class_count, func_per_class_count, import_list, ids, out):
+        """Appends the classes to the ChunkedText `out`, returns their indexes"""
+        class_nums = OrderedDict()
+        file_calls_left = self.file_call_budget()
+
+        for i in xrange(class_count):
+            num = ids.next()
+            func_out, func_nums = self.gen_func(func_per_class_count, "x", ids)
+            func_call_out, call_count = self.gen_import_func_calls(import_list, 4, num, file_calls_left)
+            if file_calls_left is not None:
+                file_calls_left -= call_count
+            if i > 0:
+                out.append("\n")
+            out.append(objc_source_template_head.format(num, func_out))
+            out.append_code_lines(func_call_out)
+            out.append(objc_source_template_tail.format(num, func_out))
+            class_nums[num] = OrderedDict([(FuncType.OBJC_FRIENDLY, func_nums)])
+
+        return class_nums
+
+    def gen_file(self, class_count, function_count, import_list=None, ids=None):
         if import_list is None:
             import_list = []
+        if ids is None:
+            ids = IdAllocator()
         imports = []
         for i in import_list:
             if type(i) is str:
@@ -273,16 +545,20 @@ class ObjCSourceFileGenerator(FileGenerator):
             elif type(i) is dict:
                 imports.append('@import {};'.format(i.keys()[0]))
         imports_out = "\n".join(imports)
-        class_out, class_nums = self.gen_class(class_count, 5, import_list)
 
-        chunks = [uber_poet_header, objc_system_import_template, imports_out, class_out]
+        out = ChunkedText()
+        for chunk in (uber_poet_header, "\n", objc_system_import_template, "\n", imports_out, "\n"):
+            out.append(chunk)
+        class_nums = self.gen_class(class_count, self.functions_per_class, import_list, ids, out)
 
-        return FileResult("\n".join(chunks), [], class_nums)
+        return FileResult.from_chunks(out, [], class_nums)
 
 
 class SwiftFileGenerator(FileGenerator):
+    functions_per_class = 5
 
-    def __init__(self):
+    def __init__(self, call_cache=None, call_budget=None):
+        super(SwiftFileGenerator, self).__init__(call_cache, call_budget)
         self.gen_state = {}
 
     @staticmethod
@@ -294,12 +570,16 @@ class SwiftFileGenerator(FileGenerator):
         return '.swift'
 
     @staticmethod
-    def gen_func(function_count, var_name, indent=0):
+    def templates():
+        return uber_poet_header, swift_class_template, swift_func_template, swift_func_objc_friendly_template
+
+    @staticmethod
+    def gen_func(function_count, var_name, ids, indent=0):
         out = []
         nums = []
 
         for _ in xrange(function_count):
-            num = seed()
+            num = ids.next()
             text = swift_func_template.format(num, var_name)
             indented_text = '\n'.join(" " * indent + line for line in text.splitlines())
             nums.append(num)
@@ -308,11 +588,11 @@ class SwiftFileGenerator(FileGenerator):
         return "\n".join(out), nums
 
     @staticmethod
-    def gen_objc_friendly_func(indent=0):
+    def gen_objc_friendly_func(ids, indent=0):
         out = []
         nums = []
 
-        num = seed()
+        num = ids.next()
         text = swift_func_objc_friendly_template.format(num)
         indented_text = '\n'.join(" " * indent + line for line in text.splitlines())
         nums.append(num)
@@ -320,35 +600,46 @@ class SwiftFileGenerator(FileGenerator):
 
         return "\n".join(out), nums
 
-    def gen_class(self, class_count, func_per_class_count, import_list):
-        out = []
-        class_nums = {}
+    def gen_class(self, class_count, func_per_class_count, import_list, ids, out):
+        """Appends the classes to the ChunkedText `out`, returns their indexes"""
+        class_nums = OrderedDict()
+        file_calls_left = self.file_call_budget()
 
-        for _ in xrange(class_count):
-            num = seed()
-            swift_only_func_out, swift_only_func_nums = self.gen_func(func_per_class_count, "x", indent=4)
-            swift_objc_friendly_func_out, swift_objc_friendly_func_nums = self.gen_objc_friendly_func(indent=4)
+        for i in xrange(class_count):
+            num = ids.next()
+            swift_only_func_out, swift_only_func_nums = self.gen_func(func_per_class_count, "x", ids, indent=4)
+            swift_objc_friendly_func_out, swift_objc_friendly_func_nums = self.gen_objc_friendly_func(ids, indent=4)
             func_out = swift_only_func_out + "\n" + swift_objc_friendly_func_out
-            func_call_out = get_import_func_calls(self.language(), import_list, indent=8)
-            out.append(swift_class_template.format(num, func_out, func_call_out))
-
-            class_nums[num] = {
-                FuncType.SWIFT_ONLY: swift_only_func_nums,
-                FuncType.OBJC_FRIENDLY: swift_objc_friendly_func_nums
-            }
-
-        return "\n".join(out), class_nums
-
-    def gen_file(self, class_count, function_count, import_list=None):
+            func_call_out, call_count = self.gen_import_func_calls(import_list, 8, num, file_calls_left)
+            if file_calls_left is not None:
+                file_calls_left -= call_count
+            if i > 0:
+                out.append("\n")
+            out.append(swift_class_template_head.format(num, func_out))
+            out.append_code_lines(func_call_out)
+            out.append(swift_class_template_tail.format(num, func_out))
+
+            class_nums[num] = OrderedDict([
+                (FuncType.SWIFT_ONLY, swift_only_func_nums),
+                (FuncType.OBJC_FRIENDLY, swift_objc_friendly_func_nums),
+            ])
+
+        return class_nums
+
+    def gen_file(self, class_count, function_count, import_list=None, ids=None):
         if import_list is None:
             import_list = []
+        if ids is None:
+            ids = IdAllocator()
         imports_out = "\n".join(["import {}".format(i if type(i) is str else i.keys()[0]) for i in import_list])
-        func_out, func_nums = self.gen_func(function_count, "7")
-        class_out, class_nums = self.gen_class(class_count, 5, import_list)
+        func_out, func_nums = self.gen_func(function_count, "7", ids)
 
-        chunks = [uber_poet_header, imports_out, func_out, class_out]
+        out = ChunkedText()
+        for chunk in (uber_poet_header, "\n", imports_out, "\n", func_out, "\n"):
+            out.append(chunk)
+        class_nums = self.gen_class(class_count, self.functions_per_class, import_list, ids, out)
 
-        return FileResult("\n".join(chunks), func_nums, class_nums)
+        return FileResult.from_chunks(out, func_nums, class_nums)
 
     @staticmethod
     def gen_main(template, importing_module_name, class_num, func_num, to_language):
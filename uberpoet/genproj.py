@@ -21,8 +21,9 @@ import sys
 import time
 from os.path import join
 
-from . import blazeprojectgen, commandlineutil, cpprojectgen
-from .moduletree import ModuleGenType
+from . import blazeprojectgen, commandlineutil, cpprojectgen, modulegen
+from .graphstats import GraphStats
+from .moduletree import ModuleGenType, ModuleNode
 
 
 class GenProjCommandLine(object):
@@ -68,6 +69,19 @@ class GenProjCommandLine(object):
             '--print_dependency_graph',
             default=False,
             help='If true, prints out the dependency edge list and exits instead of generating an application.')
+        parser.add_argument(
+            '--print_graph_stats',
+            action='store_true',
+            default=False,
+            help='Prints numbers about the dependency graph that predict how well the app builds in parallel (critical '
+            'path, modules per level, fan in / out, ideal speedup bounds) and exits instead of generating an '
+            'application.')
+        parser.add_argument(
+            '--count_transitive_dependencies',
+            action='store_true',
+            default=False,
+            help='With --print_graph_stats, also counts the direct and indirect dependencies of every module.  Takes '
+            'time and memory quadratic in the module count, minutes on graphs of 100k modules.')
         # CocoaPods specific options
         parser.add_argument(
             '--cocoapods_use_deterministic_uuids',
@@ -100,17 +114,20 @@ class GenProjCommandLine(object):
         if args.print_dependency_graph:
             print_nodes(node_list)
             exit(0)
+        if args.print_graph_stats:
+            print_graph_stats(app_node, node_list, graph_config, args.count_transitive_dependencies)
+            exit(0)
 
-        commandlineutil.del_old_output_dir(args.output_directory)
-        gen = project_generator_for_arg(args)
+        commandlineutil.prepare_output_dir(args.output_directory)
+        gen = project_generator_for_arg(args, graph_config.call_budget(), graph_config.jobs)
 
         logging.info("Project Generator type: %s", args.project_generator_type)
         logging.info("Generation type: %s", args.gen_type)
         logging.info("Creating a {} module count mock app in {}".format(len(node_list), args.output_directory))
         logging.info("Example command to generate Xcode workspace: $ {}".format(gen.example_command()))
 
-        gen.gen_app(app_node, node_list, graph_config.swift_lines_of_code, graph_config.objc_lines_of_code,
-                    graph_config.loc_json_file_path)
+        line_counts = gen.gen_app(app_node, node_list, graph_config.swift_lines_of_code,
+                                  graph_config.objc_lines_of_code, graph_config.loc_json_file_path)
 
         fin = time.time()
         logging.info("Done in %f s", fin - start)
@@ -124,7 +141,8 @@ class GenProjCommandLine(object):
                 "swift_lines_of_code": args.swift_lines_of_code,
                 "objc_lines_of_code": args.objc_lines_of_code
             },
-            "time_to_generate": fin - start
+            "time_to_generate": fin - start,
+            "line_counts": {language: counts.to_dict() for language, counts in line_counts.items()}
         }
         with open(join(args.output_directory, "project_info.json"), "w") as project_info_json_file:
             json.dump(project_info, project_info_json_file)
@@ -136,19 +154,38 @@ def print_nodes(node_list):
         print(edge[0], edge[1])
 
 
-def project_generator_for_arg(args):
+def print_graph_stats(app_node, node_list, graph_config, count_transitive_dependencies=False):
+    library_node_list = [n for n in node_list if n.node_type == ModuleNode.LIBRARY]
+    loc_for_module = None
+    # Without libraries or lines of code there is nothing to plan, the critical path by LOC is left out
+    if library_node_list and (graph_config.loc_json_file_path or
+                              graph_config.swift_lines_of_code + graph_config.objc_lines_of_code > 0):
+        plans = modulegen.plan_modules(library_node_list, graph_config.swift_lines_of_code,
+                                       graph_config.objc_lines_of_code, graph_config.loc_json_file_path)
+        loc_for_module = {plan.node.name: plan.loc * plan.node.code_units for plan in plans}
+    print(GraphStats(app_node, node_list, loc_for_module, count_transitive_dependencies).report())
+
+
+def project_generator_for_arg(args, call_budget=None, jobs=1):
     if args.project_generator_type == 'buck' or args.project_generator_type == 'bazel':
         if not args.blaze_module_path:
             raise ValueError("Must supply --blaze_module_path when using the Buck or Bazel generators.")
         return blazeprojectgen.BlazeProjectGenerator(
-            args.output_directory, args.blaze_module_path, use_wmo=args.use_wmo, flavor=args.project_generator_type)
+            args.output_directory,
+            args.blaze_module_path,
+            use_wmo=args.use_wmo,
+            flavor=args.project_generator_type,
+            call_budget=call_budget,
+            jobs=jobs)
     elif args.project_generator_type == 'cocoapods':
         return cpprojectgen.CocoaPodsProjectGenerator(
             args.output_directory,
             use_wmo=args.use_wmo,
             use_dynamic_linking=args.use_dynamic_linking,
             use_deterministic_uuids=args.cocoapods_use_deterministic_uuids,
-            generate_multiple_pod_projects=args.cocoapods_generate_multiple_pod_projects)
+            generate_multiple_pod_projects=args.cocoapods_generate_multiple_pod_projects,
+            call_budget=call_budget,
+            jobs=jobs)
     else:
         raise ValueError("Unknown project generator arg: " + str(args.project_generator_type))
 
@@ -0,0 +1,90 @@
+#  Copyright (c) 2021 Uber Technologies, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+
+import hashlib
+import json
+import logging
+from os.path import join
+
+from .moduletree import ModuleNode
+from .util import write_file_atomically
+
+
+class DotGraphCache(object):
+    """
+    Caches the module graphs read from dot files, already topologically sorted, so reading the same dot file again
+    (every multisuite app type, or back to back genproj runs) skips parsing and sorting it.
+
+    Entries are JSON adjacency lists in `DIR_NAME` under `cache_dir`, keyed by a hash of the dot file content and of
+    every option that changes the graph read from it.  The cache is best effort, if an entry can't be read or written
+    the dot file is just parsed again.
+    """
+
+    DIR_NAME = "dot_graphs"
+    VERSION = 4  # Bump when the graphs read from dot files change
+
+    def __init__(self, cache_dir):
+        self.dir = join(cache_dir, self.DIR_NAME)
+
+    @staticmethod
+    def file_hash(path):
+        md5 = hashlib.md5()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                md5.update(block)
+        return md5.hexdigest()
+
+    def key(self, path, modules_filter, root_node_name, condense_cycles=False, file_format='dot'):
+        options = [file_format, sorted(modules_filter), root_node_name or "", condense_cycles]
+        return hashlib.md5(json.dumps([self.VERSION, self.file_hash(path)] + options)).hexdigest()
+
+    def entry_path(self, key):
+        return join(self.dir, key + ".json")
+
+    def load(self, key):
+        """Returns the cached (app node, topologically sorted node list) for `key`, or None if there is none."""
+        try:
+            with open(self.entry_path(key), "r") as f:
+                return self.graph_from_json(json.load(f))
+        except (IOError, OSError, ValueError, LookupError, TypeError):
+            return None
+
+    def save(self, key, app_node, node_list):
+        try:
+            write_file_atomically(self.entry_path(key), json.dumps(self.graph_to_json(app_node, node_list)))
+        except (IOError, OSError) as e:
+            logging.debug("Could not save the dot graph cache entry %s: %s", key, e)
+
+    @staticmethod
+    def graph_to_json(app_node, node_list):
+        """Nodes are [name, node type, code units, language, [dependency indexes]] lists, in `node_list` order."""
+        index = {node: i for i, node in enumerate(node_list)}
+        return {
+            "app": index[app_node],
+            "nodes": [[n.name, n.node_type, n.code_units, n.language, [index[d] for d in n.deps]] for n in node_list]
+        }
+
+    @staticmethod
+    def graph_from_json(graph):
+        nodes = []
+        for name, node_type, code_units, language, _ in graph["nodes"]:
+            node = ModuleNode(str(name), str(node_type))
+            node.code_units = code_units
+            node.language = str(language) if language is not None else None
+            nodes.append(node)
+        for node, (_, _, _, _, dep_indexes) in zip(nodes, graph["nodes"]):
+            node.deps = [nodes[i] for i in dep_indexes]
+        return nodes[graph["app"]], nodes
@@ -0,0 +1,154 @@
+#  Copyright (c) 2021 Uber Technologies, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+
+from typing import Dict, List, Sequence  # noqa: F401
+
+from .moduletree import ModuleGraph, ModuleNode
+
+
+class CriticalPath(object):
+    """
+    The chain of dependent modules with the highest total weight (code units or LOC) in a module graph.  A module can
+    only be built after its dependencies, so no amount of cores builds the graph faster than its critical path.
+    """
+
+    def __init__(self, graph, weights):
+        # type: (ModuleGraph, Sequence[int]) -> None
+        """`graph` ids have to be in topological order, `weights` has the weight of every module by id."""
+        finish = [0] * graph.node_count()  # The weight of the heaviest chain that ends with each module
+        previous = [-1] * graph.node_count()
+        dep_offsets, dep_targets = graph.dep_offsets, graph.dep_targets
+        for i in xrange(graph.node_count()):
+            heaviest = -1
+            for d in dep_targets[dep_offsets[i]:dep_offsets[i + 1]]:
+                if heaviest == -1 or finish[d] > finish[heaviest]:
+                    heaviest = d
+            previous[i] = heaviest
+            finish[i] = weights[i] + (finish[heaviest] if heaviest != -1 else 0)
+
+        path = []
+        # The last of the heaviest chains, which goes up to the app when it's in a tie
+        i = max(reversed(xrange(graph.node_count())), key=finish.__getitem__) if finish else -1
+        while i != -1:
+            path.append(graph.names[i])
+            i = previous[i]
+        self.modules = path[::-1]  # type: List[str]
+        self.weight = max(finish) if finish else 0
+        self.total_weight = sum(weights)
+
+    def parallelism(self):
+        # type: () -> float
+        """How many cores the graph can keep busy on average, the total weight over the critical path weight"""
+        return float(self.total_weight) / self.weight if self.weight else 1.0
+
+    def speedup_bound(self, cores):
+        # type: (int) -> float
+        """The highest speedup building the graph on `cores` cores can get over building it on one core"""
+        return min(float(cores), self.parallelism())
+
+
+class GraphStats(object):
+    """
+    Numbers about a module dependency graph that predict how well its mock app builds in parallel.  They are cheap
+    to compute, so candidate graphs can be compared before generating and building them.
+
+    Everything is computed in a pass or two over the modules and dependencies.  The transitive dependency count is
+    only computed when asked for, it ORs bitsets of the transitive dependencies of every module (about modules *
+    dependencies / 64 word operations), which takes minutes on graphs of 100k modules.
+    """
+
+    CORE_COUNTS = (2, 4, 8, 16, 32, 64)
+
+    def __init__(self, app_node, node_list, loc_for_module=None, count_transitive_edges=False):
+        # type: (ModuleNode, List[ModuleNode], Dict[str, int], bool) -> None
+        """
+        `loc_for_module` optionally gives the lines of code of modules by name, for the critical path by LOC.
+        `transitive_edge_count` is None unless `count_transitive_edges`.
+        """
+        order, levels = ModuleNode.topological_sort(node_list)
+        graph = ModuleGraph.from_module_nodes(app_node, order)  # Ids are in topological order
+
+        self.module_count = graph.node_count()
+        self.edge_count = graph.edge_count()
+        self.level_widths = [0] * (levels[-1] + 1 if levels else 0)
+        for level in levels:
+            self.level_widths[level] += 1
+
+        fan_ins = [0] * graph.node_count()
+        for d in graph.dep_targets:
+            fan_ins[d] += 1
+        fan_outs = [graph.dep_offsets[i + 1] - graph.dep_offsets[i] for i in xrange(graph.node_count())]
+        self.max_fan_in = max(fan_ins or [0])
+        self.max_fan_out = max(fan_outs or [0])
+        # Every dependency is one module's fan out and another one's fan in, so both have the same average
+        self.average_fan = float(self.edge_count) / self.module_count if self.module_count else 0.0
+
+        self.transitive_edge_count = None
+        if count_transitive_edges:
+            self.transitive_edge_count = self.count_transitive_edges(graph)
+        self.code_units_path = CriticalPath(graph, graph.code_units)
+        self.loc_path = None
+        if loc_for_module is not None:
+            self.loc_path = CriticalPath(graph, [loc_for_module.get(name, 0) for name in graph.names])
+
+    @staticmethod
+    def count_transitive_edges(graph):
+        # type: (ModuleGraph) -> int
+        """
+        Counts the (module, direct or indirect dependency) pairs of `graph`, whose ids have to be in topological
+        order.  The transitive dependencies of a module are a bitset of ids, the union of those of its dependencies.
+        A bitset is dropped once all of the modules that depend on it are done.
+        """
+        dependents_left = [0] * graph.node_count()
+        for d in graph.dep_targets:
+            dependents_left[d] += 1
+
+        reachable = [0] * graph.node_count()
+        count = 0
+        dep_offsets, dep_targets = graph.dep_offsets, graph.dep_targets
+        for i in xrange(graph.node_count()):
+            bits = 0
+            for d in dep_targets[dep_offsets[i]:dep_offsets[i + 1]]:
+                bits |= reachable[d] | (1 << d)
+                dependents_left[d] -= 1
+                if dependents_left[d] == 0:
+                    reachable[d] = None
+            reachable[i] = bits
+            count += bin(bits).count('1')
+        return count
+
+    def report(self):
+        # type: () -> str
+        counts = 'Modules: {}, dependencies: {}'.format(self.module_count, self.edge_count)
+        if self.transitive_edge_count is not None:
+            counts += ', transitive dependencies: {}'.format(self.transitive_edge_count)
+        lines = [
+            counts,
+            'Levels: {}, modules per level: {}'.format(
+                len(self.level_widths), ' '.join(str(w) for w in self.level_widths)),
+            'Fan in: max {}, average {:.2f}.  Fan out: max {}, average {:.2f}'.format(
+                self.max_fan_in, self.average_fan, self.max_fan_out, self.average_fan),
+        ]
+        paths = [('code units', self.code_units_path)]
+        if self.loc_path:
+            paths.append(('LOC', self.loc_path))
+        for unit, path in paths:
+            lines.append('Critical path by {}: {} of {} over {} modules ({} -> ... -> {}), parallelism {:.2f}'.format(
+                unit, path.weight, path.total_weight, len(path.modules), path.modules[0] if path.modules else '',
+                path.modules[-1] if path.modules else '', path.parallelism()))
+            lines.append('Ideal speedup bound by {}: {}'.format(
+                unit, ', '.join('{:.2f} on {} cores'.format(path.speedup_bound(c), c) for c in self.CORE_COUNTS)))
+        return '\n'.join(lines)
@@ -12,49 +12,90 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from __future__ import absolute_import
+
+import hashlib
+import json
 import logging
-import tempfile
-from math import ceil
 from os.path import join
 
-from .commandlineutil import count_loc
 from .filegen import Language
+from .loccounter import COUNTER_VERSION, count_text
 from .memoize import memoized
+from .util import default_cache_dir, write_file_atomically
+
+
+class LOCCalibrationCache(object):
+    """
+    Persists the lines of code of the sample files module sizes are calibrated with, so they are only generated and
+    counted once per set of templates instead of on every run.  Entries are keyed by a hash of everything that could
+    change the count, stale entries are never read again.
+
+    A `cache_dir` of None keeps the entries in memory only.  The cache is best effort, if it can't be read or written
+    the calibration is just done again.
+    """
+
+    FILE_NAME = "loc_calibration.json"
+
+    def __init__(self, cache_dir=None):
+        self.path = join(cache_dir, self.FILE_NAME) if cache_dir else None
+        self.entries = self.load()
+
+    @staticmethod
+    def key(file_generator, class_count, function_count):
+        parts = [
+            COUNTER_VERSION,
+            file_generator.language(),
+            file_generator.extension(), class_count, function_count, file_generator.functions_per_class
+        ] + list(file_generator.templates())
+        return hashlib.md5(json.dumps(parts)).hexdigest()
+
+    def load(self):
+        if self.path is None:
+            return {}
+        try:
+            with open(self.path, "r") as f:
+                entries = json.load(f)
+        except (IOError, OSError, ValueError):
+            return {}
+        return entries if isinstance(entries, dict) else {}
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def set(self, key, loc):
+        self.entries[key] = loc
+        if self.path is None:
+            return
+        try:
+            write_file_atomically(self.path, json.dumps(self.entries))
+        except (IOError, OSError) as e:
+            logging.debug("Could not save the LOC calibration cache to %s: %s", self.path, e)
 
 
 class LOCCalculator(object):
 
-    @memoized
+    def __init__(self, calibration_cache=None):
+        if calibration_cache is None:
+            calibration_cache = LOCCalibrationCache(default_cache_dir())
+        self.calibration_cache = calibration_cache
+
+    @memoized(max_size=64, per_instance=True)
     def calculate_loc(self, text, language):
-        # actual code = lines of code, minus whitespace
-        # calculated using cloc
-        if language == Language.SWIFT:
-            extension = '.swift'
-        elif language == Language.OBJC:
-            extension = '.m'
-        else:
+        # actual code = lines of code, minus whitespace and comments, counted like cloc does
+        if language not in Language.enum_list():
             raise ValueError("Unknown language: {}".format(language))
+        return count_text(text).code
 
-        tmp_file_path = join(tempfile.gettempdir(), 'ub_mock_gen_example_file{}'.format(extension))
-        with open(tmp_file_path, 'w') as f:
-            f.write(text)
-        loc = count_loc(tmp_file_path, language)
-
-        if loc == -1:
-            logging.warning("Using fallback loc calc method due to cloc not being installed.")
-            if language == Language.SWIFT:
-                # fallback if cloc is not installed
-                # this fallback is based on running cloc on the file made by `self.swift_gen.gen_file(3, 3)`
-                # and saving the result of cloc(file_result.text) / file_result.text_line_count to here:
-                fallback_code_multiplier = 0.811537333
-            elif language == Language.OBJC:
-                # fallback if cloc is not installed
-                # this fallback is based on running cloc on the file made by `self.objc_source_gen.gen_file(3, 3)`
-                # and saving the result of cloc(file_result.text) / file_result.text_line_count to here:
-                fallback_code_multiplier = 0.772727272
-            else:
-                raise ValueError('No fallback multiplier calculated for language: {}'.format(language))
-
-            loc = int(ceil(len(text.split('\n')) * fallback_code_multiplier))
-
+    def calculate_file_size_loc(self, file_generator, class_count=3, function_count=3):
+        """
+        Returns the lines of code of a `class_count` x `function_count` sample file of `file_generator`, from the
+        calibration cache if it was counted before.
+        """
+        key = self.calibration_cache.key(file_generator, class_count, function_count)
+        loc = self.calibration_cache.get(key)
+        if loc is None:
+            sample = file_generator.gen_file(class_count, function_count)
+            loc = self.calculate_loc(sample.text, file_generator.language())
+            self.calibration_cache.set(key, loc)
         return loc
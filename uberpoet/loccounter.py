@@ -0,0 +1,166 @@
+#  Copyright (c) 2021 Uber Technologies, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+
+import os
+from os.path import isdir, join, splitext
+
+# Bump when the way lines are counted changes, it invalidates the persisted LOC calibrations
+COUNTER_VERSION = 1
+
+# The values are the ones of `filegen.Language`.  filegen counts lines while generating files, so this module can't
+# import it back.
+LANGUAGE_FOR_EXTENSION = {
+    '.swift': 'Swift',
+    '.m': 'Objective-C',
+    '.h': 'Objective-C',
+}
+
+
+class LineCounts(object):
+    """Code, blank and comment line counts, like the ones cloc reports"""
+    __slots__ = ('code', 'blank', 'comment')
+
+    def __init__(self, code=0, blank=0, comment=0):
+        self.code = code
+        self.blank = blank
+        self.comment = comment
+
+    def __add__(self, other):
+        return LineCounts(self.code + other.code, self.blank + other.blank, self.comment + other.comment)
+
+    def __eq__(self, other):
+        return (self.code, self.blank, self.comment) == (other.code, other.blank, other.comment)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def to_dict(self):
+        return {"code": self.code, "blank": self.blank, "comment": self.comment}
+
+    def __repr__(self):
+        return "LineCounts(code={}, blank={}, comment={})".format(self.code, self.blank, self.comment)
+
+
+class LineCounter(object):
+    """
+    Counts the code, blank and comment lines of Swift and Objective-C source the way cloc does: lines with only
+    whitespace are blank, lines with only `//` or `/* */` comments are comments and everything else is code.
+    Like cloc, comment markers inside string literals are not special cased.
+
+    Text can be added in chunks that split lines anywhere, so files can be counted while they are generated.
+    """
+
+    def __init__(self):
+        self.counts = LineCounts()
+        self.in_block_comment = False
+        self.partial_line = ''
+
+    def add(self, text):
+        lines = (self.partial_line + text).split('\n')
+        self.partial_line = lines.pop()
+        for line in lines:
+            self.count_line(line)
+
+    def add_code_lines(self, text):
+        """
+        Like `add`, for text that is known to only be non-empty lines of code without comments, ex: call sites.
+        The text isn't scanned line by line, only its newlines are counted.
+        """
+        if not text:
+            return
+        last_newline = text.rfind('\n')
+        if last_newline == -1:
+            self.partial_line += text
+            return
+        # The first line continues the current partial line, which makes it code as well
+        self.counts.code += text.count('\n', 0, last_newline + 1)
+        self.partial_line = text[last_newline + 1:]
+
+    def finish(self):
+        """Counts the last line if it has no trailing newline and returns the counts."""
+        if self.partial_line:
+            self.count_line(self.partial_line)
+            self.partial_line = ''
+        return self.counts
+
+    def count_line(self, line):
+        line = line.strip()
+        if not line:
+            self.counts.blank += 1
+        elif self.has_code(line):
+            self.counts.code += 1
+        else:
+            self.counts.comment += 1
+
+    def has_code(self, line):
+        """Tells if `line` has anything outside of comments, keeping track of block comments spanning lines."""
+        has_code = False
+        pos = 0
+        while pos < len(line):
+            if self.in_block_comment:
+                end = line.find('*/', pos)
+                if end == -1:
+                    break
+                self.in_block_comment = False
+                pos = end + 2
+                continue
+
+            line_comment = line.find('//', pos)
+            block_comment = line.find('/*', pos)
+            starts = [i for i in (line_comment, block_comment) if i != -1]
+            if not starts:
+                return has_code or bool(line[pos:].strip())
+            start = min(starts)
+            has_code = has_code or bool(line[pos:start].strip())
+            if start == line_comment:
+                break
+            self.in_block_comment = True
+            pos = start + 2
+
+        return has_code
+
+
+def count_text(text):
+    """Returns the `LineCounts` of source `text`."""
+    counter = LineCounter()
+    counter.add(text)
+    return counter.finish()
+
+
+def count_file(path):
+    counter = LineCounter()
+    with open(path, 'r') as f:
+        for line in f:
+            counter.add(line)
+    return counter.finish()
+
+
+def count_path(path):
+    """
+    Returns the {language: LineCounts} of the Swift and Objective-C files (.swift, .m and .h) in `path`, which can be a
+    directory or a single file.  Unlike cloc, headers count as Objective-C.
+    """
+    if isdir(path):
+        file_paths = (join(dir_path, name) for dir_path, _, names in os.walk(path) for name in names)
+    else:
+        file_paths = [path]
+
+    counts = {}
+    for file_path in file_paths:
+        language = LANGUAGE_FOR_EXTENSION.get(splitext(file_path)[1])
+        if language is not None:
+            counts[language] = counts.get(language, LineCounts()) + count_file(file_path)
+    return counts
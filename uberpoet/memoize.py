@@ -12,37 +12,161 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import collections
-import functools
+from __future__ import absolute_import
 
+import hashlib
+import sys
+from collections import OrderedDict
 
-# See https://wiki.python.org/moin/PythonDecoratorLibrary#Memoize
-class memoized(object):
-    '''Decorator. Caches a function's return value each time it is called.
-   If called later with the same arguments, the cached value is returned
-   (not reevaluated).
-   '''
+DEFAULT_MAX_SIZE = 128
+DEFAULT_DIGEST_THRESHOLD = 1024
 
-    def __init__(self, func):
+
+class LRUCache(object):
+    """A dictionary with at most `max_size` entries (unbounded if None), evicting the least recently used first."""
+
+    def __init__(self, max_size=DEFAULT_MAX_SIZE):
+        self.max_size = max_size
+        self.entries = OrderedDict()  # {key: (value, size in bytes)}, least recently used first
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes_held = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def lookup(self, key):
+        """Returns (True, value) if `key` is cached, (False, None) otherwise."""
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            self.misses += 1
+            return False, None
+        self.entries[key] = entry  # Moves it last, as the most recently used
+        self.hits += 1
+        return True, entry[0]
+
+    def store(self, key, value):
+        if key in self.entries:
+            self.bytes_held -= self.entries.pop(key)[1]
+        size = _size_of(key) + sys.getsizeof(value)
+        self.entries[key] = (value, size)
+        self.bytes_held += size
+        while self.max_size is not None and len(self.entries) > self.max_size:
+            _, (_, evicted_size) = self.entries.popitem(last=False)
+            self.bytes_held -= evicted_size
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+        self.bytes_held = 0
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self.entries),
+            "bytes_held": self.bytes_held
+        }
+
+    def __str__(self):
+        return "<LRUCache size: {} max_size: {} hits: {} misses: {} evictions: {} bytes_held: {}>".format(
+            len(self.entries), self.max_size, self.hits, self.misses, self.evictions, self.bytes_held)
+
+
+def _size_of(key):
+    return sys.getsizeof(key) + sum(sys.getsizeof(part) for part in key)
+
+
+def _key_part(arg, digest_threshold):
+    """Strings longer than `digest_threshold` are keyed by their digest, so the cache doesn't keep them alive."""
+    if digest_threshold is None or not isinstance(arg, basestring) or len(arg) <= digest_threshold:
+        return arg
+    data = arg.encode('utf-8') if isinstance(arg, unicode) else arg
+    return type(arg), len(arg), hashlib.md5(data).digest()
+
+
+class Memoized(object):
+    """
+    Caches the return values of `func` for its arguments, see `memoized`.  On a method with `per_instance` set, each
+    instance gets its own cache, which goes away with the instance.  Otherwise all calls share `cache`, and the
+    instance is part of the key.
+    """
+
+    def __init__(self, func, max_size=DEFAULT_MAX_SIZE, digest_threshold=DEFAULT_DIGEST_THRESHOLD, per_instance=False):
         self.func = func
-        self.cache = {}
+        self.max_size = max_size
+        self.digest_threshold = digest_threshold
+        self.per_instance = per_instance
+        self.cache = LRUCache(max_size)
+        self.__doc__ = func.__doc__
+        self.__name__ = func.__name__
 
     def __call__(self, *args):
-        if not isinstance(args, collections.Hashable):
-            # uncacheable. a list, for instance.
-            # better to not cache than blow up.
+        return self.call(self.cache, args, args)
+
+    def call(self, cache, key_args, args):
+        try:
+            key = tuple(_key_part(arg, self.digest_threshold) for arg in key_args)
+            found, value = cache.lookup(key)
+        except TypeError:
+            # Unhashable arguments, a list for instance.  Better to not cache than blow up.
             return self.func(*args)
-        if args in self.cache:
-            return self.cache[args]
-        else:
+        if not found:
             value = self.func(*args)
-            self.cache[args] = value
-            return value
+            cache.store(key, value)
+        return value
+
+    def stats(self):
+        return self.cache.stats()
 
     def __repr__(self):
         '''Return the function's docstring.'''
         return self.func.__doc__
 
     def __get__(self, obj, objtype):
-        '''Support instance methods.'''
-        return functools.partial(self.__call__, obj)
+        """
+        Supports instance methods.  The bound method is saved on the instance, which shadows this descriptor, so it is
+        only made once per instance instead of on every attribute access.
+        """
+        if obj is None:
+            return self
+        bound = BoundMemoized(self, obj)
+        if hasattr(obj, '__dict__'):
+            obj.__dict__[self.__name__] = bound
+        return bound
+
+
+class BoundMemoized(object):
+    """A `Memoized` method bound to an instance."""
+
+    def __init__(self, memoized_func, obj):
+        self.memoized_func = memoized_func
+        self.obj = obj
+        self.cache = LRUCache(memoized_func.max_size) if memoized_func.per_instance else memoized_func.cache
+
+    def __call__(self, *args):
+        key_args = args if self.memoized_func.per_instance else (self.obj,) + args
+        return self.memoized_func.call(self.cache, key_args, (self.obj,) + args)
+
+    def stats(self):
+        return self.cache.stats()
+
+
+# Based on https://wiki.python.org/moin/PythonDecoratorLibrary#Memoize
+def memoized(func=None, max_size=DEFAULT_MAX_SIZE, digest_threshold=DEFAULT_DIGEST_THRESHOLD, per_instance=False):
+    """
+    Decorator.  Caches a function's return value each time it is called.  If called later with the same arguments,
+    the cached value is returned (not reevaluated).  Use as `@memoized` or with options, ex:
+    `@memoized(max_size=16, per_instance=True)`.
+
+    At most `max_size` results are kept (None for no limit), the least recently used are evicted first.  String
+    arguments longer than `digest_threshold` are keyed by their md5 digest instead of being held by the cache (None
+    to always key by value).
+    """
+
+    def decorator(f):
+        return Memoized(f, max_size, digest_threshold, per_instance)
+
+    return decorator if func is None else decorator(func)
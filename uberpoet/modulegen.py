@@ -0,0 +1,253 @@
+#  Copyright (c) 2021 Uber Technologies, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+
+import logging
+import math
+import multiprocessing
+from os.path import splitext
+
+from . import locreader
+from .filegen import Language
+from .loccounter import LANGUAGE_FOR_EXTENSION, LineCounts, count_text
+from .moduletree import ModuleGraph, ModuleNode
+from .util import makedir
+
+
+class ModulePlan(object):
+    """The lines of code and language a library module should be generated with"""
+
+    def __init__(self, node, loc, language):
+        self.node = node  # ModuleNode
+        self.loc = loc
+        self.language = language
+
+
+def module_node_view(app_node, node_list):
+    """
+    Returns the `ModuleNode` graph generators work on: `app_node` and `node_list` as they are, or the `module_nodes`
+    view of `app_node` if it is a `ModuleGraph`, whose ids have to be in topological order.
+    """
+    if isinstance(app_node, ModuleGraph):
+        return app_node.module_nodes()
+    return app_node, node_list
+
+
+def plan_modules(library_node_list, target_swift_loc, target_objc_loc, loc_json_file_path):
+    """
+    Decides the LOC and language of every library module, either from the LOC file at `loc_json_file_path` or by
+    splitting the target LOC counts over the modules.  Returns a list of `ModulePlan` in `library_node_list` order.
+    Without a LOC file, modules whose `language` the graph tells keep it.
+
+    `library_node_list` can also be a `ModuleGraph`, whose library modules are planned in id order on its
+    `ModuleNode` view.
+    """
+    if isinstance(library_node_list, ModuleGraph):
+        _, node_list = library_node_list.module_nodes()
+        library_node_list = [n for n in node_list if n.node_type == ModuleNode.LIBRARY]
+
+    if loc_json_file_path:
+        loc_reader = locreader.LocFileReader()
+        loc_reader.read_loc_file(loc_json_file_path)
+        return [
+            ModulePlan(n, loc_reader.loc_for_module(n.name), loc_reader.language_for_module(n.name))
+            for n in library_node_list
+        ]
+
+    total_code_units = 0
+    for l in library_node_list:
+        total_code_units += l.code_units
+
+    total_loc = target_swift_loc + target_objc_loc
+    swift_module_count_percentage = round(float(target_swift_loc) / total_loc, 2)
+    loc_per_unit = total_loc / total_code_units
+
+    max_swift_index = int(math.ceil((len(library_node_list) * swift_module_count_percentage)))
+    plans = []
+    for idx, n in enumerate(library_node_list):
+        language = n.language or (Language.OBJC if idx >= max_swift_index else Language.SWIFT)
+        plans.append(ModulePlan(n, loc_per_unit, language))
+    return plans
+
+
+def gen_lib_modules(project_generator, plans, jobs=1, keep_symbols=()):
+    """
+    Generates every planned library module with `project_generator.gen_lib_module` and returns the resulting
+    module index.  `plans` has to be topologically sorted, so a module's dependencies are in the index before the
+    module itself is generated.
+
+    The symbols of a module (see `ModuleSymbols`) are only kept in the index until its last dependent is
+    generated, unless the module is in `keep_symbols`.  That keeps memory flat on big graphs.
+
+    With `jobs` > 1, modules are grouped into dependency levels and every level is generated on a process pool.
+    Generated ids only depend on the module and file they are in (see `IdAllocator`), so the output is identical
+    to a serial run.
+    """
+    symbol_users = SymbolUsers(plans, keep_symbols)
+    if jobs <= 1:
+        module_index = {}
+        for plan in plans:
+            symbols, line_counts = project_generator.gen_lib_module(module_index, plan.node, plan.loc, plan.language)
+            module_index[plan.node.name] = _index_entry(plan, symbols, line_counts)
+            for name in symbol_users.generated(plan.node):
+                _release_symbols(project_generator, module_index, name)
+        return module_index
+
+    return _gen_lib_modules_in_parallel(project_generator, plans, jobs, symbol_users)
+
+
+class SymbolUsers(object):
+    """Counts how many modules still have to be generated that use the symbols of each module."""
+
+    def __init__(self, plans, keep_symbols=()):
+        self.keep_symbols = set(keep_symbols)
+        self.users_left = {plan.node.name: 0 for plan in plans}
+        for plan in plans:
+            for dep in plan.node.deps:
+                self.users_left[dep.name] += 1
+
+    def generated(self, node):
+        """Call when `node` is generated, returns the names of the modules whose symbols are not needed anymore."""
+        done = []
+        for dep in node.deps:
+            self.users_left[dep.name] -= 1
+            if self.users_left[dep.name] == 0:
+                done.append(dep.name)
+        if self.users_left[node.name] == 0:
+            done.append(node.name)
+        return [name for name in done if name not in self.keep_symbols]
+
+
+def total_line_counts(module_index, app_files):
+    """
+    Sums up the `LineCounts` of the generated modules and the {file name: text} `app_files` per language.  They are
+    counted while generating, so there is no need to read the generated app back.
+    """
+    totals = {language: LineCounts() for language in Language.enum_list()}
+    for entry in module_index.values():
+        totals[entry["language"]] += entry["line_counts"]
+    for name, text in app_files.items():
+        language = LANGUAGE_FOR_EXTENSION.get(splitext(name)[1])
+        if language is not None:
+            totals[language] += count_text(text)
+    return totals
+
+
+def serializable_module_index(module_index):
+    return {
+        key: {
+            "file_count": value["file_count"],
+            "loc": value["loc"],
+            "language": value["language"],
+            "line_counts": value["line_counts"].to_dict()
+        } for key, value in module_index.items()
+    }
+
+
+def _index_entry(plan, symbols, line_counts):
+    return {
+        "symbols": symbols,
+        "file_count": symbols.file_count,
+        "loc": plan.loc,
+        "language": plan.language,
+        "line_counts": line_counts
+    }
+
+
+def _release_symbols(project_generator, module_index, name):
+    module_index[name]["symbols"] = None
+    project_generator.call_cache.release(name)
+
+
+def _gen_lib_modules_in_parallel(project_generator, plans, jobs, symbol_users):
+    # Modules of the same level don't depend on each other, so they can be generated in parallel.  Plan order is
+    # kept within each level.
+    order, node_levels = ModuleNode.topological_sort([plan.node for plan in plans])
+    level_for_node = dict(zip(order, node_levels))
+    levels = [[] for _ in xrange(node_levels[-1] + 1 if node_levels else 0)]
+    for plan in plans:
+        levels[level_for_node[plan.node]].append(plan)
+    logging.info("Generating %d modules in %d dependency levels with %d jobs", len(plans), len(levels), jobs)
+
+    # Workers would otherwise race each other to create the app root when making their module directories
+    makedir(project_generator.app_root)
+
+    module_index = {}
+    call_cache = project_generator.call_cache
+    output = project_generator.output
+    released = []
+    pool = multiprocessing.Pool(jobs, _init_worker, (project_generator,))
+    try:
+        for level_number, level_plans in enumerate(levels):
+            tasks = [_make_task(plan, module_index, level_number, released) for plan in level_plans]
+            results = pool.map(_gen_lib_module_worker, tasks)
+            released = []
+            for plan, (symbols, line_counts, cache_stats, output_entries) in zip(level_plans, results):
+                module_index[plan.node.name] = _index_entry(plan, symbols, line_counts)
+                call_cache.hits += cache_stats[0]
+                call_cache.misses += cache_stats[1]
+                call_cache.bytes_saved += cache_stats[2]
+                output.add_entries(output_entries)
+                released.extend(symbol_users.generated(plan.node))
+            for name in released:
+                _release_symbols(project_generator, module_index, name)
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
+    # Fill the returned index in plan order, like a serial run does, so it also serializes identically
+    return {plan.node.name: module_index[plan.node.name] for plan in plans}
+
+
+def _make_task(plan, module_index, level_number, released):
+    # Workers only get what they need to generate a module: a detached copy of the node that doesn't drag the
+    # whole graph along when pickled, the index entries of its direct dependencies, and the modules the previous
+    # level released, so workers can drop them from their call caches.
+    node = plan.node
+    shallow_node = ModuleNode(node.name, node.node_type, [ModuleNode(d.name, d.node_type) for d in node.deps])
+    shallow_node.code_units = node.code_units
+    deps_index = {d.name: module_index[d.name] for d in node.deps}
+    return shallow_node, plan.loc, plan.language, deps_index, level_number, released
+
+
+_worker_project_generator = None
+_worker_level_number = 0
+
+
+def _init_worker(project_generator):
+    global _worker_project_generator
+    _worker_project_generator = project_generator
+
+
+def _gen_lib_module_worker(task):
+    global _worker_level_number
+    node, loc, language, deps_index, level_number, released = task
+    call_cache = _worker_project_generator.call_cache
+    if level_number > _worker_level_number + 1:
+        # This worker got no task in some level, so it missed what was released then
+        call_cache.entries = {}
+    else:
+        for name in released:
+            call_cache.release(name)
+    _worker_level_number = level_number
+
+    hits, misses, bytes_saved = call_cache.hits, call_cache.misses, call_cache.bytes_saved
+    symbols, line_counts = _worker_project_generator.gen_lib_module(deps_index, node, loc, language)
+
+    cache_stats = (call_cache.hits - hits, call_cache.misses - misses, call_cache.bytes_saved - bytes_saved)
+    return symbols, line_counts, cache_stats, _worker_project_generator.output.take_entries()
@@ -14,11 +14,10 @@
 
 from __future__ import absolute_import
 
+import itertools
 import random
-
-from toposort import toposort_flatten
-
-from .util import merge_lists
+from array import array
+from typing import Dict, Iterable, List  # noqa: F401
 
 
 class ModuleGenType(object):
@@ -55,6 +54,8 @@ class ModuleNode(object):
         # How many code units the module represents.  Bigger modules would
         # have more code units than smaller modules, with 1 being the 'standard' size.
         self.code_units = 1
+        # The language to generate the module in when the graph tells, ex: query outputs.  Planned otherwise.
+        self.language = None
         self.extra_info = None  # useful for file indexes and such
 
     def __hash__(self):
@@ -71,31 +72,91 @@ class ModuleNode(object):
         return "<{} : {} deps: {} has_info: {}>".format(self.name, self.node_type, len(self.deps), extra)
 
     @staticmethod
-    def gen_layered_graph(layer_count, nodes_per_layer, deps_per_node=5):
-        """Generates a module dependency graph that has `layer_count` layers,
-        with each module only depending on a random selection of the modules
-        below it"""
-
-        def node(f_layer, f_node):
-            return ModuleNode('MockLib{}_{}'.format(f_layer, f_node), ModuleNode.LIBRARY)
-
-        layers = [[node(l, n) for n in xrange(nodes_per_layer)] for l in xrange(layer_count)]
-        app_node = ModuleNode('App', ModuleNode.APP, layers[0])
+    def topological_sort(node_list):
+        # type: (List[ModuleNode]) -> (List[ModuleNode], List[int])
+        """
+        Sorts `node_list` and the nodes it depends on topologically with Kahn's algorithm, in O(nodes + edges) plus
+        sorting each level back into `node_list` order.  Returns the sorted nodes, dependencies first, and the level
+        of each one of them: 0 for nodes without dependencies, one more than the highest level of their dependencies
+        otherwise.  Nodes are sorted by level, and keep their `node_list` order within a level.
+
+        Raises a ValueError that shows a dependency cycle if the graph has one.
+        """
+        # Nodes are hashed once into an index, the sort itself works on their index
+        index = {}
+        nodes = []
+        for node in itertools.chain(node_list, (dep for n in node_list for dep in n.deps)):
+            if node not in index:
+                index[node] = len(nodes)
+                nodes.append(node)
+
+        dependents = [[] for _ in nodes]
+        unsorted_dep_counts = [0] * len(nodes)
+        for i, node in enumerate(nodes):
+            for dep in node.deps:
+                dependents[index[dep]].append(i)
+                unsorted_dep_counts[i] += 1
+
+        level = [i for i, count in enumerate(unsorted_dep_counts) if count == 0]
+        order = []
+        levels = []
+        depth = 0
+        while level:
+            order.extend(level)
+            levels.extend([depth] * len(level))
+            depth += 1
+            next_level = []
+            for i in level:
+                for dependent in dependents[i]:
+                    unsorted_dep_counts[dependent] -= 1
+                    if unsorted_dep_counts[dependent] == 0:
+                        next_level.append(dependent)
+            level = sorted(next_level)
+
+        if len(order) != len(nodes):
+            raise ValueError(
+                'The module graph has a dependency cycle: {}, {} modules are in or depend on cycles'.format(
+                    ' -> '.join(nodes[i].name for i in ModuleNode._cycle(nodes, index, unsorted_dep_counts)),
+                    len(nodes) - len(order)))
+        return [nodes[i] for i in order], levels
 
-        node_graph = {}
-
-        for i, layer in enumerate(layers):
-            lower_layers = layers[(i + 1):] if i != len(layers) - 1 else []
-            lower_merged = merge_lists(lower_layers)
-            for node in layer:
-                if deps_per_node < len(lower_merged):
-                    node.deps = random.sample(lower_merged, deps_per_node)
-                else:
-                    node.deps = lower_merged
+    @staticmethod
+    def _cycle(nodes, index, unsorted_dep_counts):
+        # type: (List[ModuleNode], Dict[ModuleNode, int], List[int]) -> List[int]
+        """
+        Returns a dependency cycle, as node indexes that start and end with the same node, out of the nodes that
+        `topological_sort` couldn't sort.  Each of them has an unsorted dependency, so following those has to loop.
+        """
+        path = [next(i for i, count in enumerate(unsorted_dep_counts) if count)]
+        path_positions = {path[0]: 0}
+        while True:
+            i = next(index[dep] for dep in nodes[path[-1]].deps if unsorted_dep_counts[index[dep]])
+            if i in path_positions:
+                return path[path_positions[i]:] + [i]
+            path_positions[i] = len(path)
+            path.append(i)
 
-                node_graph[node] = set(node.deps)
+    @staticmethod
+    def transitive_reduction(app_node, node_list):
+        # type: (ModuleNode, List[ModuleNode]) -> List[(ModuleNode, ModuleNode)]
+        """
+        Removes the dependencies of the nodes of a graph that they also have through another dependency, in place.
+        Which modules each module can reach stays the same, with as few dependencies as possible.  Returns the
+        removed (node, dependency) edges.  See `ModuleGraph.transitive_reduction`.
+        """
+        order, _ = ModuleNode.topological_sort(node_list)
+        graph = ModuleGraph.from_module_nodes(app_node, order)
+        reduced_graph, removed_edges = graph.transitive_reduction()
+        for i, node in enumerate(order):
+            node.deps = [order[d] for d in reduced_graph.deps(i)]
+        return [(order[i], order[d]) for i, d in removed_edges]
 
-        return app_node, (toposort_flatten(node_graph) + [app_node])
+    @staticmethod
+    def gen_layered_graph(layer_count, nodes_per_layer, deps_per_node=5):
+        """Generates a module dependency graph that has `layer_count` layers,
+        with each module only depending on a random selection of the modules
+        below it.  The returned node list is in topological order, the bottom layer first."""
+        return ModuleGraph.gen_layered_graph(layer_count, nodes_per_layer, deps_per_node).module_nodes()
 
     @staticmethod
     def gen_flat_graph(module_count):
@@ -127,11 +188,182 @@ class ModuleNode(object):
         deps_per_layer = layer_count / 2 if layer_count >= 2 else 1
 
         layer_app_node, layer_nodes = ModuleNode.gen_layered_graph(layer_count, layer_mod_count, deps_per_layer)
-        layer_nodes = [layer_item for layer_item in layer_nodes if layer_item != layer_app_node]
+        layer_nodes = layer_nodes[:-1]  # Without `layer_app_node`, which is last
 
         for l in big_libs:
             l.code_units = 20
             l.deps = layer_app_node.deps
 
-        node_graph = {n: set(n.deps) for n in big_libs + layer_nodes}
-        return app_node, (toposort_flatten(node_graph) + [app_node])
+        return app_node, (layer_nodes + big_libs + [app_node])
+
+
+class ModuleGraph(object):
+    """
+    A compact module dependency graph, for graphs of 100k+ modules where a `ModuleNode` object and dependency list
+    per module get slow and big.  Modules are integer ids, the indexes of their interned name in `names` and of their
+    code units in `code_units`.  Dependencies are stored as compressed sparse rows: the dependency ids of module `i`
+    are `dep_targets[dep_offsets[i]:dep_offsets[i + 1]]`.
+
+    Project generators and `modulegen.plan_modules` take it in place of a `ModuleNode` graph, and work on the
+    `ModuleNode` view `module_nodes` makes out of it.
+    """
+
+    def __init__(self, names, dep_offsets, dep_targets, app_id, code_units=None):
+        # type: (List[str], array, array, int, array) -> None
+        self.names = names
+        self.dep_offsets = dep_offsets
+        self.dep_targets = dep_targets
+        self.app_id = app_id
+        self.code_units = code_units if code_units is not None else array('i', [1]) * len(names)
+        self._ids = None
+
+    def node_count(self):
+        return len(self.names)
+
+    def edge_count(self):
+        return len(self.dep_targets)
+
+    def deps(self, node_id):
+        # type: (int) -> array
+        """The dependency ids of module `node_id`"""
+        return self.dep_targets[self.dep_offsets[node_id]:self.dep_offsets[node_id + 1]]
+
+    def id_of(self, name):
+        # type: (str) -> int
+        if self._ids is None:
+            self._ids = {name: i for i, name in enumerate(self.names)}
+        return self._ids[name]
+
+    def module_nodes(self):
+        # type: () -> (ModuleNode, List[ModuleNode])
+        """Returns the app node and a list of `ModuleNode`s of the graph, in id order."""
+        nodes = [ModuleNode(name, ModuleNode.LIBRARY) for name in self.names]
+        dep_offsets, dep_targets, code_units = self.dep_offsets, self.dep_targets, self.code_units
+        for i, node in enumerate(nodes):
+            node.deps = [nodes[d] for d in dep_targets[dep_offsets[i]:dep_offsets[i + 1]]]
+            node.code_units = code_units[i]
+        app_node = nodes[self.app_id]
+        app_node.node_type = ModuleNode.APP
+        return app_node, nodes
+
+    @staticmethod
+    def from_deps(names, deps, app_id, code_units=None):
+        # type: (List[str], Iterable[Iterable[int]], int, Iterable[int]) -> ModuleGraph
+        """Makes a graph out of module `names` and the dependency ids of each module in `deps`, in the same order."""
+        dep_offsets = array('i', [0])
+        dep_targets = array('i')
+        for node_deps in deps:
+            dep_targets.extend(node_deps)
+            dep_offsets.append(len(dep_targets))
+        if len(dep_offsets) != len(names) + 1:
+            raise ValueError('Got dependencies for {} modules, but {} names'.format(len(dep_offsets) - 1, len(names)))
+        code_units = array('i', code_units) if code_units is not None else None
+        return ModuleGraph([intern(name) for name in names], dep_offsets, dep_targets, app_id, code_units)
+
+    def transitive_reduction(self):
+        # type: () -> (ModuleGraph, List[(int, int)])
+        """
+        Returns a copy of the graph without the dependencies modules also have through another dependency, and the
+        removed (module id, dependency id) edges.  Ids have to be in topological order.
+
+        The modules each module can reach are a bitset of ids, built in id order out of those of its dependencies.
+        Dependencies are checked from the highest id down: a module can only be reached through modules with a higher
+        id, so by then the bitset of the kept dependencies already has every dependency that is redundant.  A bitset
+        is dropped once all of the modules that depend on it are done.
+        """
+        dependents_left = [0] * self.node_count()
+        for d in self.dep_targets:
+            dependents_left[d] += 1
+
+        reachable = [0] * self.node_count()
+        deps = []
+        removed_edges = []
+        for i in xrange(self.node_count()):
+            bits = 0
+            kept_deps = []
+            for d in sorted(self.deps(i), reverse=True):
+                if (bits >> d) & 1:
+                    removed_edges.append((i, d))
+                else:
+                    kept_deps.append(d)
+                    bits |= reachable[d] | (1 << d)
+                dependents_left[d] -= 1
+                if dependents_left[d] == 0:
+                    reachable[d] = None
+            reachable[i] = bits
+            kept_deps = set(kept_deps)
+            node_deps = []
+            for d in self.deps(i):  # In their original order, a dependency listed twice is only kept once
+                if d in kept_deps:
+                    node_deps.append(d)
+                    kept_deps.remove(d)
+            deps.append(node_deps)
+
+        reduced_graph = ModuleGraph.from_deps(self.names, deps, self.app_id, self.code_units)
+        return reduced_graph, removed_edges
+
+    @staticmethod
+    def from_module_nodes(app_node, node_list):
+        # type: (ModuleNode, List[ModuleNode]) -> ModuleGraph
+        """Makes a graph out of a `ModuleNode` graph, the ids of modules are their index in `node_list`."""
+        index = {node: i for i, node in enumerate(node_list)}
+        return ModuleGraph.from_deps([n.name for n in node_list], ([index[d] for d in n.deps] for n in node_list),
+                                     index[app_node], [n.code_units for n in node_list])
+
+    @staticmethod
+    def from_dep_map(dep_map, root_node_name, code_units=None):
+        # type: (Dict[str, List[str]], str, Dict[str, int]) -> ModuleGraph
+        """
+        Makes a graph out of an outgoing edge map (`dep_map`) with `root_node_name` as the app.  Modules the app can't
+        reach are left out, the others get ids in breadth first order from the app, which has id 0.
+        `code_units` optionally gives the code units of modules by name, 1 otherwise.
+        """
+        code_units = code_units or {}
+        ids = {root_node_name: 0}
+        names = [root_node_name]
+        deps = []
+        for name in names:  # Grows while it's iterated
+            node_deps = []
+            for dep_name in dep_map.get(name, ()):
+                dep_id = ids.get(dep_name)
+                if dep_id is None:
+                    dep_id = ids[dep_name] = len(names)
+                    names.append(dep_name)
+                node_deps.append(dep_id)
+            deps.append(node_deps)
+        return ModuleGraph.from_deps(names, deps, 0, [code_units.get(name, 1) for name in names])
+
+    @staticmethod
+    def gen_layered_graph(layer_count, nodes_per_layer, deps_per_node=5):
+        # type: (int, int, int) -> ModuleGraph
+        """
+        Generates a module dependency graph that has `layer_count` layers, with each module only depending on a
+        random selection of the modules below it.  Ids are in topological order: the bottom layer first, the app last.
+        """
+        # Layers are sampled from the top down, over the flat index range of the layers below the one sampled
+        # (ex: the modules below layer `l` are flat indexes `(l + 1) * nodes_per_layer` to the end).  `node_ids` maps
+        # flat indexes to the ids of modules, which count layers from the bottom up.
+        module_count = layer_count * nodes_per_layer
+        node_ids = array('i')
+        for l in reversed(xrange(layer_count)):
+            node_ids.extend(xrange(l * nodes_per_layer, (l + 1) * nodes_per_layer))
+
+        deps = [None] * (module_count + 1)
+        for l in xrange(layer_count):
+            lower_start = (l + 1) * nodes_per_layer
+            lower_indexes = xrange(lower_start, module_count)
+            layer_start_id = (layer_count - 1 - l) * nodes_per_layer
+            layer_ids = xrange(layer_start_id, layer_start_id + nodes_per_layer)
+            if deps_per_node < len(lower_indexes):
+                for i in layer_ids:
+                    deps[i] = [node_ids[f] for f in random.sample(lower_indexes, deps_per_node)]
+            else:
+                lower_ids = node_ids[lower_start:]
+                for i in layer_ids:
+                    deps[i] = lower_ids
+        deps[module_count] = xrange(module_count - nodes_per_layer, module_count)  # The app depends on the top layer
+
+        names = [
+            'MockLib{}_{}'.format(layer_count - 1 - l, n) for l in xrange(layer_count) for n in xrange(nodes_per_layer)
+        ]
+        return ModuleGraph.from_deps(names + ['App'], deps, module_count)
@@ -26,6 +26,7 @@ from os.path import join
 
 from . import blazeprojectgen, commandlineutil, cpprojectgen
 from .cpulogger import CPULogger
+from .filegen import Language
 from .moduletree import ModuleGenType
 from .statemanagement import SettingsState, XcodeManager
 from .util import check_dependent_commands, grab_mac_marketing_name, makedir, sudo_enabled
@@ -68,6 +69,12 @@ class CommandLineMultisuite(object):
             action='store_true',
             default=False,
             help="Clean all default xcode cache directories to prevent cache effects changing test results."),
+        actions.add_argument(
+            '--verify_loc_with_cloc',
+            action='store_true',
+            default=False,
+            help="Also count the lines of code of every generated app with cloc, and warn if cloc doesn't agree "
+            "with the lines of code counted while generating."),
 
         parser.add_argument(
             '--project_generator_type',
@@ -113,6 +120,7 @@ class CommandLineMultisuite(object):
         self.trace_cpu = config.trace_cpu
         self.switch_xcode_versions = config.switch_xcode_versions
         self.full_clean = config.full_clean
+        self.verify_loc_with_cloc = config.verify_loc_with_cloc
         self.run_xcodebuild = (not config.skip_xcode_build)
         self.test_build_only = config.test_build_only
 
@@ -153,7 +161,7 @@ class CommandLineMultisuite(object):
         self.app_path = '/apps/mockapp'
         self.app_blaze_path = "//App:App"
 
-        has_dot = self.app_gen_options.dot_file_path and self.app_gen_options.dot_root_node_name
+        has_dot = bool(self.app_gen_options.dot_file_path)
         if test_build:
             logging.info("Using test build settings")
             self.app_gen_options.swift_lines_of_code = 100000
@@ -167,7 +175,12 @@ class CommandLineMultisuite(object):
                                 "Specify one in the command line options.")
                 self.type_list.remove(ModuleGenType.dot)
 
-    def build_app_type(self, gen_type, wmo_enabled):
+    def build_app_type(self, gen_type, wmo_enabled, generated_app=None):
+        """
+        Generates and builds a mock app of `gen_type`.  Returns the generated (app node, node list, line counts),
+        pass it back as `generated_app` to build the same app with another WMO setting.  Only the build files depend
+        on it, so they are the only files rendered again.
+        """
         xcode_version, xcode_build_id = XcodeManager.get_current_xcode_version()
         xcode_name = '{}_'.format(xcode_version.replace('.', '_'))
         build_log_path = join(self.log_dir, '{}{}_mockapp_build_log.txt'.format(xcode_name, gen_type))
@@ -177,14 +190,24 @@ class CommandLineMultisuite(object):
         logging.info('##### Generating %s', gen_info)
 
         self.project_generator.use_wmo = wmo_enabled
-        commandlineutil.del_old_output_dir(self.mock_output_dir)
-
-        logging.info('Generating mock app')
-        app_node, node_list = commandlineutil.gen_graph(gen_type, self.app_gen_options)
-        self.project_generator.gen_app(app_node, node_list, self.app_gen_options.swift_lines_of_code,
-                                       self.app_gen_options.objc_lines_of_code, self.app_gen_options.loc_json_file_path)
-
-        swift_loc = commandlineutil.count_loc(self.mock_output_dir)
+        if generated_app:
+            logging.info('Updating mock app build files')
+            app_node, node_list, line_counts = generated_app
+            self.project_generator.gen_build_files(app_node, node_list)
+        else:
+            commandlineutil.prepare_output_dir(self.mock_output_dir)
+
+            logging.info('Generating mock app')
+            app_node, node_list = commandlineutil.gen_graph(gen_type, self.app_gen_options)
+            line_counts = self.project_generator.gen_app(app_node, node_list, self.app_gen_options.swift_lines_of_code,
+                                                         self.app_gen_options.objc_lines_of_code,
+                                                         self.app_gen_options.loc_json_file_path)
+            if self.verify_loc_with_cloc:
+                self.verify_loc(line_counts)
+
+        swift_counts = line_counts[Language.SWIFT]
+        objc_counts = line_counts[Language.OBJC]
+        swift_loc = swift_counts.code
         logging.info('App type "%s" generated %d loc', gen_type, swift_loc)
 
         # Build App
@@ -202,6 +225,8 @@ class CommandLineMultisuite(object):
             if self.full_clean:
                 self.xcode_manager.clean_caches()
 
+            self.clean_build_outputs()
+
             logging.info('Start build')
             start = time.time()
             with open(build_log_path, 'w') as build_log_file:
@@ -232,10 +257,33 @@ class CommandLineMultisuite(object):
         self.build_time_file.write(log_statement)
         self.build_time_file.flush()
         full_xcode_version = xcode_version + " " + xcode_build_id
-        self.build_time_csv_file.write('{}, {}, {}, {}, {}, {}, {}\n'.format(
-            build_end, gen_type, full_xcode_version, wmo_enabled, total_time, len(node_list), swift_loc))
+        self.build_time_csv_file.write('{}, {}, {}, {}, {}, {}, {}, {}, {}, {}, {}, {}\n'.format(
+            build_end, gen_type, full_xcode_version, wmo_enabled, total_time, len(node_list), swift_loc,
+            objc_counts.code, swift_counts.blank, swift_counts.comment, objc_counts.blank, objc_counts.comment))
         self.build_time_csv_file.flush()
 
+        return app_node, node_list, line_counts
+
+    def clean_build_outputs(self):
+        """
+        Deletes what the builds of earlier app types left.  The mock app is updated in place instead of generated
+        into an empty directory, so without this its build would reuse them and not be timed from scratch.  The
+        derived data of CocoaPods builds is deleted before every build already.
+        """
+        if self.project_generator_type == "buck":
+            subprocess.check_call([self.buck_binary, 'clean'], cwd=self.mock_output_dir)
+        elif self.project_generator_type == "bazel":
+            subprocess.check_call([self.bazel_binary, 'clean'], cwd=self.mock_output_dir)
+
+    def verify_loc(self, line_counts):
+        """Checks the Swift lines of code counted while generating against what cloc counts in the generated app"""
+        cloc_swift_loc = commandlineutil.count_loc(self.mock_output_dir)
+        if cloc_swift_loc == -1:
+            return
+        if cloc_swift_loc != line_counts[Language.SWIFT].code:
+            logging.warning('cloc counted %d lines of Swift code, %d were counted while generating', cloc_swift_loc,
+                            line_counts[Language.SWIFT].code)
+
     def verify_dependencies(self):
         if not self.run_xcodebuild or self.project_generator_type == "cocoapods":
             return  # We don't need these binaries if we are not going to use them.
@@ -304,9 +352,14 @@ class CommandLineMultisuite(object):
         print(self.project_generator_type)
         if self.project_generator_type == "buck" or self.project_generator_type == "bazel":
             self.project_generator = blazeprojectgen.BlazeProjectGenerator(
-                self.mock_output_dir, self.app_path, flavor=self.project_generator_type)
+                self.mock_output_dir,
+                self.app_path,
+                flavor=self.project_generator_type,
+                call_budget=self.app_gen_options.call_budget(),
+                jobs=self.app_gen_options.jobs)
         elif self.project_generator_type == "cocoapods":
-            self.project_generator = cpprojectgen.CocoaPodsProjectGenerator(self.mock_output_dir)
+            self.project_generator = cpprojectgen.CocoaPodsProjectGenerator(
+                self.mock_output_dir, call_budget=self.app_gen_options.call_budget(), jobs=self.app_gen_options.jobs)
         else:
             raise ValueError("Unknown project generator type: " + str(self.project_generator_type))
 
@@ -353,11 +406,12 @@ class CommandLineMultisuite(object):
             if self.switch_xcode_versions:
                 self.switch_xcode_version(xcode_version)
 
-            for wmo_enabled in self.wmo_modes:
-                logging.info('Swift WMO Enabled: {}'.format(wmo_enabled))
-
-                for gen_type in self.type_list:
-                    self.build_app_type(gen_type, wmo_enabled)
+            for gen_type in self.type_list:
+                # Every WMO mode builds the same mock app, so only the first one generates it
+                generated_app = None
+                for wmo_enabled in self.wmo_modes:
+                    logging.info('Swift WMO Enabled: {}'.format(wmo_enabled))
+                    generated_app = self.build_app_type(gen_type, wmo_enabled, generated_app)
 
         if self.trace_cpu:
             self.cpu_logger.stop()
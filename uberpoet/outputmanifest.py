@@ -0,0 +1,161 @@
+#  Copyright (c) 2021 Uber Technologies, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+
+import hashlib
+import json
+import logging
+import os
+from os.path import dirname, exists, join, relpath
+
+from .util import makedir
+
+
+class OutputManifest(object):
+    """
+    Keeps track of the content hash of every file generated into a mock app directory, so a regeneration only
+    rewrites the files whose content changed and deletes the files that are no longer generated.  Untouched files
+    keep their mtime, which saves Buck, Bazel and Xcode from re-hashing or rebuilding them.
+
+    The size and mtime every file had right after it was written are recorded next to its hash.  A file is only
+    skipped when it still has both, so files edited, truncated or deleted since the last generation are written again.
+
+    The manifest is saved as `MANIFEST_FILE_NAME` in the app root, next to module_index.json.
+    """
+
+    MANIFEST_FILE_NAME = "output_manifest.json"
+    VERSION = 2
+
+    def __init__(self, root, previous_files=None):
+        self.root = os.path.normpath(root)
+        # {relative path: [content hash, size, mtime]} of the files of the last generation and of this one
+        self.previous_files = previous_files or {}
+        self.files = {}
+        self.written = 0
+        self.unchanged = 0
+
+    @classmethod
+    def manifest_path(cls, root):
+        return join(root, cls.MANIFEST_FILE_NAME)
+
+    @classmethod
+    def exists_in(cls, root):
+        return exists(cls.manifest_path(root))
+
+    @classmethod
+    def load(cls, root):
+        """Makes a manifest for `root` that knows what the last generation into `root` wrote, if anything."""
+        path = cls.manifest_path(root)
+        if not exists(path):
+            return cls(root)
+        with open(path, "r") as f:
+            manifest = json.load(f)
+        if manifest.get("version") != cls.VERSION:
+            logging.warning("Ignoring output manifest %s with an unknown version", path)
+            return cls(root)
+        return cls(root, manifest["files"])
+
+    @staticmethod
+    def content_hash(chunks):
+        md5 = hashlib.md5()
+        for chunk in chunks:
+            md5.update(chunk)
+        return md5.hexdigest()
+
+    def write_file(self, path, text):
+        """Writes `text` to `path`, unless the last generation already wrote the same content there."""
+        self.write_chunks(path, [text])
+
+    def write_chunks(self, path, chunks):
+        """Like `write_file`, with the text given as a list of chunks that are written one by one."""
+        rel_path = relpath(path, self.root)
+        digest = self.content_hash(chunks)
+        previous_entry = self.previous_files.get(rel_path)
+        if previous_entry and previous_entry[0] == digest and previous_entry[1:] == self.file_stat(path):
+            self.files[rel_path] = previous_entry
+            self.unchanged += 1
+            return
+        makedir(dirname(path))
+        with open(path, "w") as f:
+            f.writelines(chunks)
+        self.files[rel_path] = [digest] + self.file_stat(path)
+        self.written += 1
+
+    @staticmethod
+    def file_stat(path):
+        """[size, mtime] of the file at `path`, or None if there is no file there."""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return [stat.st_size, stat.st_mtime]
+
+    def copy_file(self, origin, dest):
+        with open(origin, "r") as f:
+            self.write_file(dest, f.read())
+
+    def copy_dir(self, origin, dest):
+        for dir_path, _, file_names in os.walk(origin):
+            for file_name in file_names:
+                file_path = join(dir_path, file_name)
+                self.copy_file(file_path, join(dest, relpath(file_path, origin)))
+
+    def take_entries(self):
+        """
+        Returns and forgets what was recorded so far, as a (files, written, unchanged) tuple.  Used to hand the files
+        a worker process wrote to the manifest of the main process with `add_entries`.
+        """
+        entries = (self.files, self.written, self.unchanged)
+        self.files, self.written, self.unchanged = {}, 0, 0
+        return entries
+
+    def add_entries(self, entries):
+        files, written, unchanged = entries
+        self.files.update(files)
+        self.written += written
+        self.unchanged += unchanged
+
+    def finish(self, delete_orphans=True):
+        """
+        Deletes files only the last generation wrote, then saves the manifest of this generation.  Pass
+        `delete_orphans=False` when only part of the files were generated again, to keep the rest.
+        """
+        orphans = [p for p in self.previous_files if p not in self.files]
+        if not delete_orphans:
+            for rel_path in orphans:
+                self.files[rel_path] = self.previous_files[rel_path]
+            orphans = []
+        for rel_path in orphans:
+            self.delete_file(join(self.root, rel_path))
+
+        manifest_path = self.manifest_path(self.root)
+        if self.files != self.previous_files or not exists(manifest_path):
+            makedir(self.root)
+            with open(manifest_path, "w") as f:
+                json.dump({"version": self.VERSION, "files": self.files}, f, sort_keys=True)
+
+        logging.info("Output manifest: %d files written, %d unchanged, %d orphans deleted", self.written,
+                     self.unchanged, len(orphans))
+        self.previous_files = self.files
+        self.files = {}
+
+    def delete_file(self, path):
+        if exists(path):
+            os.remove(path)
+        # Clean up directories that only held deleted files, like the ones of modules that are gone
+        dir_path = dirname(path)
+        while dir_path != self.root and exists(dir_path) and not os.listdir(dir_path):
+            os.rmdir(dir_path)
+            dir_path = dirname(dir_path)
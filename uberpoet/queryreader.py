@@ -0,0 +1,232 @@
+#  Copyright (c) 2021 Uber Technologies, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+
+import json
+import logging
+from collections import defaultdict
+from os.path import splitext
+from typing import Dict, Iterable, Iterator, List  # noqa: F401
+
+from .dotreader import DepMapBuilder, DotFileReader
+from .filegen import Language
+from .loccounter import LANGUAGE_FOR_EXTENSION
+from .moduletree import ModuleNode  # noqa: F401
+
+
+class TargetCategory(object):
+    """What a query target is, told by its rule kind and for some rules by the language of its sources."""
+
+    SWIFT_LIBRARY = 'swift_library'
+    OBJC_LIBRARY = 'objc_library'
+    APP = 'app'
+    RESOURCE = 'resource'
+    TEST = 'test'
+    OTHER = 'other'
+
+    # The categories of the targets that become modules, the other targets are left out
+    MODULES = frozenset([SWIFT_LIBRARY, OBJC_LIBRARY, APP])
+    # The language the modules of library categories are generated in
+    LANGUAGES = {SWIFT_LIBRARY: Language.SWIFT, OBJC_LIBRARY: Language.OBJC}
+
+    SWIFT_RULES = frozenset(['swift_library'])
+    OBJC_RULES = frozenset(['objc_library'])
+    # Libraries that can mix both languages, they are in the language most of their sources are in
+    MIXED_RULES = frozenset(['apple_library'])
+    APP_RULES = frozenset([
+        'apple_binary', 'apple_bundle', 'ios_application', 'ios_extension', 'macos_application', 'tvos_application',
+        'watchos_application'
+    ])
+    RESOURCE_RULES = frozenset([
+        'apple_asset_catalog', 'apple_bundle_import', 'apple_resource', 'apple_resource_bundle', 'core_data_model',
+        'exports_files', 'filegroup', 'objc_bundle', 'objc_bundle_library'
+    ])
+
+    @staticmethod
+    def of_target(kind, source_counts):
+        # type: (str, Dict[str, int]) -> str
+        """Returns the category of a target of rule `kind`, with `source_counts` ({language: source file count})."""
+        if kind in TargetCategory.SWIFT_RULES:
+            return TargetCategory.SWIFT_LIBRARY
+        elif kind in TargetCategory.OBJC_RULES:
+            return TargetCategory.OBJC_LIBRARY
+        elif kind in TargetCategory.MIXED_RULES:
+            swift_count = source_counts.get(Language.SWIFT, 0)
+            if swift_count and swift_count >= source_counts.get(Language.OBJC, 0):
+                return TargetCategory.SWIFT_LIBRARY
+            return TargetCategory.OBJC_LIBRARY
+        elif kind in TargetCategory.APP_RULES:
+            return TargetCategory.APP
+        elif kind in TargetCategory.RESOURCE_RULES:
+            return TargetCategory.RESOURCE
+        elif kind.endswith('_test') or kind == 'test_suite':
+            return TargetCategory.TEST
+        return TargetCategory.OTHER
+
+
+class QueryTarget(object):
+    """A target of a query output: its label, rule kind, dependency labels and {language: source file count}"""
+    __slots__ = ('label', 'kind', 'deps', 'source_counts')
+
+    def __init__(self, label, kind, deps, source_counts):
+        self.label = label
+        self.kind = kind
+        self.deps = deps
+        self.source_counts = source_counts
+
+    @staticmethod
+    def count_sources(paths):
+        # type: (Iterable[str]) -> Dict[str, int]
+        """Returns the {language: file count} of the Swift and Objective-C files in `paths`"""
+        counts = defaultdict(int)
+        for path in paths:
+            language = LANGUAGE_FOR_EXTENSION.get(splitext(path)[1])
+            if language is not None:
+                counts[language] += 1
+        return dict(counts)
+
+
+def to_str(text):
+    # type: (unicode) -> str
+    """JSON strings are read as unicode, target names are str everywhere else."""
+    return text.encode('utf-8') if isinstance(text, unicode) else text
+
+
+class QueryFileReader(object):
+    """
+    Reads the output of a build system query into a `ModuleNode` dependency graph, like `DotFileReader` does with
+    dot files.  The entry point is `read_query_file(path)`.  Subclasses read their format with an `iter_targets(f)`
+    method, which lazily yields the `QueryTarget`s of the open query output `f`.
+
+    Unlike dot files, query outputs keep the rule kind of every target, so which targets become modules is decided by
+    their `TargetCategory` instead of a modules filter, which also gives the `language` of library modules.  The code
+    units of modules are their source file count.
+    """
+
+    def __init__(self):
+        self.target_kinds = {}  # {module name: rule kind} of the modules read by the last `read_query_file`
+
+    def read_query_file(self, path, root_node_name=None, condense_cycles=False):
+        # type: (str, str, bool) -> (ModuleNode, List[ModuleNode])
+        """
+        Reads the query output at `path` and returns a `ModuleNode` graph root and list of nodes to generate a mock
+        app from it.  The parameters are the ones of `DotFileReader.read_dot_file`.
+        """
+        # Dependencies can be read before the targets they point to, so edges are kept by label until every target
+        # is read and it's known which ones are modules.
+        builder = DepMapBuilder()
+        module_names = {}  # {module label: module name}
+        code_units = {}
+        languages = {}
+        self.target_kinds = {}
+        target_count = 0
+        with open(path, 'r') as f:
+            for target in self.iter_targets(f):
+                target_count += 1
+                category = TargetCategory.of_target(target.kind, target.source_counts)
+                if category not in TargetCategory.MODULES:
+                    continue
+                name = DotFileReader.extract_buck_target(target.label)
+                module_names[target.label] = name
+                self.target_kinds[name] = target.kind
+                languages[name] = TargetCategory.LANGUAGES.get(category)
+                code_units[name] = max(1, sum(target.source_counts.itervalues()))
+                for dep in target.deps:
+                    builder.add_edge(target.label, dep)
+
+        if len(self.target_kinds) != len(module_names):
+            ident_names = defaultdict(int)
+            for name in module_names.itervalues():
+                ident_names[name] += 1
+            logging.error("Found identical target names in query output: %s", path)
+            logging.error(str({name: count for name, count in ident_names.iteritems() if count > 1}))
+            raise ValueError("Query output contains target names that are identical, but have different paths")
+
+        dep_map = {}
+        for origin, deps in builder.dep_map().iteritems():
+            dep_map[module_names[origin]] = [module_names[dep] for dep in deps if dep in module_names]
+        logging.info("Read %d modules out of %d targets from %s", len(module_names), target_count, path)
+
+        dot_reader = DotFileReader(modules_filter=[])
+        if not root_node_name:
+            root_node_name = dot_reader.biggest_root_name(dep_map)
+            logging.info("Using the biggest root of the query output as the app node: %s", root_node_name)
+        root, nodes = dot_reader.graph_from_dep_map(dep_map, path, root_node_name, len(module_names), condense_cycles,
+                                                    code_units)
+        for node in nodes:
+            node.language = languages.get(node.name)  # None for merged cycles
+        return root, nodes
+
+
+class BazelQueryReader(QueryFileReader):
+    """
+    Reads `bazel query "deps(target)" --output=streamed_jsonproto > file.json` outputs, one JSON encoded Target
+    message per line, as they are written.  The dependencies of a rule are its rule inputs, like in
+    `--output graph` dot files.
+    """
+
+    SOURCE_ATTRIBUTES = frozenset(['srcs', 'non_arc_srcs'])
+
+    def iter_targets(self, f):
+        # type: (file) -> Iterator[QueryTarget]
+        for line in f:
+            if not line.strip():
+                continue
+            rule = json.loads(line).get('rule')
+            if rule is None:
+                continue  # Source files, generated files and package groups
+            sources = []
+            for attribute in rule.get('attribute', ()):
+                if attribute.get('name') in self.SOURCE_ATTRIBUTES:
+                    sources.extend(attribute.get('stringListValue', ()))
+            yield QueryTarget(
+                to_str(rule['name']), to_str(rule['ruleClass']), [to_str(dep) for dep in rule.get('ruleInput', ())],
+                QueryTarget.count_sources(sources))
+
+
+class BuckQueryReader(QueryFileReader):
+    """
+    Reads `buck query "deps(target)" --output-format json --output-attributes buck.type deps exported_deps srcs >
+    file.json` outputs, a JSON object of {target: {attribute: value}}.  It is one JSON value, so it has to be loaded
+    whole before its targets can be read.
+    """
+
+    DEPENDENCY_ATTRIBUTES = ('deps', 'exported_deps')
+
+    def iter_targets(self, f):
+        # type: (file) -> Iterator[QueryTarget]
+        targets = json.load(f)
+        for label in sorted(targets):
+            attributes = targets[label]
+            deps = []
+            for name in self.DEPENDENCY_ATTRIBUTES:
+                deps.extend(to_str(dep) for dep in attributes.get(name, ()))
+            yield QueryTarget(
+                to_str(label), to_str(attributes.get('buck.type', '')), deps,
+                QueryTarget.count_sources(self.source_paths(attributes.get('srcs', ()))))
+
+    @staticmethod
+    def source_paths(srcs):
+        # type: (object) -> List[str]
+        """Sources are paths or [path, compiler flags] pairs, in a list or a {name: source} map"""
+        if isinstance(srcs, dict):
+            srcs = srcs.values()
+        return [src if isinstance(src, basestring) else src[0] for src in srcs]
+
+
+QUERY_FILE_READERS = {
+    'bazel_jsonproto': BazelQueryReader,
+    'buck_json': BuckQueryReader,
+}
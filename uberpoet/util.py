@@ -13,33 +13,35 @@
 # limitations under the License.
 
 import distutils.spawn
+import hashlib
 import math
 import os
 import subprocess
+import tempfile
+from os.path import dirname, expanduser, join
 
 
-class SeedContainer(object):
-    """Holds the seed number variable"""
-    seed = 0
-
-
-def bool_xor(a, b):
-    """Python's ^ operator is a bitwise xor, so we need to make a boolean equivalent function."""
-    return (a and not b) or (not a and b)
+class IdAllocator(object):
+    """
+    Hands out the numbers used to name generated classes and functions (ex: `MyClass123`).
 
+    Ids are a stable hash of the allocator's scope and how many ids it handed out before, instead of a process wide
+    counter.  Use one allocator per generated file, scoped by (module name, file index), and every file gets the same
+    ids no matter in which order, or in which process, modules are generated.
+    """
 
-def seed():
-    """Gives you a unique number for codegen ids"""
-    SeedContainer.seed += 1
-    return SeedContainer.seed
+    # Ids have to be unique across the whole app (ObjC class names live in one global namespace), so they get 60 bits
+    # to make collisions practically impossible even for millions of generated classes.
+    ID_HEX_DIGITS = 15
 
+    def __init__(self, *scope):
+        self.scope = ':'.join(str(part) for part in scope)
+        self.count = 0
 
-def first_in_dict(d):
-    """Grabs the value returned by the first value in d.keys()"""
-    if len(d) > 0:
-        k = d.keys()[0]
-        return d[k]
-    return None
+    def next(self):
+        self.count += 1
+        digest = hashlib.md5('{}#{}'.format(self.scope, self.count)).hexdigest()
+        return int(digest[:self.ID_HEX_DIGITS], 16)
 
 
 def first_key(dictionary_var):
@@ -53,11 +55,29 @@ def makedir(path):
         os.makedirs(path)
 
 
-def merge_lists(two_d_list):
-    """Merges a 2d array into a 1d array. Ex: [[1,2],[3,4]] becomes [1,2,3,4]"""
-    # I know this is a fold / reduce, but I got an error when I tried
-    # the reduce function?
-    return [i for li in two_d_list for i in li]
+def write_file_atomically(path, text):
+    """
+    Writes `text` to a temporary file next to `path` and renames it to `path`, so concurrent readers never see a
+    partially written file.
+    """
+    makedir(dirname(path))
+    fd, temp_path = tempfile.mkstemp(dir=dirname(path))
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(text)
+        os.rename(temp_path, path)
+    except (IOError, OSError):
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def default_cache_dir():
+    """`$UBERPOET_CACHE_DIR` if set, `uberpoet` in `$XDG_CACHE_HOME` (~/.cache by default) otherwise."""
+    cache_dir = os.environ.get('UBERPOET_CACHE_DIR')
+    if cache_dir:
+        return cache_dir
+    return join(os.environ.get('XDG_CACHE_HOME') or join(expanduser('~'), '.cache'), 'uberpoet')
 
 
 def percentage_split(list_to_split, percentages):